@@ -0,0 +1,190 @@
+import asyncio
+import gzip
+import heapq
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from urllib.parse import quote
+from uuid import uuid4
+from bson import ObjectId
+from fastapi.concurrency import run_in_threadpool
+from analytics_db import db
+
+# Cold storage for domain_events. Months older than the hot retention window are
+# exported per (tenant, domain) to gzip NDJSON files sorted by (timestamp, _id),
+# then stamped with expire_at so the TTL index drops them from Mongo. Rollups are
+# kept forever, so aggregate reports are unaffected; raw listings read the files.
+ARCHIVE_DIR = os.getenv("ANALYTICS_ARCHIVE_DIR", "/data/analytics_archive")
+HOT_RETENTION_DAYS = int(os.getenv("ANALYTICS_HOT_RETENTION_DAYS", "90"))
+# How long archived events stay in Mongo before TTL expiry
+ARCHIVE_GRACE_HOURS = float(os.getenv("ANALYTICS_ARCHIVE_GRACE_HOURS", "24"))
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ANALYTICS_ARCHIVE_INTERVAL_SECONDS", "3600"))
+ARCHIVE_READ_BATCH = 1000
+
+metrics = {"runs": 0, "archived_total": 0, "last_run_at": None, "last_run_archived": 0}
+
+def naive_utc(dt: datetime) -> datetime:
+    # Mongo hands back naive UTC datetimes; request bounds may be offset-aware
+    if dt.tzinfo is not None:
+        return dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+def month_start(dt: datetime) -> datetime:
+    return naive_utc(dt).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def next_month(dt: datetime) -> datetime:
+    return (dt.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def archive_boundary(now: datetime = None) -> datetime:
+    """
+    Start of the oldest month still kept hot; everything before it is archived.
+    """
+    now = now or datetime.utcnow()
+    return month_start(now - timedelta(days=HOT_RETENTION_DAYS))
+
+def path_segment(value: str) -> str:
+    # Percent-encode (dots included) so an id used as a path component can never
+    # escape its base directory or collide with another id
+    return quote(value, safe="").replace(".", "%2E")
+
+def archive_path(tenant_id: str, domain: str, month: datetime) -> str:
+    return os.path.join(ARCHIVE_DIR, path_segment(tenant_id), month.strftime("%Y-%m"), f"{path_segment(domain)}.ndjson.gz")
+
+def _encode(doc: dict) -> str:
+    doc = dict(doc, _id=str(doc["_id"]), timestamp=doc["timestamp"].isoformat())
+    return json.dumps(doc, default=str)
+
+def _decode(line: str) -> dict:
+    doc = json.loads(line)
+    doc["_id"] = ObjectId(doc["_id"])
+    doc["timestamp"] = datetime.fromisoformat(doc["timestamp"])
+    return doc
+
+def _read_file(path: str):
+    if not os.path.exists(path):
+        return
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield _decode(line)
+
+def _sort_key(doc: dict):
+    return doc["timestamp"], doc["_id"]
+
+def _write_merged(path: str, new_docs) -> int:
+    """
+    Merge sorted new_docs into the (sorted) file at path, dropping repeats, and
+    swap it in atomically. Returns the number of documents written.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{uuid4().hex}.tmp"
+    written = 0
+    last_key = None
+    with gzip.open(tmp, "wt", encoding="utf-8") as out:
+        for doc in heapq.merge(_read_file(path), new_docs, key=_sort_key):
+            key = _sort_key(doc)
+            if key == last_key:
+                continue  # already archived by an earlier, interrupted run
+            last_key = key
+            out.write(_encode(doc) + "\n")
+            written += 1
+    os.replace(tmp, path)
+    return written
+
+def archive_month(sync_db, tenant_id: str, domain: str, month: datetime) -> int:
+    """
+    Archive one (tenant, domain, month). Events are first tagged with a run id so
+    late arrivals during the export are left for the next run, then exported,
+    then given expire_at. Returns the number of events archived.
+    """
+    coll = sync_db.domain_events
+    run_id = str(uuid4())
+    period = {"$gte": month, "$lt": next_month(month)}
+    tagged = coll.update_many(
+        {"tenant_id": tenant_id, "domain": domain, "timestamp": period, "expire_at": None},
+        {"$set": {"archive_run": run_id}},
+    ).modified_count
+    if not tagged:
+        return 0
+    run_query = {"tenant_id": tenant_id, "domain": domain, "timestamp": period, "archive_run": run_id}
+    cursor = coll.find(run_query, {"archive_run": 0, "rolled_up": 0, "rollup_batch": 0}).sort([("timestamp", 1), ("_id", 1)])
+    _write_merged(archive_path(tenant_id, domain, month), cursor)
+    coll.update_many(run_query, {
+        "$set": {"expire_at": datetime.utcnow() + timedelta(hours=ARCHIVE_GRACE_HOURS)},
+        "$unset": {"archive_run": ""},
+    })
+    return tagged
+
+def archive_expired(sync_db, now: datetime = None) -> int:
+    """
+    Archive every month before archive_boundary() that still has raw events.
+    Walks (tenant, domain) pairs so each lookup stays on the
+    (tenant_id, domain, timestamp, _id) index.
+    """
+    coll = sync_db.domain_events
+    boundary = archive_boundary(now)
+    archived = 0
+    for tenant_id in coll.distinct("tenant_id"):
+        for domain in coll.distinct("domain", {"tenant_id": tenant_id}):
+            oldest = coll.find_one(
+                {"tenant_id": tenant_id, "domain": domain, "timestamp": {"$lt": boundary}, "expire_at": None},
+                {"timestamp": 1},
+                sort=[("timestamp", 1)],
+            )
+            if not oldest:
+                continue
+            month = month_start(oldest["timestamp"])
+            while month < boundary:
+                archived += archive_month(sync_db, tenant_id, domain, month)
+                month = next_month(month)
+    return archived
+
+async def run_archiver(interval: float = ARCHIVE_INTERVAL_SECONDS):
+    """
+    Background task: archive expired months periodically. The export is file
+    and cursor bound, so it runs on a worker thread with the sync driver that
+    backs Motor (db.delegate).
+    """
+    while True:
+        try:
+            archived = await run_in_threadpool(archive_expired, db.delegate)
+        except Exception as e:
+            print(f"[Archiver] archive run failed: {e}")
+            archived = 0
+        metrics["runs"] += 1
+        metrics["archived_total"] += archived
+        metrics["last_run_archived"] = archived
+        metrics["last_run_at"] = time.time()
+        await asyncio.sleep(interval)
+
+def _archived_docs(tenant_id: str, domain: str, start: datetime, end: datetime, action: str = None, after=None):
+    start, end = naive_utc(start), naive_utc(end)
+    last = min(end, datetime.utcnow())
+    month = month_start(start)
+    while month <= last:
+        for doc in _read_file(archive_path(tenant_id, domain, month)):
+            if doc["timestamp"] < start:
+                continue
+            if doc["timestamp"] > end:
+                break
+            if action and doc.get("action") != action:
+                continue
+            if after and _sort_key(doc) <= after:
+                continue
+            yield doc
+        month = next_month(month)
+
+async def iter_archived_events(tenant_id: str, domain: str, start: datetime, end: datetime, action: str = None, after=None):
+    """
+    Archived events in (timestamp, _id) order, read from disk in batches on a
+    worker thread. `after` is a decoded (timestamp, _id) keyset cursor.
+    """
+    docs = _archived_docs(tenant_id, domain, start, end, action, after)
+    while True:
+        batch = await run_in_threadpool(lambda: list(islice(docs, ARCHIVE_READ_BATCH)))
+        if not batch:
+            return
+        for doc in batch:
+            yield doc
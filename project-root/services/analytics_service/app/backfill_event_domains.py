@@ -0,0 +1,25 @@
+# Set domain/action on domain_events stored before event types were normalized at ingest.
+# Run from the app directory (inside the container: /app), then rebuild rollups:
+#     python backfill_event_domains.py && python backfill_rollups.py
+import asyncio
+from analytics_db import client, db
+from models import split_event_type
+
+async def main():
+    updated = 0
+    event_types = await db.domain_events.distinct("event_type", {"domain": {"$exists": False}})
+    for event_type in event_types:
+        domain, action = split_event_type(event_type)
+        result = await db.domain_events.update_many(
+            {"event_type": event_type, "domain": {"$exists": False}},
+            {"$set": {"domain": domain, "action": action}},
+        )
+        updated += result.modified_count
+    print(f"[backfill_event_domains] normalized {updated} events across {len(event_types)} event types")
+    return updated
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    finally:
+        client.close()
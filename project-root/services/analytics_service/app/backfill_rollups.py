@@ -0,0 +1,26 @@
+# Rebuild event_rollups from domain_events (after enabling rollups, or to repair drift).
+# Only months still hot in domain_events are rebuilt; pass --all to rebuild
+# everything (only safe while no month has been archived yet).
+# Run from the app directory (inside the container: /app):
+#     python backfill_rollups.py [tenant_id] [--all]
+import asyncio
+import sys
+from analytics_db import client
+from archive import archive_boundary
+from indexes import ensure_indexes
+from rollups import rebuild_rollups
+
+async def main(tenant_id: str = None, rebuild_all: bool = False):
+    await ensure_indexes()
+    since = None if rebuild_all else archive_boundary()
+    written = await rebuild_rollups(tenant_id, since)
+    scope = tenant_id or "all tenants"
+    print(f"[backfill_rollups] rebuilt {written} rollup buckets for {scope} since {since or 'the beginning'}")
+    return written
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != "--all"]
+    try:
+        asyncio.run(main(args[0] if args else None, "--all" in sys.argv[1:]))
+    finally:
+        client.close()
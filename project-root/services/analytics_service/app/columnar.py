@@ -0,0 +1,287 @@
+import asyncio
+import fcntl
+import glob
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import duckdb
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from bson import ObjectId
+from fastapi.concurrency import run_in_threadpool
+from analytics_db import db
+from archive import naive_utc, path_segment
+
+# Columnar copy of domain_events for heavy analytical queries. Events are
+# snapshotted incrementally (by _id) into one Parquet file per tenant per month;
+# queries run in an in-process DuckDB over those files. Parquet rather than a
+# DuckDB database file so every uvicorn worker can read while one writes.
+COLUMNAR_DIR = os.getenv("ANALYTICS_COLUMNAR_DIR", "/data/analytics_columnar")
+SNAPSHOT_INTERVAL_SECONDS = float(os.getenv("ANALYTICS_SNAPSHOT_INTERVAL_SECONDS", "900"))
+# Events younger than this are left for the next run, so inserts still in flight
+# from other consumers (with slightly older ObjectIds) are never skipped
+SNAPSHOT_LAG_SECONDS = float(os.getenv("ANALYTICS_SNAPSHOT_LAG_SECONDS", "60"))
+SNAPSHOT_FLUSH_ROWS = int(os.getenv("ANALYTICS_SNAPSHOT_FLUSH_ROWS", "200000"))
+
+SCHEMA = pa.schema([
+    ("event_id", pa.string()),
+    ("event_type", pa.string()),
+    ("domain", pa.string()),
+    ("action", pa.string()),
+    ("ts", pa.timestamp("ms")),
+    ("sale_id", pa.string()),
+    ("item_id", pa.string()),
+    ("item_name", pa.string()),
+    ("establishment_id", pa.string()),
+    ("customer_id", pa.string()),
+    ("payment_method", pa.string()),
+    ("quantity", pa.float64()),
+    ("revenue", pa.float64()),
+])
+PAYLOAD_COLUMNS = ("sale_id", "item_id", "item_name", "establishment_id", "customer_id")
+
+# Columns /query/top may group by, and the measures it can rank on
+GROUP_COLUMNS = {"item_id", "establishment_id", "payment_method", "customer_id", "event_type"}
+METRICS = {"count": "count(*)", "revenue": "sum(revenue)", "quantity": "sum(quantity)"}
+
+metrics = {"runs": 0, "snapshotted_total": 0, "last_run_at": None, "last_run_rows": 0, "watermark": None}
+
+def _tenant_dir(tenant_id: str) -> str:
+    return os.path.join(COLUMNAR_DIR, path_segment(tenant_id))
+
+def partition_path(tenant_id: str, month: str) -> str:
+    return os.path.join(_tenant_dir(tenant_id), f"{month}.parquet")
+
+def _state_path() -> str:
+    return os.path.join(COLUMNAR_DIR, "_snapshot_state.json")
+
+def _load_watermark():
+    try:
+        with open(_state_path()) as f:
+            return ObjectId(json.load(f)["watermark"])
+    except FileNotFoundError:
+        return None
+
+def _save_watermark(oid: ObjectId):
+    tmp = _state_path() + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"watermark": str(oid)}, f)
+    os.replace(tmp, _state_path())
+
+@contextmanager
+def _snapshot_lock():
+    """
+    Only one worker process snapshots at a time; the others skip the run.
+    """
+    os.makedirs(COLUMNAR_DIR, exist_ok=True)
+    with open(os.path.join(COLUMNAR_DIR, ".snapshot.lock"), "w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _row(doc: dict) -> dict:
+    payload = doc.get("payload") or {}
+    row = {
+        "event_id": doc.get("event_id") or str(doc["_id"]),
+        "event_type": doc["event_type"],
+        "domain": doc.get("domain"),
+        "action": doc.get("action"),
+        "ts": doc["timestamp"],
+        "payment_method": payload.get("payment_method") or payload.get("method"),
+        "quantity": _number(payload.get("quantity")),
+        "revenue": _number(payload.get("total_price", payload.get("amount"))),
+    }
+    for column in PAYLOAD_COLUMNS:
+        value = payload.get(column)
+        row[column] = str(value) if value is not None else None
+    return row
+
+def _write_partition(path: str, rows: list) -> int:
+    """
+    Append rows to a partition file by rewriting it and swapping it in
+    atomically. Rows whose event_id is already present (a re-run after a crash
+    before the watermark was saved) are dropped. Returns rows added.
+    """
+    new = pa.Table.from_pylist(rows, schema=SCHEMA)
+    if os.path.exists(path):
+        existing = pq.read_table(path, schema=SCHEMA)
+        new = new.filter(pc.invert(pc.is_in(new["event_id"], value_set=existing["event_id"])))
+        table = pa.concat_tables([existing, new])
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = new
+    tmp = f"{path}.tmp"
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, path)
+    return new.num_rows
+
+def _flush(partitions: dict) -> int:
+    written = 0
+    for (tenant_id, month), rows in partitions.items():
+        written += _write_partition(partition_path(tenant_id, month), rows)
+    partitions.clear()
+    return written
+
+def snapshot_once(sync_db, now: datetime = None) -> int:
+    """
+    Copy events added since the last snapshot into the Parquet partitions.
+    The watermark advances after each flush, so an interrupted run resumes
+    where the last flush ended. Returns the number of rows added.
+    """
+    with _snapshot_lock() as acquired:
+        if not acquired:
+            return 0
+        now = now or datetime.utcnow()
+        id_range = {"$lt": ObjectId.from_datetime(now - timedelta(seconds=SNAPSHOT_LAG_SECONDS))}
+        watermark = _load_watermark()
+        if watermark:
+            id_range["$gt"] = watermark
+        cursor = sync_db.domain_events.find(
+            {"_id": id_range},
+            {"event_id": 1, "event_type": 1, "domain": 1, "action": 1, "tenant_id": 1, "payload": 1, "timestamp": 1},
+        ).sort("_id", 1).batch_size(10_000)
+        partitions = defaultdict(list)
+        pending = 0
+        written = 0
+        last_id = None
+        for doc in cursor:
+            partitions[(doc["tenant_id"], doc["timestamp"].strftime("%Y-%m"))].append(_row(doc))
+            last_id = doc["_id"]
+            pending += 1
+            if pending >= SNAPSHOT_FLUSH_ROWS:
+                written += _flush(partitions)
+                _save_watermark(last_id)
+                pending = 0
+        if pending:
+            written += _flush(partitions)
+            _save_watermark(last_id)
+        if last_id:
+            metrics["watermark"] = str(last_id)
+        return written
+
+async def run_snapshotter(interval: float = SNAPSHOT_INTERVAL_SECONDS):
+    """
+    Background task: snapshot new events periodically (on a worker thread,
+    with the sync driver behind Motor).
+    """
+    while True:
+        try:
+            rows = await run_in_threadpool(snapshot_once, db.delegate)
+        except Exception as e:
+            print(f"[Columnar] snapshot failed: {e}")
+            rows = 0
+        metrics["runs"] += 1
+        metrics["snapshotted_total"] += rows
+        metrics["last_run_rows"] = rows
+        metrics["last_run_at"] = time.time()
+        await asyncio.sleep(interval)
+
+def _tenant_files(tenant_id: str) -> list:
+    return sorted(glob.glob(os.path.join(glob.escape(_tenant_dir(tenant_id)), "*.parquet")))
+
+def _query(tenant_id: str, sql: str, params: list) -> list:
+    """
+    Run sql against the tenant's events (exposed as the `events` view) and
+    return rows as dicts. A fresh in-memory DuckDB per call keeps threads independent.
+    """
+    files = _tenant_files(tenant_id)
+    if not files:
+        return []
+    con = duckdb.connect()
+    try:
+        file_list = ", ".join("'" + f.replace("'", "''") + "'" for f in files)
+        con.execute(f"CREATE VIEW events AS SELECT * FROM read_parquet([{file_list}])")
+        cursor = con.execute(sql, params)
+        columns = [c[0] for c in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        con.close()
+
+def top(tenant_id: str, by: str, metric: str, start: datetime, end: datetime, domain: str = "sale", limit: int = 20) -> list:
+    """
+    Group events by one column and rank the groups by a measure.
+    """
+    if by not in GROUP_COLUMNS:
+        raise ValueError(f"Cannot group by {by}; choose from {sorted(GROUP_COLUMNS)}")
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric}; choose from {sorted(METRICS)}")
+    sql = f"""
+        SELECT {by} AS key, count(*) AS count, sum(revenue) AS revenue, sum(quantity) AS quantity
+        FROM events
+        WHERE domain = ? AND ts >= ? AND ts <= ?
+        GROUP BY {by}
+        ORDER BY {METRICS[metric]} DESC NULLS LAST
+        LIMIT ?
+    """
+    return _query(tenant_id, sql, [domain, naive_utc(start), naive_utc(end), limit])
+
+def item_velocity(tenant_id: str, months: int = 3, limit: int = 20, now: datetime = None) -> list:
+    """
+    Monthly units sold for the top items of the latest month, with the
+    month-over-month change.
+    """
+    now = now or datetime.utcnow()
+    year, month = divmod(now.year * 12 + now.month - 1 - (months - 1), 12)
+    since = datetime(year, month + 1, 1)
+    sql = """
+        WITH monthly AS (
+            SELECT item_id, any_value(item_name) AS item_name, date_trunc('month', ts) AS month,
+                   sum(quantity) AS quantity, sum(revenue) AS revenue
+            FROM events
+            WHERE domain = 'sale' AND item_id IS NOT NULL AND ts >= ?
+            GROUP BY item_id, month
+        ),
+        leaders AS (
+            SELECT item_id FROM monthly
+            WHERE month = (SELECT max(month) FROM monthly)
+            ORDER BY quantity DESC
+            LIMIT ?
+        )
+        SELECT m.item_id, m.item_name, m.month, m.quantity, m.revenue,
+               m.quantity - lag(m.quantity) OVER (PARTITION BY m.item_id ORDER BY m.month) AS quantity_change
+        FROM monthly m JOIN leaders USING (item_id)
+        ORDER BY m.item_id, m.month
+    """
+    rows = _query(tenant_id, sql, [since, limit])
+    items = {}
+    for row in rows:
+        item = items.setdefault(row["item_id"], {"item_id": row["item_id"], "item_name": row["item_name"], "months": []})
+        item["months"].append({k: row[k] for k in ("month", "quantity", "revenue", "quantity_change")})
+    return sorted(items.values(), key=lambda i: i["months"][-1]["quantity"] or 0, reverse=True)
+
+def basket_pairs(tenant_id: str, start: datetime, end: datetime, limit: int = 20) -> list:
+    """
+    Item pairs most often bought by the same customer on the same day,
+    across all establishments.
+    """
+    sql = """
+        WITH baskets AS (
+            SELECT DISTINCT customer_id, CAST(ts AS DATE) AS day, item_id
+            FROM events
+            WHERE domain = 'sale' AND customer_id IS NOT NULL AND item_id IS NOT NULL
+              AND ts >= ? AND ts <= ?
+        )
+        SELECT a.item_id AS item_a, b.item_id AS item_b, count(*) AS baskets
+        FROM baskets a
+        JOIN baskets b ON a.customer_id = b.customer_id AND a.day = b.day AND a.item_id < b.item_id
+        GROUP BY a.item_id, b.item_id
+        ORDER BY baskets DESC
+        LIMIT ?
+    """
+    return _query(tenant_id, sql, [naive_utc(start), naive_utc(end), limit])
@@ -1,8 +1,13 @@
 import asyncio
 import json
+import time
 from aiokafka import AIOKafkaConsumer
+from pydantic import TypeAdapter, ValidationError
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from typing import List
 from analytics_db import db
 from models import DomainEvent
+from rollups import apply_rollups, unrolled_event_ids
 from datetime import datetime
 import os
 KAFKA_BOOTSTRAP_SERVERS = os.getenv("KAFKA_BOOTSTRAP_SERVERS", "kafka:9092")
@@ -10,27 +15,193 @@ EVENT_TOPICS = [
     'sale.created', 'payment.received', 'inventory.updated',
     'gst.invoice.generated', 'notification.sent'
 ]
+# A batch is written once it reaches INGEST_BATCH_SIZE or INGEST_BATCH_TIMEOUT_MS has passed
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+INGEST_BATCH_TIMEOUT_MS = int(os.getenv("INGEST_BATCH_TIMEOUT_MS", "200"))
+# Consumers per process in the analytics_service group; Kafka assigns each partition to
+# exactly one of them, which keeps per-partition ordering. More consumers than partitions sit idle.
+INGEST_CONSUMERS = int(os.getenv("INGEST_CONSUMERS", "2"))
+# Fetched batches allowed to wait for the Mongo writer before fetching pauses (backpressure)
+INGEST_QUEUE_BATCHES = int(os.getenv("INGEST_QUEUE_BATCHES", "4"))
+# A consumer that fails is rebuilt after a backoff that doubles up to this cap
+INGEST_RESTART_MAX_BACKOFF_SECONDS = float(os.getenv("INGEST_RESTART_MAX_BACKOFF_SECONDS", "60"))
+INGEST_RESTART_BACKOFF_SECONDS = 1.0
+
+# "topic:partition" -> consumed / last_offset / lag / events_per_sec
+partition_metrics = {}
+consumer_metrics = {"restarts": 0, "last_error": None, "last_restart_at": None}
+
+_events_adapter = TypeAdapter(List[DomainEvent])
+
+def _raw_event(raw: dict, msg) -> dict:
+    return {
+        # Redeliveries of the same event carry the same id, so storage can drop them
+        "event_id": raw.get('event_id') or f"{msg.topic}:{msg.partition}:{msg.offset}",
+        "event_type": raw['event_type'],
+        "tenant_id": raw['tenant_id'],
+        "payload": raw['payload'],
+        "timestamp": raw.get('timestamp', datetime.utcnow()),
+    }
+
+def parse_events(messages) -> List[DomainEvent]:
+    """
+    Decode and validate a fetched batch. The whole batch is validated in one
+    call; if anything in it is malformed, fall back to per-message validation
+    so only the bad messages are dropped.
+    """
+    raws = []
+    for msg in messages:
+        try:
+            raws.append(_raw_event(json.loads(msg.value), msg))
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"[EventIngestor] Skipping undecodable message {msg.topic}:{msg.partition}:{msg.offset}: {e}")
+    try:
+        return _events_adapter.validate_python(raws)
+    except ValidationError:
+        events = []
+        for raw in raws:
+            try:
+                events.append(DomainEvent(**raw))
+            except ValidationError as e:
+                print(f"[EventIngestor] Skipping invalid event {raw.get('event_type')}: {e}")
+        return events
+
+DUPLICATE_KEY = 11000
 
 async def store_event(event: DomainEvent):
-    coll = db.domain_events
-    await coll.insert_one(event.dict())
+    await store_events([event])
+
+async def store_events(events: List[DomainEvent]) -> int:
+    """
+    Insert a batch, treating duplicate event_ids (Kafka redeliveries, consumer
+    restarts) as already stored, and fold the newly stored events into the
+    rollups. A redelivered event whose earlier batch failed before its rollups
+    were applied is folded in now. Returns the number of new events.
+    """
+    if not events:
+        return 0
+    try:
+        await db.domain_events.insert_many([{**e.dict(), "rolled_up": False} for e in events], ordered=False)
+        stored = events
+        pending = events
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != DUPLICATE_KEY for err in errors):
+            raise
+        duplicates = {err["index"] for err in errors}
+        stored = [event for i, event in enumerate(events) if i not in duplicates]
+        # Only events not yet in the rollups are counted, so a redelivered batch doesn't inflate them
+        stored_ids = {event.event_id for event in stored}
+        redelivered = {events[i].event_id: events[i] for i in sorted(duplicates) if events[i].event_id not in stored_ids}
+        unrolled = await unrolled_event_ids(redelivered) if redelivered else set()
+        pending = stored + [event for event_id, event in redelivered.items() if event_id in unrolled]
+    await apply_rollups(pending)
+    return len(stored)
 
-async def consume_events():
-    consumer = AIOKafkaConsumer(
+def _new_consumer():
+    return AIOKafkaConsumer(
         *EVENT_TOPICS,
         bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
-        group_id="analytics_service"
+        group_id="analytics_service",
+        enable_auto_commit=False,
     )
+
+def _record_metrics(consumer, batches, elapsed: float):
+    for tp, msgs in batches.items():
+        key = f"{tp.topic}:{tp.partition}"
+        m = partition_metrics.setdefault(key, {"consumed": 0, "last_offset": None, "lag": None, "events_per_sec": 0.0})
+        m["consumed"] += len(msgs)
+        m["last_offset"] = msgs[-1].offset
+        highwater = consumer.highwater(tp) if hasattr(consumer, "highwater") else None
+        m["lag"] = highwater - (msgs[-1].offset + 1) if highwater is not None else None
+        m["events_per_sec"] = len(msgs) / elapsed if elapsed > 0 else 0.0
+
+async def _write_batches(consumer, queue: asyncio.Queue):
+    """
+    Writer half of a consumer: store fetched batches in order, then commit their offsets.
+    """
+    while True:
+        batches = await queue.get()
+        started = time.monotonic()
+        messages = [msg for partition_msgs in batches.values() for msg in partition_msgs]
+        await store_events(parse_events(messages))
+        try:
+            await consumer.commit({tp: msgs[-1].offset + 1 for tp, msgs in batches.items()})
+        except Exception as e:
+            # Usually a rebalance moved the partition; its new owner re-reads from the last commit
+            print(f"[EventIngestor] Offset commit failed: {e}")
+        _record_metrics(consumer, batches, time.monotonic() - started)
+        queue.task_done()
+
+async def _enqueue(queue: asyncio.Queue, batches, writer: asyncio.Task):
+    """
+    Put a fetched batch on the writer's queue. The put is raced against the
+    writer, so a writer that dies while the queue is full is raised here
+    instead of leaving the fetch loop waiting forever.
+    """
+    put = asyncio.ensure_future(queue.put(batches))
+    try:
+        await asyncio.wait({put, writer}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        if not put.done():
+            put.cancel()
+    if writer.done():
+        writer.result()
+
+async def consume_events(consumer=None):
+    """
+    Fetch in batches (getmany) and hand them to a writer task through a bounded
+    queue: fetching pauses while the writer is INGEST_QUEUE_BATCHES behind.
+    Each batch is written with one unordered insert_many, and offsets are
+    committed only after it is stored.
+    """
+    if consumer is None:
+        consumer = _new_consumer()
+    queue = asyncio.Queue(maxsize=INGEST_QUEUE_BATCHES)
     await consumer.start()
+    writer = asyncio.create_task(_write_batches(consumer, queue))
     try:
-        async for msg in consumer:
-            raw = json.loads(msg.value)
-            event = DomainEvent(
-                event_type=raw['event_type'],
-                tenant_id=raw['tenant_id'],
-                payload=raw['payload'],
-                timestamp=raw.get('timestamp', datetime.utcnow())
-            )
-            await store_event(event)
+        while True:
+            batches = await consumer.getmany(timeout_ms=INGEST_BATCH_TIMEOUT_MS, max_records=INGEST_BATCH_SIZE)
+            if writer.done():
+                writer.result()  # Surface a writer failure instead of fetching forever
+            if not batches:
+                continue
+            await _enqueue(queue, batches, writer)
     finally:
+        writer.cancel()
+        try:
+            await writer
+        except (asyncio.CancelledError, Exception):
+            pass  # A writer failure has already been raised from the fetch loop
         await consumer.stop()
+
+async def supervise_consumer(index: int):
+    """
+    Keep one consumer running: if it fails (Mongo down, a batch that can't be
+    stored), log it, back off, and start a fresh consumer. Its offsets were
+    not committed, so the new consumer re-reads the failed batch.
+    """
+    backoff = INGEST_RESTART_BACKOFF_SECONDS
+    while True:
+        started = time.monotonic()
+        try:
+            await consume_events(_new_consumer())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            consumer_metrics["restarts"] += 1
+            consumer_metrics["last_error"] = f"{type(e).__name__}: {e}"
+            consumer_metrics["last_restart_at"] = time.time()
+            if time.monotonic() - started > INGEST_RESTART_MAX_BACKOFF_SECONDS:
+                backoff = INGEST_RESTART_BACKOFF_SECONDS  # Ran fine for a while; this is a new failure
+            print(f"[EventIngestor] Consumer {index} failed, restarting in {backoff:.0f}s: {e}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, INGEST_RESTART_MAX_BACKOFF_SECONDS)
+
+async def run_consumers(count: int = INGEST_CONSUMERS):
+    """
+    Run `count` supervised consumers in the analytics_service group side by side.
+    Across processes, every uvicorn worker runs its own set.
+    """
+    await asyncio.gather(*(supervise_consumer(i) for i in range(count)))
@@ -0,0 +1,32 @@
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from retail_db import ensure_indexes_async
+from analytics_db import db
+
+# Every index the analytics service relies on, per collection. Applied once at
+# startup (see main.py lifespan) so ingestion and report queries never issue DDL;
+# creation and drift reporting live in the shared retail_db index manager.
+INDEXES = {
+    "domain_events": [
+        IndexModel([("tenant_id", ASCENDING), ("event_type", ASCENDING), ("timestamp", DESCENDING)]),
+        # Domain-filtered report listings in keyset (timestamp, _id) order, without an in-memory sort
+        IndexModel([("tenant_id", ASCENDING), ("domain", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)]),
+        # Idempotent ingestion; partial so pre-existing events without an id don't collide
+        IndexModel([("event_id", ASCENDING)], unique=True,
+                   partialFilterExpression={"event_id": {"$type": "string"}}),
+        # Raw events are dropped once archived (archive.py sets expire_at)
+        IndexModel([("expire_at", ASCENDING)], expireAfterSeconds=0),
+        # Rollup sweep: only events still waiting for their rollups are indexed
+        IndexModel([("rolled_up", ASCENDING), ("_id", ASCENDING)], partialFilterExpression={"rolled_up": False}),
+        # Re-applying a rollup batch after a failure; the tag is dropped once it lands
+        IndexModel([("rollup_batch", ASCENDING)], partialFilterExpression={"rollup_batch": {"$exists": True}}),
+    ],
+    "event_rollups": [
+        # One document per bucket; the ingestor's $inc upserts and rebuild's $merge match on it
+        IndexModel([("tenant_id", ASCENDING), ("granularity", ASCENDING), ("event_type", ASCENDING), ("bucket", ASCENDING)],
+                   unique=True),
+        IndexModel([("tenant_id", ASCENDING), ("granularity", ASCENDING), ("domain", ASCENDING), ("bucket", ASCENDING)]),
+    ],
+}
+
+async def ensure_indexes():
+    return await ensure_indexes_async(db, INDEXES)
@@ -1,20 +1,38 @@
-from fastapi import FastAPI, Body
+from fastapi import FastAPI, Body, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from datetime import datetime
+from typing import Literal
 from contextlib import asynccontextmanager
 from models import ReportRequest
 import asyncio
 import event_ingestor
+import archive
+import columnar
+import rollups
+from rollups import report_from_rollups, count_from_rollups
+from report_stream import events_filter, events_query, decode_cursor, stream_ndjson, stream_json, InvalidCursor, REPORT_PAGE_MAX
+from indexes import ensure_indexes
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: launch the event consumer
-    consumer_task = asyncio.create_task(event_ingestor.consume_events())
+    # Startup: apply declared indexes, then launch the event consumers, rollup sweep, archiver and columnar snapshots
+    await ensure_indexes()
+    tasks = [
+        asyncio.create_task(event_ingestor.run_consumers()),
+        asyncio.create_task(rollups.run_rollup_sweeper()),
+        asyncio.create_task(archive.run_archiver()),
+        asyncio.create_task(columnar.run_snapshotter()),
+    ]
     yield
-    # Shutdown: cancel the consumer
-    consumer_task.cancel()
-    try:
-        await consumer_task
-    except asyncio.CancelledError:
-        pass
+    # Shutdown: cancel background tasks
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
 
 app = FastAPI(title="Analytics Service", lifespan=lifespan)
 
@@ -25,33 +43,118 @@ def read_root():
 @app.post("/reports")
 async def generate_report(request: ReportRequest = Body(...)):
     """
-    Generate and fetch an analytics report by tenant, type, and period.
+    Generate an analytics report by tenant, type, and period from the hourly/daily
+    rollups: totals plus one row per bucket (count, revenue, quantity, payment-method split).
     """
-    # Basic: fetch relevant events from db for requested period
-    coll = db.domain_events
-    query = {
+    report = await report_from_rollups(
+        request.tenant_id, request.report_domain(),
+        request.period_start, request.period_end, request.granularity, request.action
+    )
+    if not report["buckets"]:
+        raise HTTPException(status_code=404, detail="No events found for this report/period.")
+    return {
         "tenant_id": request.tenant_id,
-        "event_type": {"$regex": f"^{request.report_type.split('_')[0]}"},
-        "timestamp": {
-            "$gte": request.period_start,
-            "$lte": request.period_end
-        }
+        "report_type": request.report_type,
+        "granularity": request.granularity,
+        **report,
     }
-    events = await coll.find(query).to_list(1000)
-    if not events:
-        raise HTTPException(status_code=404, detail="No events found for this report/period.")
 
-    # Example logic: just return raw events for now, you can summarize as needed
-    return {"tenant_id": request.tenant_id, "report_type": request.report_type, "count": len(events), "events": events}
+@app.post("/reports/events")
+async def report_events(
+    request: ReportRequest = Body(...),
+    format: Literal["ndjson", "json"] = "ndjson",
+    page_size: int = Query(None, ge=1, le=REPORT_PAGE_MAX),
+    cursor: str = None,
+):
+    """
+    Raw events behind a report, for drill-down, streamed in (timestamp, _id) order.
+    Without page_size the whole period is streamed; with it, pass the returned
+    next_cursor back as `cursor` to fetch the following page.
+    """
+    query = events_filter(
+        request.tenant_id, request.report_domain(), request.period_start, request.period_end, request.action
+    )
+    try:
+        after = decode_cursor(cursor) if cursor else None
+        query = events_query(query, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    archived = None
+    if archive.month_start(request.period_start) < archive.archive_boundary():
+        # Period reaches into archived months: merge in the cold files
+        archived = archive.iter_archived_events(
+            request.tenant_id, request.report_domain(), request.period_start, request.period_end,
+            request.action, after
+        )
+    if format == "ndjson":
+        return StreamingResponse(stream_ndjson(query, page_size, archived), media_type="application/x-ndjson")
+    header = {"tenant_id": request.tenant_id, "report_type": request.report_type}
+    return StreamingResponse(stream_json(header, query, page_size, archived), media_type="application/json")
 
 @app.get("/analytics/{tenant_id}/event_counts")
-async def event_counts(tenant_id: str, report_type: str = None):
+async def event_counts(tenant_id: str, domain: str = None, action: str = None, report_type: str = None):
+    """
+    Get summary event counts for a tenant, optionally filtered by domain/action
+    (report_type is accepted as the older spelling of domain).
+    Summed from the daily rollups.
+    """
+    domain = domain or (report_type.split("_")[0] if report_type else None)
+    count = await count_from_rollups(tenant_id, domain, action)
+    return {"tenant_id": tenant_id, "domain": domain, "action": action, "report_type": report_type, "event_count": count}
+
+@app.get("/analytics/ingest/metrics")
+async def ingest_metrics():
+    """
+    Per topic-partition ingestion counters, lag and throughput for this worker's consumers.
+    """
+    return {"consumers": event_ingestor.INGEST_CONSUMERS, "partitions": event_ingestor.partition_metrics,
+            "supervisor": event_ingestor.consumer_metrics, "rollup_sweep": rollups.metrics}
+
+@app.get("/analytics/archive/metrics")
+async def archive_metrics():
+    """
+    Cold-archive runs for this worker and the current hot-retention boundary.
+    """
+    return {"hot_since": archive.archive_boundary(), "retention_days": archive.HOT_RETENTION_DAYS, **archive.metrics}
+
+@app.get("/analytics/{tenant_id}/query/top")
+async def query_top(
+    tenant_id: str,
+    start: datetime,
+    end: datetime,
+    by: str = "item_id",
+    metric: Literal["count", "revenue", "quantity"] = "revenue",
+    domain: str = "sale",
+    limit: int = Query(20, ge=1, le=1000),
+):
+    """
+    Top-N groups (items, establishments, payment methods, ...) over the columnar snapshot.
+    """
+    try:
+        rows = await run_in_threadpool(columnar.top, tenant_id, by, metric, start, end, domain, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"tenant_id": tenant_id, "by": by, "metric": metric, "rows": rows}
+
+@app.get("/analytics/{tenant_id}/query/item_velocity")
+async def query_item_velocity(tenant_id: str, months: int = Query(3, ge=2, le=24), limit: int = Query(20, ge=1, le=500)):
+    """
+    Month-over-month units sold for the current top items, over the columnar snapshot.
+    """
+    items = await run_in_threadpool(columnar.item_velocity, tenant_id, months, limit)
+    return {"tenant_id": tenant_id, "months": months, "items": items}
+
+@app.get("/analytics/{tenant_id}/query/basket")
+async def query_basket(tenant_id: str, start: datetime, end: datetime, limit: int = Query(20, ge=1, le=500)):
+    """
+    Items most often bought together (same customer, same day) across all establishments.
+    """
+    pairs = await run_in_threadpool(columnar.basket_pairs, tenant_id, start, end, limit)
+    return {"tenant_id": tenant_id, "pairs": pairs}
+
+@app.get("/analytics/columnar/metrics")
+async def columnar_metrics():
     """
-    Get summary event counts for a tenant, optionally filtered by report type/topic.
+    Columnar snapshot runs for this worker and the current watermark.
     """
-    coll = db.domain_events
-    match = {"tenant_id": tenant_id}
-    if report_type:
-        match["event_type"] = {"$regex": f"^{report_type}"}
-    count = await coll.count_documents(match)
-    return {"tenant_id": tenant_id, "report_type": report_type, "event_count": count}
+    return columnar.metrics
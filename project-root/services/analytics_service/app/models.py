@@ -1,15 +1,40 @@
 from datetime import datetime
-from pydantic import BaseModel
-from typing import Optional, Dict
+from pydantic import BaseModel, model_validator
+from typing import Optional, Dict, Literal
+
+def split_event_type(event_type: str):
+    """
+    "sale.created" -> ("sale", "created"), "gst.invoice.generated" -> ("gst", "invoice.generated").
+    """
+    domain, _, action = event_type.partition(".")
+    return domain, action
 
 class DomainEvent(BaseModel):
+    event_id: str  # Producer-assigned, or "topic:partition:offset"; unique in domain_events
     event_type: str
     tenant_id: str
     payload: Dict
     timestamp: datetime
+    # Normalized from event_type at ingest so queries filter by equality, not regex
+    domain: str = ""
+    action: str = ""
+
+    @model_validator(mode="before")
+    @classmethod
+    def _normalize_event_type(cls, data):
+        if isinstance(data, dict) and isinstance(data.get("event_type"), str) and not data.get("domain"):
+            data = dict(data)
+            data["domain"], data["action"] = split_event_type(data["event_type"])
+        return data
 
 class ReportRequest(BaseModel):
     tenant_id: str
     report_type: str
     period_start: datetime
     period_end: datetime
+    granularity: Literal["hour", "day"] = "day"
+    domain: Optional[str] = None  # Defaults to the report_type prefix ("sale_summary" -> "sale")
+    action: Optional[str] = None
+
+    def report_domain(self) -> str:
+        return self.domain or self.report_type.split("_")[0]
@@ -0,0 +1,143 @@
+import base64
+import json
+import os
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from analytics_db import db
+
+# Raw event listings are streamed straight off a Motor cursor in (timestamp, _id)
+# order, so memory stays at one cursor batch however large the tenant is.
+REPORT_STREAM_BATCH_SIZE = int(os.getenv("REPORT_STREAM_BATCH_SIZE", "500"))
+REPORT_PAGE_MAX = int(os.getenv("REPORT_PAGE_MAX", "10000"))
+
+EVENT_PROJECTION = {"_id": 1, "event_id": 1, "event_type": 1, "domain": 1, "action": 1, "payload": 1, "timestamp": 1}
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(doc: dict) -> str:
+    raw = json.dumps({"ts": doc["timestamp"].isoformat(), "id": str(doc["_id"])})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(token: str):
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        return datetime.fromisoformat(raw["ts"]), ObjectId(raw["id"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
+
+def events_filter(tenant_id: str, domain: str, start: datetime, end: datetime, action: str = None) -> dict:
+    """
+    Equality on the normalized domain (and action), so the
+    (tenant_id, domain, timestamp, _id) index bounds the scan.
+    """
+    query = {"tenant_id": tenant_id, "domain": domain, "timestamp": {"$gte": start, "$lte": end}}
+    if action:
+        query["action"] = action
+    return query
+
+def events_query(base_query: dict, cursor: str = None) -> dict:
+    """
+    Add the keyset condition: strictly after the (timestamp, _id) the cursor points at.
+    """
+    if not cursor:
+        return base_query
+    ts, oid = decode_cursor(cursor)
+    return {
+        **base_query,
+        "$or": [
+            {"timestamp": {"$gt": ts}},
+            {"timestamp": ts, "_id": {"$gt": oid}},
+        ],
+    }
+
+EVENT_SORT = [("timestamp", 1), ("_id", 1)]
+
+def hot_events_query(query: dict) -> dict:
+    """
+    The query iter_events runs against domain_events. Archived events still
+    inside their TTL grace period have expire_at set; the file copy is served instead.
+    """
+    return {**query, "expire_at": None}
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)  # ObjectId, Decimal128, ...
+
+def _dumps(value) -> str:
+    return json.dumps(value, default=_json_default)
+
+def _sort_key(doc: dict):
+    return doc["timestamp"], doc["_id"]
+
+async def _merge_sorted(left, right):
+    """
+    Merge two async iterators that are each sorted by (timestamp, _id).
+    """
+    left_doc = await anext(left, None)
+    right_doc = await anext(right, None)
+    while left_doc is not None or right_doc is not None:
+        if right_doc is None or (left_doc is not None and _sort_key(left_doc) <= _sort_key(right_doc)):
+            yield left_doc
+            left_doc = await anext(left, None)
+        else:
+            yield right_doc
+            right_doc = await anext(right, None)
+
+async def _project(docs):
+    async for doc in docs:
+        yield {k: doc[k] for k in EVENT_PROJECTION if k in doc}
+
+async def iter_events(query: dict, limit: int = None, archived=None):
+    """
+    Yield (event, next_cursor) in (timestamp, _id) order; next_cursor is set
+    on the last event of a page when more may follow. `archived` is an
+    optional sorted stream of cold events (archive.iter_archived_events)
+    merged in ahead of the hot ones.
+    """
+    cursor = (
+        db.domain_events.find(hot_events_query(query), EVENT_PROJECTION)
+        .sort(EVENT_SORT)
+        .batch_size(REPORT_STREAM_BATCH_SIZE)
+    )
+    if limit and archived is None:
+        cursor = cursor.limit(limit)
+    source = _merge_sorted(_project(archived), cursor) if archived is not None else cursor
+    sent = 0
+    last_key = None
+    async for doc in source:
+        key = _sort_key(doc)
+        if key == last_key:
+            continue  # in the file and not yet stamped in Mongo (interrupted archive run)
+        last_key = key
+        sent += 1
+        next_cursor = encode_cursor(doc) if limit and sent == limit else None
+        doc.pop("_id")
+        yield doc, next_cursor
+        if limit and sent == limit:
+            return
+
+async def stream_ndjson(query: dict, limit: int = None, archived=None):
+    """
+    One event per line; a final {"next_cursor": ...} line closes every response
+    (null once the listing is exhausted).
+    """
+    next_cursor = None
+    async for doc, next_cursor in iter_events(query, limit, archived):
+        yield _dumps(doc) + "\n"
+    yield _dumps({"next_cursor": next_cursor}) + "\n"
+
+async def stream_json(header: dict, query: dict, limit: int = None, archived=None):
+    """
+    A single JSON object written in chunks: header fields, then the events
+    array element by element, then next_cursor.
+    """
+    yield _dumps(header)[:-1] + ', "events": ['
+    next_cursor = None
+    first = True
+    async for doc, next_cursor in iter_events(query, limit, archived):
+        yield ("" if first else ",") + _dumps(doc)
+        first = False
+    yield '], "next_cursor": ' + _dumps(next_cursor) + "}"
@@ -0,0 +1,263 @@
+import asyncio
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import List
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from analytics_db import db
+from models import DomainEvent, split_event_type
+
+# Hourly and daily pre-aggregates per (tenant_id, event_type), kept current by the
+# ingestor and rebuildable from domain_events with backfill_rollups.py.
+# Each event is stored with rolled_up=False and flagged once its $inc has landed,
+# so events stored by a batch that failed before its rollups are picked up again
+# (on redelivery, or by the sweep) instead of being lost. Before the $inc, events
+# are tagged with a rollup_batch id that each bucket records once applied, so a
+# retry after a crash between the $inc and the flag skips buckets already counted.
+ROLLUPS_COLL_NAME = "event_rollups"
+GRANULARITIES = ("hour", "day")
+ROLLUP_SWEEP_INTERVAL_SECONDS = float(os.getenv("ANALYTICS_ROLLUP_SWEEP_INTERVAL_SECONDS", "300"))
+# Unflagged events younger than this are left to the consumer that is storing them
+ROLLUP_SWEEP_LAG_SECONDS = float(os.getenv("ANALYTICS_ROLLUP_SWEEP_LAG_SECONDS", "300"))
+ROLLUP_SWEEP_BATCH = 1000
+# Recent rollup_batch ids kept per bucket; a retry must come within this many batches
+ROLLUP_APPLIED_BATCHES = int(os.getenv("ANALYTICS_ROLLUP_APPLIED_BATCHES", "1000"))
+DUPLICATE_KEY = 11000
+EVENT_FIELDS = {"_id": 0, "event_id": 1, "event_type": 1, "tenant_id": 1, "payload": 1, "timestamp": 1}
+
+metrics = {"sweeps": 0, "swept_total": 0, "last_sweep_at": None}
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    """
+    Start of ts's UTC hour or day (naive UTC, as Mongo returns it and as
+    rebuild_rollups' $dateTrunc buckets it).
+    """
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _event_measures(payload: dict):
+    """
+    (revenue, quantity, payment_method) for an event payload: sales carry
+    total_price/payment_method, payments carry amount/method.
+    """
+    revenue = payload.get("total_price", payload.get("amount", 0)) or 0
+    try:
+        revenue = float(revenue)
+    except (TypeError, ValueError):
+        revenue = 0.0
+    quantity = payload.get("quantity", 0) or 0
+    method = payload.get("payment_method") or payload.get("method")
+    return revenue, quantity, method
+
+async def update_rollups(events: List[DomainEvent], batch_id: str = None):
+    """
+    Fold events into hourly and daily rollups with $inc upserts, one write per
+    touched bucket. With a batch_id, a bucket that already recorded the batch
+    is left alone, so re-applying the same batch counts it once.
+    """
+    if not events:
+        return
+    incs = defaultdict(lambda: defaultdict(float))
+    for event in events:
+        revenue, quantity, method = _event_measures(event.payload)
+        for granularity in GRANULARITIES:
+            key = (event.tenant_id, event.event_type, granularity, bucket_start(event.timestamp, granularity))
+            inc = incs[key]
+            inc["count"] += 1
+            inc["revenue"] += revenue
+            inc["quantity"] += quantity
+            if method:
+                inc[f"payment_methods.{method}"] += 1
+                inc[f"revenue_by_method.{method}"] += revenue
+    ops = []
+    for (tenant_id, event_type, granularity, bucket), inc in incs.items():
+        query = {"tenant_id": tenant_id, "event_type": event_type, "granularity": granularity, "bucket": bucket}
+        update = {"$inc": dict(inc), "$setOnInsert": dict(zip(("domain", "action"), split_event_type(event_type)))}
+        if batch_id:
+            query["applied_batches"] = {"$ne": batch_id}
+            update["$push"] = {"applied_batches": {"$each": [batch_id], "$slice": -ROLLUP_APPLIED_BATCHES}}
+        ops.append(UpdateOne(query, update, upsert=True))
+    try:
+        await db[ROLLUPS_COLL_NAME].bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        # The bucket exists and already has this batch: the upsert's insert hits the unique key
+        if not batch_id or any(err.get("code") != DUPLICATE_KEY for err in e.details.get("writeErrors", [])):
+            raise
+
+async def apply_rollups(events: List[DomainEvent]):
+    """
+    Fold stored events into the rollups, then flag them rolled_up. Events are
+    first tagged with a rollup_batch id; a failure before the flag leaves them
+    tagged, and the next delivery or sweep re-applies the whole tagged batch,
+    which the buckets that already counted it skip.
+    """
+    if not events:
+        return
+    event_ids = [e.event_id for e in events]
+    await db.domain_events.update_many(
+        {"event_id": {"$in": event_ids}, "rolled_up": False, "rollup_batch": None},
+        {"$set": {"rollup_batch": str(ObjectId())}},
+    )
+    for batch_id in await db.domain_events.distinct("rollup_batch", {"event_id": {"$in": event_ids}, "rolled_up": False}):
+        await _apply_batch(batch_id)
+
+async def _apply_batch(batch_id: str):
+    # Every event of the batch, not just those redelivered with it, so a retry repeats the same $incs
+    docs = await db.domain_events.find({"rollup_batch": batch_id, "rolled_up": False}, EVENT_FIELDS).to_list(None)
+    await update_rollups([DomainEvent(**d) for d in docs], batch_id)
+    await db.domain_events.update_many(
+        {"rollup_batch": batch_id, "rolled_up": False},
+        {"$set": {"rolled_up": True}, "$unset": {"rollup_batch": ""}},
+    )
+
+async def unrolled_event_ids(event_ids) -> set:
+    """
+    Which of these stored events still lack their rollups.
+    """
+    return set(await db.domain_events.distinct("event_id", {"event_id": {"$in": list(event_ids)}, "rolled_up": False}))
+
+async def sweep_unrolled(lag_seconds: float = ROLLUP_SWEEP_LAG_SECONDS) -> int:
+    """
+    Apply rollups for events stored at least lag_seconds ago that were never
+    flagged rolled_up (their batch failed and was not redelivered). Returns the
+    number of events swept.
+    """
+    cutoff = ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(seconds=lag_seconds))
+    swept = 0
+    while True:
+        docs = await db.domain_events.find(
+            {"rolled_up": False, "_id": {"$lt": cutoff}}, EVENT_FIELDS
+        ).sort("_id", 1).limit(ROLLUP_SWEEP_BATCH).to_list(None)
+        if not docs:
+            return swept
+        await apply_rollups([DomainEvent(**d) for d in docs])
+        swept += len(docs)
+
+async def run_rollup_sweeper(interval: float = ROLLUP_SWEEP_INTERVAL_SECONDS):
+    while True:
+        try:
+            swept = await sweep_unrolled()
+            if swept:
+                print(f"[Rollups] swept {swept} events missing from the rollups")
+        except Exception as e:
+            print(f"[Rollups] sweep failed: {e}")
+            swept = 0
+        metrics["sweeps"] += 1
+        metrics["swept_total"] += swept
+        metrics["last_sweep_at"] = time.time()
+        await asyncio.sleep(interval)
+
+def _rollup_query(tenant_id: str, granularity: str, domain: str = None, action: str = None, start=None, end=None) -> dict:
+    query = {"tenant_id": tenant_id, "granularity": granularity}
+    if domain:
+        query["domain"] = domain
+    if action:
+        query["action"] = action
+    if start or end:
+        query["bucket"] = {}
+        if start:
+            query["bucket"]["$gte"] = bucket_start(start, granularity)
+        if end:
+            query["bucket"]["$lte"] = end
+    return query
+
+async def report_from_rollups(tenant_id: str, domain: str, start: datetime, end: datetime, granularity: str = "day", action: str = None):
+    """
+    Totals plus per-bucket rows for a period, read from rollups only.
+    Partial buckets at the edges are included whole.
+    """
+    cursor = db[ROLLUPS_COLL_NAME].find(
+        _rollup_query(tenant_id, granularity, domain, action, start, end),
+        {"_id": 0, "tenant_id": 0, "granularity": 0, "domain": 0, "applied_batches": 0},
+    ).sort("bucket", 1)
+    buckets = await cursor.to_list(None)
+    totals = {"count": 0, "revenue": 0.0, "quantity": 0, "payment_methods": defaultdict(int)}
+    for b in buckets:
+        totals["count"] += b.get("count", 0)
+        totals["revenue"] += b.get("revenue", 0)
+        totals["quantity"] += b.get("quantity", 0)
+        for method, n in (b.get("payment_methods") or {}).items():
+            totals["payment_methods"][method] += n
+    totals["payment_methods"] = dict(totals["payment_methods"])
+    return {"totals": totals, "buckets": buckets}
+
+async def count_from_rollups(tenant_id: str, domain: str = None, action: str = None) -> int:
+    pipeline = [
+        {"$match": _rollup_query(tenant_id, "day", domain, action)},
+        {"$group": {"_id": None, "count": {"$sum": "$count"}}},
+    ]
+    result = await db[ROLLUPS_COLL_NAME].aggregate(pipeline).to_list(1)
+    return int(result[0]["count"]) if result else 0
+
+async def rebuild_rollups(tenant_id: str = None, since: datetime = None):
+    """
+    Recompute rollups from domain_events server-side ($group + $merge).
+    `since` (day-aligned) limits the rebuild to buckets from that point on, so
+    rollups for months already archived out of domain_events are kept.
+    Returns the number of rollup documents written.
+    """
+    match = {"tenant_id": tenant_id} if tenant_id else {}
+    rollup_match = dict(match)
+    if since:
+        since = bucket_start(since, "day")
+        match["timestamp"] = {"$gte": since}
+        rollup_match["bucket"] = {"$gte": since}
+    # Everything rebuilt here is counted by the $group below, so the sweep must not add it again
+    await db.domain_events.update_many({**match, "rolled_up": False}, {"$set": {"rolled_up": True}, "$unset": {"rollup_batch": ""}})
+    await db[ROLLUPS_COLL_NAME].delete_many(rollup_match)
+    for granularity in GRANULARITIES:
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {
+                    "tenant_id": "$tenant_id",
+                    "event_type": "$event_type",
+                    "bucket": {"$dateTrunc": {"date": "$timestamp", "unit": granularity}},
+                    "method": {"$ifNull": ["$payload.payment_method", "$payload.method"]},
+                },
+                "count": {"$sum": 1},
+                "revenue": {"$sum": {"$toDouble": {"$ifNull": ["$payload.total_price", {"$ifNull": ["$payload.amount", 0]}]}}},
+                "quantity": {"$sum": {"$ifNull": ["$payload.quantity", 0]}},
+            }},
+            {"$group": {
+                "_id": {"tenant_id": "$_id.tenant_id", "event_type": "$_id.event_type", "bucket": "$_id.bucket"},
+                "count": {"$sum": "$count"},
+                "revenue": {"$sum": "$revenue"},
+                "quantity": {"$sum": "$quantity"},
+                "methods": {"$push": {"k": "$_id.method", "count": "$count", "revenue": "$revenue"}},
+            }},
+            {"$set": {
+                "methods": {"$filter": {"input": "$methods", "cond": {"$ne": ["$$this.k", None]}}},
+                "dot": {"$indexOfBytes": ["$_id.event_type", "."]},
+            }},
+            {"$project": {
+                "_id": 0,
+                "tenant_id": "$_id.tenant_id",
+                "event_type": "$_id.event_type",
+                "domain": {"$cond": [{"$lt": ["$dot", 0]}, "$_id.event_type",
+                                     {"$substrBytes": ["$_id.event_type", 0, "$dot"]}]},
+                "action": {"$cond": [{"$lt": ["$dot", 0]}, "",
+                                     {"$substrBytes": ["$_id.event_type", {"$add": ["$dot", 1]}, -1]}]},
+                "granularity": {"$literal": granularity},
+                "bucket": "$_id.bucket",
+                "count": 1,
+                "revenue": 1,
+                "quantity": 1,
+                "payment_methods": {"$arrayToObject": {"$map": {"input": "$methods", "in": {"k": "$$this.k", "v": "$$this.count"}}}},
+                "revenue_by_method": {"$arrayToObject": {"$map": {"input": "$methods", "in": {"k": "$$this.k", "v": "$$this.revenue"}}}},
+            }},
+            {"$merge": {
+                "into": ROLLUPS_COLL_NAME,
+                "on": ["tenant_id", "event_type", "granularity", "bucket"],
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }},
+        ]
+        await db.domain_events.aggregate(pipeline).to_list(None)
+    return await db[ROLLUPS_COLL_NAME].count_documents(rollup_match)
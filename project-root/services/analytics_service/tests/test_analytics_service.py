@@ -0,0 +1,93 @@
+import os
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from pymongo import MongoClient
+from app.main import app
+from indexes import INDEXES
+from models import DomainEvent, split_event_type
+from report_stream import EVENT_PROJECTION, EVENT_SORT, encode_cursor, events_filter, events_query, hot_events_query
+
+client = TestClient(app)
+
+TENANT_ID = "test_analytics_tenant"
+START = datetime(2024, 1, 1)
+
+@pytest.fixture(scope="module")
+def events_coll():
+    mongo = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    db = mongo["analytics_db"]
+    for coll_name, models in INDEXES.items():
+        db[coll_name].create_indexes(models)
+    db.domain_events.delete_many({"tenant_id": TENANT_ID})
+    event_types = ["sale.created", "payment.received", "inventory.updated", "gst.invoice.generated"]
+    db.domain_events.insert_many([
+        DomainEvent(
+            event_id=f"test-{i}", event_type=event_types[i % len(event_types)], tenant_id=TENANT_ID,
+            payload={"total_price": 10}, timestamp=START + timedelta(minutes=i),
+        ).dict()
+        for i in range(2000)
+    ])
+    yield db.domain_events
+    db.domain_events.delete_many({"tenant_id": TENANT_ID})
+    mongo.close()
+
+def _stages(plan):
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _stages(child)
+    return stages
+
+def _report_cursor(coll, query, cursor=None):
+    # Exactly what report_stream.iter_events sends to Mongo
+    return coll.find(hot_events_query(events_query(query, cursor)), EVENT_PROJECTION).sort(EVENT_SORT)
+
+def _winning_stages(cursor):
+    planner = cursor.explain()["queryPlanner"]
+    return _stages(planner["winningPlan"])
+
+def test_split_event_type():
+    assert split_event_type("sale.created") == ("sale", "created")
+    assert split_event_type("gst.invoice.generated") == ("gst", "invoice.generated")
+    assert split_event_type("heartbeat") == ("heartbeat", "")
+
+def test_domain_event_is_normalized():
+    event = DomainEvent(event_id="e1", event_type="payment.received", tenant_id=TENANT_ID,
+                        payload={}, timestamp=START)
+    assert (event.domain, event.action) == ("payment", "received")
+
+def test_domain_filter_uses_index(events_coll):
+    query = events_filter(TENANT_ID, "sale", START, START + timedelta(days=2))
+    stages = _winning_stages(_report_cursor(events_coll, query))
+    assert "IXSCAN" in stages
+    assert "COLLSCAN" not in stages
+    assert "SORT" not in stages  # the index supplies the keyset order
+    # Later pages add the keyset condition
+    first = events_coll.find_one(query, sort=EVENT_SORT)
+    stages = _winning_stages(_report_cursor(events_coll, query, encode_cursor(first)))
+    assert "IXSCAN" in stages
+    assert "COLLSCAN" not in stages
+
+def test_domain_action_filter_uses_index(events_coll):
+    query = events_filter(TENANT_ID, "gst", START, START + timedelta(days=2), action="invoice.generated")
+    stages = _winning_stages(_report_cursor(events_coll, query))
+    assert "IXSCAN" in stages
+    assert "COLLSCAN" not in stages
+
+def test_domain_filter_counts(events_coll):
+    query = events_filter(TENANT_ID, "sale", START, START + timedelta(days=2))
+    assert events_coll.count_documents(query) == 500
+
+def test_report_events_by_domain(events_coll):
+    resp = client.post("/reports/events?format=json&page_size=5", json={
+        "tenant_id": TENANT_ID, "report_type": "sale_summary",
+        "period_start": START.isoformat(), "period_end": (START + timedelta(days=2)).isoformat(),
+    })
+    assert resp.status_code == 200
+    body = resp.json()
+    assert len(body["events"]) == 5
+    assert all(e["domain"] == "sale" for e in body["events"])
+    assert body["next_cursor"]
@@ -0,0 +1,85 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+import pytest
+from pymongo import MongoClient
+import archive
+from indexes import INDEXES
+from models import DomainEvent
+
+MONTH = datetime(2024, 1, 1)
+
+def test_archive_path_cannot_escape_archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path))
+    root = os.path.realpath(tmp_path)
+    for tenant_id, domain in [("../../etc", "sale"), ("t1", "../../../passwd"), ("..", ".."),
+                              ("a/b", "c/d"), ("/abs", "/abs"), (".", "x\\..\\y")]:
+        path = os.path.realpath(archive.archive_path(tenant_id, domain, MONTH))
+        assert os.path.commonpath([root, path]) == root
+        # tenant / month / file: nothing collapses or adds a level
+        assert len(os.path.relpath(path, root).split(os.sep)) == 3
+
+def test_archive_path_keeps_ids_distinct(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path))
+    assert archive.archive_path("a/b", "sale", MONTH) != archive.archive_path("a%2Fb", "sale", MONTH)
+    assert archive.archive_path("t1", "sale", MONTH) == os.path.join(str(tmp_path), "t1", "2024-01", "sale.ndjson.gz")
+
+ARCHIVE_TENANT = "test_archive_tenant"
+
+@pytest.fixture
+def archive_env(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path))
+    mongo = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    db = mongo["analytics_db"]
+    for coll_name, models in INDEXES.items():
+        db[coll_name].create_indexes(models)
+    db.domain_events.delete_many({"tenant_id": ARCHIVE_TENANT})
+    db.domain_events.insert_many([
+        DomainEvent(
+            event_id=f"archive-{i}", event_type="sale.created", tenant_id=ARCHIVE_TENANT,
+            payload={"total_price": i}, timestamp=MONTH + timedelta(days=i),
+        ).dict()
+        for i in range(3)
+    ] + [
+        DomainEvent(
+            event_id="archive-feb", event_type="sale.created", tenant_id=ARCHIVE_TENANT,
+            payload={"total_price": 9}, timestamp=datetime(2024, 2, 1),
+        ).dict()
+    ])
+    yield db
+    db.domain_events.delete_many({"tenant_id": ARCHIVE_TENANT})
+    mongo.close()
+
+def _archived_ids(tenant_id, domain, month):
+    return [d["event_id"] for d in archive._read_file(archive.archive_path(tenant_id, domain, month))]
+
+def test_archive_boundary_keeps_hot_window(monkeypatch):
+    monkeypatch.setattr(archive, "HOT_RETENTION_DAYS", 90)
+    assert archive.archive_boundary(datetime(2024, 6, 15, 12)) == datetime(2024, 3, 1)
+
+def test_archive_month_exports_then_sets_ttl(archive_env):
+    coll = archive_env.domain_events
+    assert archive.archive_month(archive_env, ARCHIVE_TENANT, "sale", MONTH) == 3
+    assert _archived_ids(ARCHIVE_TENANT, "sale", MONTH) == ["archive-0", "archive-1", "archive-2"]
+    # Archived events carry expire_at for the TTL index; the next month is untouched
+    assert coll.count_documents({"tenant_id": ARCHIVE_TENANT, "expire_at": {"$ne": None}}) == 3
+    assert coll.find_one({"event_id": "archive-feb"}).get("expire_at") is None
+    assert coll.index_information()["expire_at_1"]["expireAfterSeconds"] == 0
+    # Already archived: nothing to do on the next run
+    assert archive.archive_month(archive_env, ARCHIVE_TENANT, "sale", MONTH) == 0
+
+def test_archive_month_rerun_does_not_duplicate(archive_env):
+    archive.archive_month(archive_env, ARCHIVE_TENANT, "sale", MONTH)
+    # A run that died after writing the file but before stamping expire_at
+    archive_env.domain_events.update_one({"event_id": "archive-1"}, {"$unset": {"expire_at": ""}})
+    assert archive.archive_month(archive_env, ARCHIVE_TENANT, "sale", MONTH) == 1
+    assert _archived_ids(ARCHIVE_TENANT, "sale", MONTH) == ["archive-0", "archive-1", "archive-2"]
+
+def test_iter_archived_events_filters_range(archive_env):
+    archive.archive_month(archive_env, ARCHIVE_TENANT, "sale", MONTH)
+
+    async def collect():
+        return [d["event_id"] async for d in archive.iter_archived_events(
+            ARCHIVE_TENANT, "sale", MONTH + timedelta(days=1), datetime(2024, 1, 31))]
+
+    assert asyncio.run(collect()) == ["archive-1", "archive-2"]
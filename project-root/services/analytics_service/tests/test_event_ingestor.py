@@ -0,0 +1,101 @@
+import asyncio
+import json
+import pytest
+from collections import namedtuple
+from datetime import datetime
+import event_ingestor
+
+TopicPartition = namedtuple("TopicPartition", "topic partition")
+Message = namedtuple("Message", "topic partition offset value")
+
+class FakeConsumer:
+    """
+    Stands in for AIOKafkaConsumer: hands out its partition's uncommitted batch,
+    the way Kafka redelivers to a restarted consumer.
+    """
+    committed = {}
+
+    def __init__(self, partition):
+        self.tp = TopicPartition("sale.created", partition)
+        self.stopped = False
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        self.stopped = True
+
+    async def getmany(self, timeout_ms=0, max_records=None):
+        await asyncio.sleep(0.01)
+        if self.tp in FakeConsumer.committed:
+            return {}
+        event = {"event_id": f"p{self.tp.partition}-0", "event_type": "sale.created", "tenant_id": "t1",
+                 "payload": {}, "timestamp": datetime(2024, 1, 1).isoformat()}
+        return {self.tp: [Message(self.tp.topic, self.tp.partition, 0, json.dumps(event))]}
+
+    async def commit(self, offsets):
+        FakeConsumer.committed.update(offsets)
+
+def test_failing_batch_does_not_kill_the_pool(monkeypatch):
+    FakeConsumer.committed = {}
+    created, stored = [], []
+
+    def new_consumer():
+        # Consumers come up alternately on partitions 0 and 1
+        consumer = FakeConsumer(len(created) % 2)
+        created.append(consumer)
+        return consumer
+
+    async def store_events(events):
+        if not stored:
+            stored.append(None)
+            raise RuntimeError("Mongo unavailable")
+        stored.extend(e.event_id for e in events)
+        return len(events)
+
+    monkeypatch.setattr(event_ingestor, "_new_consumer", new_consumer)
+    monkeypatch.setattr(event_ingestor, "store_events", store_events)
+    monkeypatch.setattr(event_ingestor, "INGEST_RESTART_BACKOFF_SECONDS", 0.01)
+    restarts = event_ingestor.consumer_metrics["restarts"]
+
+    async def run():
+        pool = asyncio.create_task(event_ingestor.run_consumers(2))
+        for _ in range(200):
+            if len(FakeConsumer.committed) == 2:
+                break
+            await asyncio.sleep(0.01)
+        alive = not pool.done()
+        pool.cancel()
+        try:
+            await pool
+        except asyncio.CancelledError:
+            pass
+        return alive
+
+    assert asyncio.run(run())
+    # The failed consumer was stopped and replaced, and its batch re-read and committed
+    assert len(created) == 3
+    assert created[0].stopped
+    assert sorted(stored[1:]) == ["p0-0", "p1-0"]
+    assert FakeConsumer.committed == {TopicPartition("sale.created", 0): 1, TopicPartition("sale.created", 1): 1}
+    assert event_ingestor.consumer_metrics["restarts"] == restarts + 1
+
+def test_writer_failure_with_full_queue_is_raised(monkeypatch):
+    FakeConsumer.committed = {}
+    consumer = FakeConsumer(0)
+
+    async def store_events(events):
+        # Slow enough for the fetch loop to fill the queue and block on put
+        await asyncio.sleep(0.1)
+        raise RuntimeError("Mongo unavailable")
+
+    monkeypatch.setattr(event_ingestor, "store_events", store_events)
+    monkeypatch.setattr(event_ingestor, "INGEST_QUEUE_BATCHES", 1)
+
+    async def run():
+        with pytest.raises(RuntimeError, match="Mongo unavailable"):
+            await asyncio.wait_for(event_ingestor.consume_events(consumer), timeout=2)
+
+    asyncio.run(run())
+    assert consumer.stopped
+    assert FakeConsumer.committed == {}
@@ -0,0 +1,18 @@
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from retail_db import ensure_indexes as ensure_declared_indexes
+from db.mongo import get_db
+
+# Every index this service relies on, per collection. Applied once at startup
+# (see main.py lifespan) so request handlers never issue DDL; creation and drift
+# reporting live in the shared retail_db index manager.
+INDEXES = {
+    "items": [
+        IndexModel([("tenant_id", ASCENDING), ("item_id", ASCENDING)], unique=True),
+    ],
+    "audit_log": [
+        IndexModel([("tenant_id", ASCENDING), ("timestamp", DESCENDING)]),
+    ],
+}
+
+def ensure_indexes(db=None):
+    return ensure_declared_indexes(db if db is not None else get_db(), INDEXES)
@@ -1,98 +1,127 @@
-from pymongo import MongoClient, ASCENDING
 from datetime import datetime
-import os
+from pymongo import ReturnDocument
+from db.mongo import get_async_db
 
-MONGO_URI = os.getenv("INVENTORY_MONGO_URI", "mongodb://localhost:27017")
-DB_NAME = os.getenv("INVENTORY_DB_NAME", "inventory_service_db")
 COLL_NAME = "items"
 AUDIT_COLL_NAME = "audit_log"  # For mutation audit trails
 
-def get_inventory_collection():
-    client = MongoClient(MONGO_URI)
-    db = client[DB_NAME]
-    collection = db[COLL_NAME]
-    # Ensure compound index for (tenant_id, item_id), unique per tenant
-    collection.create_index([("tenant_id", ASCENDING), ("item_id", ASCENDING)], unique=True)
-    return collection
-
-def get_audit_collection():
-    client = MongoClient(MONGO_URI)
-    db = client[DB_NAME]
-    return db[AUDIT_COLL_NAME]
-
-def log_audit_event(tenant_id, event, data):
+class InventoryRepository:
     """
-    Write audit event (for compliance, ops, trace) — extend to notification/events as needed.
+    Async (Motor) data access for inventory items and their audit trail.
+    Indexes (unique (tenant_id, item_id)) are declared in db/indexes.py and applied at startup.
     """
-    audit_collection = get_audit_collection()
-    doc = {
-        "tenant_id": tenant_id,
-        "event": event,
-        "data": data,
-        "timestamp": datetime.utcnow().isoformat()
-    }
-    audit_collection.insert_one(doc)
 
-def add_item(item):
-    collection = get_inventory_collection()
-    doc = item.dict()
-    doc["last_updated"] = datetime.utcnow().isoformat()
-    collection.insert_one(doc)
-    log_audit_event(doc["tenant_id"], "add_item", {"item_id": doc["item_id"]})
-    return doc["item_id"]
+    @property
+    def items(self):
+        return get_async_db()[COLL_NAME]
 
-def get_item(tenant_id: str, item_id: str):
-    collection = get_inventory_collection()
-    doc = collection.find_one({"tenant_id": tenant_id, "item_id": item_id})
-    if doc:
-        doc.pop("_id", None)
-    return doc
+    @property
+    def audit(self):
+        return get_async_db()[AUDIT_COLL_NAME]
 
-def get_all_items(tenant_id: str):
-    collection = get_inventory_collection()
-    result = collection.find({"tenant_id": tenant_id})
-    return [{k: v for k, v in doc.items() if k != "_id"} for doc in result]
+    async def log_audit_event(self, tenant_id, event, data):
+        """
+        Write audit event (for compliance, ops, trace) — extend to notification/events as needed.
+        """
+        doc = {
+            "tenant_id": tenant_id,
+            "event": event,
+            "data": data,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        await self.audit.insert_one(doc)
 
-def update_item(tenant_id: str, item_id: str, item):
-    collection = get_inventory_collection()
-    update_data = {k: v for k, v in item.dict().items() if v is not None and k != "tenant_id"}
-    if update_data:
-        update_data["last_updated"] = datetime.utcnow().isoformat()
-        collection.update_one({"tenant_id": tenant_id, "item_id": item_id}, {"$set": update_data})
-        log_audit_event(tenant_id, "update_item", {"item_id": item_id, "fields": list(update_data.keys())})
+    async def add_item(self, item):
+        doc = item.dict()
+        doc["last_updated"] = datetime.utcnow().isoformat()
+        await self.items.insert_one(doc)
+        await self.log_audit_event(doc["tenant_id"], "add_item", {"item_id": doc["item_id"]})
+        return doc["item_id"]
 
-def delete_item(tenant_id: str, item_id: str):
-    collection = get_inventory_collection()
-    collection.delete_one({"tenant_id": tenant_id, "item_id": item_id})
-    log_audit_event(tenant_id, "delete_item", {"item_id": item_id})
+    async def get_item(self, tenant_id: str, item_id: str):
+        return await self.items.find_one({"tenant_id": tenant_id, "item_id": item_id}, {"_id": 0})
 
-def adjust_stock(tenant_id: str, item_id: str, delta: int):
-    collection = get_inventory_collection()
-    item = collection.find_one({"tenant_id": tenant_id, "item_id": item_id})
-    if not item:
-        raise ValueError("Item not found")
-    new_qty = item["quantity"] + delta
-    if new_qty < 0:
-        raise ValueError("Stock cannot go negative")
-    # Proceed with atomic update
-    collection.update_one(
-        {"tenant_id": tenant_id, "item_id": item_id},
-        {
-            "$set": {
-                "quantity": new_qty,
-                "last_updated": datetime.utcnow().isoformat()
-            }
-        }
-    )
-    log_audit_event(tenant_id, "adjust_stock", {"item_id": item_id, "delta": delta, "result_qty": new_qty})
-    # Optional: log low-stock alert for future eventing
-    if new_qty <= item["min_quantity"]:
-        log_audit_event(tenant_id, "low_stock_alert", {"item_id": item_id, "quantity": new_qty})
+    async def get_all_items(self, tenant_id: str):
+        return await self.items.find({"tenant_id": tenant_id}, {"_id": 0}).to_list(None)
+
+    async def update_item(self, tenant_id: str, item_id: str, item):
+        update_data = {k: v for k, v in item.dict().items() if v is not None and k != "tenant_id"}
+        if update_data:
+            update_data["last_updated"] = datetime.utcnow().isoformat()
+            await self.items.update_one({"tenant_id": tenant_id, "item_id": item_id}, {"$set": update_data})
+            await self.log_audit_event(tenant_id, "update_item", {"item_id": item_id, "fields": list(update_data.keys())})
+
+    async def delete_item(self, tenant_id: str, item_id: str):
+        await self.items.delete_one({"tenant_id": tenant_id, "item_id": item_id})
+        await self.log_audit_event(tenant_id, "delete_item", {"item_id": item_id})
+
+    async def adjust_stock(self, tenant_id: str, item_id: str, delta: int):
+        """
+        Atomically apply a stock delta in one round trip and return the updated item.
+        Decrements are guarded server-side (quantity >= -delta) so concurrent sales
+        can never drive stock negative or lose an update.
+        Returns None if the item does not exist; raises ValueError if stock would go negative.
+        """
+        query = {"tenant_id": tenant_id, "item_id": item_id}
+        if delta < 0:
+            query["quantity"] = {"$gte": -delta}
+        item = await self.items.find_one_and_update(
+            query,
+            {
+                "$inc": {"quantity": delta},
+                "$set": {"last_updated": datetime.utcnow().isoformat()}
+            },
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+        if not item:
+            # Only the failure path pays for a second read, to tell the two cases apart
+            if await self.items.count_documents({"tenant_id": tenant_id, "item_id": item_id}, limit=1) == 0:
+                return None
+            raise ValueError("Stock cannot go negative")
+        new_qty = item["quantity"]
+        await self.log_audit_event(tenant_id, "adjust_stock", {"item_id": item_id, "delta": delta, "result_qty": new_qty})
+        # Optional: log low-stock alert for future eventing
+        if new_qty <= item["min_quantity"]:
+            await self.log_audit_event(tenant_id, "low_stock_alert", {"item_id": item_id, "quantity": new_qty})
+        return item
+
+    async def reserve_stock(self, tenant_id: str, reservations):
+        """
+        Check-and-deduct stock for several items in one call (one sale or a batch).
+        Quantities for the same item are coalesced into a single guarded decrement.
+        Returns one result dict per item_id: status is "reserved", "insufficient" or "not_found".
+        """
+        wanted = {}
+        for r in reservations:
+            wanted[r.item_id] = wanted.get(r.item_id, 0) + r.quantity
+        results = []
+        for item_id, qty in wanted.items():
+            try:
+                item = await self.adjust_stock(tenant_id, item_id, -qty)
+            except ValueError:
+                current = await self.items.find_one(
+                    {"tenant_id": tenant_id, "item_id": item_id},
+                    {"_id": 0, "quantity": 1, "min_quantity": 1},
+                ) or {}
+                results.append({"item_id": item_id, "status": "insufficient", **current})
+                continue
+            if not item:
+                results.append({"item_id": item_id, "status": "not_found"})
+                continue
+            results.append({
+                "item_id": item_id,
+                "status": "reserved",
+                "quantity": item["quantity"],
+                "min_quantity": item["min_quantity"],
+            })
+        return results
+
+    async def get_low_stock_items(self, tenant_id: str):
+        cursor = self.items.find({
+            "tenant_id": tenant_id,
+            "$expr": {"$lte": ["$quantity", "$min_quantity"]}
+        }, {"_id": 0})
+        return await cursor.to_list(None)
 
-def get_low_stock_items(tenant_id: str):
-    collection = get_inventory_collection()
-    result = collection.find({
-        "tenant_id": tenant_id,
-        "$expr": {"$lte": ["$quantity", "$min_quantity"]}
-    })
-    return [{k: v for k, v in doc.items() if k != "_id"} for doc in result]
+inventory_repo = InventoryRepository()
@@ -0,0 +1,15 @@
+# Pooled Mongo clients for this service, configured from INVENTORY_MONGO_URI,
+# INVENTORY_DB_NAME and the INVENTORY_MONGO_* pool settings (see retail_db.MongoClients).
+from retail_db import MongoClients
+
+_clients = MongoClients("INVENTORY", "inventory_service_db")
+
+MONGO_URI = _clients.uri
+DB_NAME = _clients.db_name
+
+get_client = _clients.get_client
+get_db = _clients.get_db
+close_client = _clients.close_client
+get_async_client = _clients.get_async_client
+get_async_db = _clients.get_async_db
+close_async_client = _clients.close_async_client
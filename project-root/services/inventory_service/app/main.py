@@ -1,7 +1,22 @@
 from fastapi import FastAPI
 from api import inventory
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
+from db.mongo import get_client, close_client, get_async_client, close_async_client
+from db.indexes import ensure_indexes
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: build the pooled Mongo clients (Motor for request handlers) and apply declared indexes
+    get_client()
+    get_async_client()
+    ensure_indexes()
+    yield
+    # Shutdown: release pooled connections
+    close_async_client()
+    close_client()
+
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(inventory.router)
 app.mount("/static", StaticFiles(directory="static"), name="static")
\ No newline at end of file
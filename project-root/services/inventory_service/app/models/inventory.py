@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, Literal, List
 
 class ItemCreate(BaseModel):
     tenant_id: str = Field(..., description="Tenant identifier for data isolation")
@@ -29,3 +29,17 @@ class ItemOut(BaseModel):
     min_quantity: int
     description: Optional[str] = None
     last_updated: Optional[str] = None
+
+class StockReservation(BaseModel):
+    item_id: str
+    quantity: int = Field(..., gt=0)
+
+class ReservationRequest(BaseModel):
+    tenant_id: str = Field(..., description="Tenant identifier for data isolation")
+    items: List[StockReservation]
+
+class ReservationResult(BaseModel):
+    item_id: str
+    status: Literal["reserved", "insufficient", "not_found"]
+    quantity: Optional[int] = None        # Stock left after reserving (or currently available)
+    min_quantity: Optional[int] = None
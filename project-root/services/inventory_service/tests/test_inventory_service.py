@@ -44,3 +44,30 @@ def test_delete_item():
     iid = item["id"]
     resp2 = client.delete(f"/items/{iid}")
     assert resp2.status_code == 204
+
+def test_concurrent_stock_decrements_lose_no_updates():
+    from concurrent.futures import ThreadPoolExecutor
+
+    tenant_id, item_id = "stress_tenant", "stress-sku"
+    client.delete(f"/items/{item_id}", params={"tenant_id": tenant_id})
+    stock, attempts = 100, 200
+    resp = client.post("/items", json={
+        "tenant_id": tenant_id, "item_id": item_id, "item_name": "Stress Pen",
+        "quantity": stock, "min_quantity": 0
+    })
+    assert resp.status_code == 201
+
+    def sell_one(_):
+        r = client.patch(f"/items/{item_id}/stock", params={"tenant_id": tenant_id},
+                         json={"tenant_id": tenant_id, "delta": -1})
+        return r.status_code
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        codes = list(pool.map(sell_one, range(attempts)))
+
+    # Exactly `stock` sales succeed, the rest are rejected, and nothing goes negative
+    assert codes.count(200) == stock
+    assert codes.count(409) == attempts - stock
+    final = client.get(f"/items/{item_id}", params={"tenant_id": tenant_id})
+    assert final.json()["quantity"] == 0
+    client.delete(f"/items/{item_id}", params={"tenant_id": tenant_id})
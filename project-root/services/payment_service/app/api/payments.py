@@ -1,20 +1,14 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from models.payment import PaymentCreate, PaymentOut, PaymentStatusUpdate, PaymentSummaryOut
-from db.payments_db import (
-    create_payment,
-    get_payment,
-    list_payments,
-    update_payment_status,
-    payment_summary,
-)
+from db.payments_db import payments_repo
 from core.upi_utils import generate_upi_qr
-from core.auth_utils import get_current_user
+from retail_auth import get_current_user
 from datetime import datetime
 
 router = APIRouter()
 
 @router.post("/payments", response_model=PaymentOut, status_code=201)
-def initiate_payment(
+async def initiate_payment(
     payment: PaymentCreate,
     current_user: dict = Depends(get_current_user),
     tenant_id: str = Query(..., description="Tenant ID"),
@@ -22,34 +16,34 @@ def initiate_payment(
     # Ensure all payments are for the current tenant
     if payment.tenant_id != tenant_id:
         raise HTTPException(status_code=400, detail="tenant_id mismatch")
-    new_payment = create_payment(payment)
+    new_payment = await payments_repo.create_payment(payment)
     # UPI mode: generate QR (business logic only; actual live integration elsewhere)
     if payment.method == "UPI":
         new_payment["upi_qr"] = generate_upi_qr(payment.upi_vpa, float(payment.amount))
     return PaymentOut(**new_payment)
 
 @router.get("/payments", response_model=list[PaymentOut])
-def get_all_payments(
+async def get_all_payments(
     current_user: dict = Depends(get_current_user),
     tenant_id: str = Query(..., description="Tenant ID"),
     user: str = Query(None, description="Filter by user (optional)"),
 ):
-    payments = list_payments(tenant_id=tenant_id, user=user or current_user["username"])
+    payments = await payments_repo.list_payments(tenant_id=tenant_id, user=user or current_user["username"])
     return [PaymentOut(**p) for p in payments]
 
 @router.get("/payments/{payment_id}", response_model=PaymentOut)
-def get_payment_status(
+async def get_payment_status(
     payment_id: str,
     tenant_id: str = Query(..., description="Tenant ID"),
     current_user: dict = Depends(get_current_user),
 ):
-    payment = get_payment(tenant_id, payment_id)
+    payment = await payments_repo.get_payment(tenant_id, payment_id)
     if not payment or payment["user"] != current_user["username"]:
         raise HTTPException(status_code=404, detail="Payment not found")
     return PaymentOut(**payment)
 
 @router.patch("/payments/{payment_id}/status", response_model=PaymentOut)
-def update_status(
+async def update_status(
     payment_id: str,
     patch: PaymentStatusUpdate,
     tenant_id: str = Query(..., description="Tenant ID"),
@@ -57,7 +51,7 @@ def update_status(
 ):
     if patch.tenant_id != tenant_id or patch.payment_id != payment_id:
         raise HTTPException(status_code=400, detail="tenant_id or payment_id mismatch")
-    updated = update_payment_status(
+    updated = await payments_repo.update_payment_status(
         tenant_id=tenant_id,
         payment_id=payment_id,
         status=patch.status,
@@ -66,16 +60,16 @@ def update_status(
     )
     if not updated:
         raise HTTPException(status_code=404, detail="Payment not found or update failed")
-    payment = get_payment(tenant_id, payment_id)
+    payment = await payments_repo.get_payment(tenant_id, payment_id)
     return PaymentOut(**payment)
 
 @router.get("/payments/summary", response_model=PaymentSummaryOut)
-def get_payment_summary(
+async def get_payment_summary(
     tenant_id: str = Query(...),
     from_date: str = Query(..., description="YYYY-MM-DD"),
     to_date: str = Query(..., description="YYYY-MM-DD")
 ):
     from_dt = datetime.strptime(from_date, "%Y-%m-%d")
     to_dt = datetime.strptime(to_date, "%Y-%m-%d")
-    summary = payment_summary(tenant_id, from_dt, to_dt)
+    summary = await payments_repo.payment_summary(tenant_id, from_dt, to_dt)
     return PaymentSummaryOut(**summary)
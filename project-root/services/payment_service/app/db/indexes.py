@@ -0,0 +1,18 @@
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from retail_db import ensure_indexes as ensure_declared_indexes
+from db.mongo import get_db
+
+# Every index this service relies on, per collection. Applied once at startup
+# (see main.py lifespan) so request handlers never issue DDL; creation and drift
+# reporting live in the shared retail_db index manager.
+INDEXES = {
+    "payments": [
+        IndexModel([("tenant_id", ASCENDING), ("payment_id", ASCENDING)], unique=True, sparse=True),
+        # list_payments / payment_summary: tenant-scoped, newest first
+        IndexModel([("tenant_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("tenant_id", ASCENDING), ("user", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+}
+
+def ensure_indexes(db=None):
+    return ensure_declared_indexes(db if db is not None else get_db(), INDEXES)
@@ -0,0 +1,19 @@
+# One-time migration: give payments written by the old insert-then-update path a payment_id.
+# Docs left without one (crash between the two writes) get str(_id), same as create_payment.
+#     python -m jobs.backfill_payment_ids
+from db.mongo import close_client
+from db.payments_db import get_payments_collection
+
+def main():
+    result = get_payments_collection().update_many(
+        {"$or": [{"payment_id": {"$exists": False}}, {"payment_id": None}]},
+        [{"$set": {"payment_id": {"$toString": "$_id"}}}],
+    )
+    print(f"[backfill_payment_ids] set payment_id on {result.modified_count} payments")
+    return result.modified_count
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        close_client()
@@ -1,16 +1,16 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks, Request
-from pydantic import BaseModel, Field, constr
+from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks, Request, Response
+from pydantic import BaseModel, Field, constr, field_validator
 from typing import List, Optional, Literal, Dict
-from datetime import datetime, date
-from uuid import uuid4
+from datetime import datetime, date, timedelta, timezone
+import os
+from collections import defaultdict
 
 # Dependency/mock imports for this example
-from core.auth_utils import get_current_user, get_current_tenant
-from db.sale_db import (
-    add_sale, get_sale, mark_udhaar_paid, get_sales_summary,
-    get_customer_udhaar_total, get_customer_credit_limit, set_customer_credit_limit,
-    set_pending_inventory_deduction, deduct_inventory, inventory_exists, get_available_stock
-)
+from retail_auth import get_current_user, get_current_tenant
+from retail_outbox import get_relay_metrics
+from core.inventory_client import inventory_client, InventoryUnavailable
+from jobs.pending_drainer import get_metrics as get_pending_drain_metrics
+from db.sale_db import sales_repo, InvalidCursor
 from utils.localization import get_message
 from utils.subscription import tenant_is_premium
 from utils.export_utils import export_sales_csv, export_sales_pdf
@@ -54,6 +54,40 @@ class SaleOut(BaseModel):
     stock_pending_deduction: Optional[bool] = None
     gst_invoice: Optional[dict] = None
 
+# Allowance for POS clocks running slightly ahead of the server
+SALE_CLOCK_SKEW = timedelta(seconds=int(os.getenv("SALES_CLOCK_SKEW_SECONDS", "120")))
+
+class SaleBatchItem(SaleCreate):
+    idempotency_key: str = Field(..., min_length=1, max_length=128)  # Stable per POS sale; makes replays safe
+    timestamp: Optional[datetime] = None  # When the sale happened on the POS; defaults to sync time
+
+    @field_validator("timestamp")
+    @classmethod
+    def timestamp_aware_and_past(cls, v):
+        if v is None:
+            return v
+        if v.tzinfo is None or v.utcoffset() is None:
+            raise ValueError("timestamp must include a timezone offset")
+        if v > datetime.now(timezone.utc) + SALE_CLOCK_SKEW:
+            raise ValueError("timestamp is in the future")
+        return v.astimezone(timezone.utc)
+
+class SaleBatchRequest(BaseModel):
+    sales: List[SaleBatchItem]
+
+class SaleBatchItemResult(BaseModel):
+    idempotency_key: str
+    status: Literal["created", "duplicate", "rejected"]
+    sale_id: Optional[str] = None
+    warning: Optional[str] = None
+    error: Optional[str] = None
+
+class SaleBatchOut(BaseModel):
+    created: int
+    duplicates: int
+    rejected: int
+    results: List[SaleBatchItemResult]
+
 class SalePaymentUpdate(BaseModel):
     tenant_id: str
     sale_id: str
@@ -70,54 +104,58 @@ def check_localized(request: Request, key: str, **kwargs):
 # --- Endpoints ---
 
 # Record a sale (supports credit, live stock deduction/warning)
+LOW_STOCK_THRESHOLD = 2
+
 @router.post("/sales", response_model=SaleOut)
-def create_sale(sale: SaleCreate, request: Request,
-                user=Depends(get_current_user),
-                tenant=Depends(get_current_tenant)):
+async def create_sale(sale: SaleCreate, request: Request,
+                      user=Depends(get_current_user),
+                      tenant=Depends(get_current_tenant)):
     # 1. Credit check if udhaar
     if sale.is_udhaar:
-        udhaar_total = get_customer_udhaar_total(sale.tenant_id, sale.establishment_id, sale.customer_id)
-        limit = get_customer_credit_limit(sale.tenant_id, sale.establishment_id, sale.customer_id)
+        udhaar_total = await sales_repo.get_customer_udhaar_total(sale.tenant_id, sale.establishment_id, sale.customer_id)
+        limit = await sales_repo.get_customer_credit_limit(sale.tenant_id, sale.establishment_id, sale.customer_id)
         if udhaar_total + (sale.quantity * sale.price_per_unit) > limit:
             raise HTTPException(400, check_localized(request, "udhaar_limit_breach"))
-    # 2. Stock management
-    stock_exists = inventory_exists(sale.tenant_id, sale.establishment_id, sale.item_id, sale.user)
+    # 2. Stock management: one check-and-reserve call to inventory_service
     stock_status_msg = None
     low_warn = False
     pending_stock = False
-    if stock_exists:
-        available = get_available_stock(sale.tenant_id, sale.establishment_id, sale.item_id, sale.user)
-        if available >= sale.quantity:
-            deduct_inventory(sale.tenant_id, sale.establishment_id, sale.item_id, sale.quantity, sale.user)
-            if available - sale.quantity <= 2:
-                stock_status_msg = check_localized(request, "low_stock_warn", item=sale.item_name)
-                low_warn = True
-        else:
-            stock_status_msg = check_localized(request, "insufficient_stock", item=sale.item_name)
-            pending_stock = True
-            set_pending_inventory_deduction(sale.tenant_id, sale.establishment_id, sale.item_id, sale.quantity, sale.user)
+    try:
+        reservations = await inventory_client.reserve(
+            sale.tenant_id, [{"item_id": sale.item_id, "quantity": sale.quantity}]
+        )
+        reservation = reservations.get(sale.item_id, {"status": "not_found"})
+    except InventoryUnavailable:
+        # Inventory down: never block the sale, queue the deduction instead
+        reservation = {"status": "not_found"}
+    if reservation["status"] == "reserved":
+        if reservation["quantity"] <= LOW_STOCK_THRESHOLD:
+            stock_status_msg = check_localized(request, "low_stock_warn", item=sale.item_name)
+            low_warn = True
+    elif reservation["status"] == "insufficient":
+        stock_status_msg = check_localized(request, "insufficient_stock", item=sale.item_name)
+        pending_stock = True
+        await sales_repo.set_pending_inventory_deduction(sale.tenant_id, sale.establishment_id, sale.item_id, sale.quantity, sale.user)
     else:
         # Allow sale, mark as pending inventory deduction
         pending_stock = True
-        set_pending_inventory_deduction(sale.tenant_id, sale.establishment_id, sale.item_id, sale.quantity, sale.user)
+        await sales_repo.set_pending_inventory_deduction(sale.tenant_id, sale.establishment_id, sale.item_id, sale.quantity, sale.user)
         stock_status_msg = check_localized(request, "item_not_in_inventory", item=sale.item_name)
     # 3. Save sale record
     sale_data = sale.dict()
-    sale_data["sale_id"] = str(uuid4())
     sale_data["total_price"] = sale.quantity * sale.price_per_unit
-    sale_data["timestamp"] = datetime.utcnow()
     sale_data["low_stock_warn"] = low_warn
     sale_data["stock_pending_deduction"] = pending_stock
-    out = add_sale(sale_data)
+    out = await sales_repo.add_sale(sale_data)
     if stock_status_msg:
         out["warning"] = stock_status_msg
     return out
 
 # Mark udhaar as paid (credit repayment)
 @router.patch("/sales/{sale_id}/receive_payment", response_model=SaleOut)
-def receive_udhaar_payment(sale_id: str, update: SalePaymentUpdate, request: Request,
-                           user=Depends(get_current_user), tenant=Depends(get_current_tenant)):
-    updated = mark_udhaar_paid(
+async def receive_udhaar_payment(sale_id: str, update: SalePaymentUpdate, request: Request,
+                                 user=Depends(get_current_user), tenant=Depends(get_current_tenant)):
+    updated = await sales_repo.mark_udhaar_paid(
         tenant_id=update.tenant_id,
         sale_id=sale_id,
         amount_received=update.amount_received,
@@ -125,42 +163,61 @@ def receive_udhaar_payment(sale_id: str, update: SalePaymentUpdate, request: Req
     )
     if not updated:
         raise HTTPException(404, check_localized(request, "udhaar_not_found"))
-    return get_sale(update.tenant_id, sale_id=sale_id)[0]
+    return await sales_repo.get_sale(update.tenant_id, sale_id=sale_id)
 
 # Get all sales and filter by date or user
+# Every matching sale by default; with a limit, the next page's cursor comes back in X-Next-Cursor
 @router.get("/sales", response_model=List[SaleOut])
-def list_sales(tenant_id: str, establishment_id: Optional[str] = None, from_date: Optional[date] = None,
-               to_date: Optional[date] = None, user: Optional[str] = None, request: Request = None):
-    sales = get_sale(tenant_id, establishment_id, from_date, to_date, user)
+async def list_sales(response: Response, tenant_id: str, establishment_id: Optional[str] = None,
+                     from_date: Optional[date] = None, to_date: Optional[date] = None, user: Optional[str] = None,
+                     limit: Optional[int] = Query(None, ge=1, le=1000), cursor: Optional[str] = None,
+                     request: Request = None):
+    try:
+        sales, next_cursor = await sales_repo.list_sales(tenant_id, establishment_id, from_date, to_date, user, limit, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(400, str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return sales
 
 # Set customer credit/udhaar limit
 @router.patch("/sales/customers/{customer_id}/set_udhaar_limit")
-def set_udhaar_limit_api(tenant_id: str, establishment_id: str, customer_id: str, limit: float, user=Depends(get_current_user)):
-    return set_customer_credit_limit(tenant_id, establishment_id, customer_id, limit, user)
+async def set_udhaar_limit_api(tenant_id: str, establishment_id: str, customer_id: str, limit: float, user=Depends(get_current_user)):
+    # Persists the limit and invalidates this worker's cached copy
+    return await sales_repo.set_customer_credit_limit(tenant_id, establishment_id, customer_id, limit, user["username"])
+
+# Pending inventory deduction queue: depth and drain rate
+@router.get("/sales/pending_inventory/metrics")
+async def pending_inventory_metrics(tenant_id: Optional[str] = None, user=Depends(get_current_user)):
+    return await get_pending_drain_metrics(tenant_id)
+
+# sale.created outbox relay: whether this worker holds the relay lease, and Kafka delivery counters
+@router.get("/sales/outbox/metrics")
+def outbox_metrics(user=Depends(get_current_user)):
+    return get_relay_metrics()
 
 # UPI payment: Start payment, and webhook for confirmation
 @router.post("/sales/{sale_id}/start_upi")
-def start_upi_payment(sale_id: str, request: Request):
+async def start_upi_payment(sale_id: str, request: Request):
     upi_payload = create_upi_payment(sale_id)
     return {"upi_uri": upi_payload["uri"], "qr": upi_payload.get("qr")}
 
 @router.post("/sales/payment_webhook")
-def payment_webhook(payload: dict):
+async def payment_webhook(payload: dict):
     return handle_payment_webhook(payload)
 
 # Sales summaries
 @router.get("/sales/summary/daily")
-def sales_summary_daily(tenant_id: str, date: date, establishment_id: Optional[str] = None):
-    return get_sales_summary(tenant_id, "daily", date, establishment_id)
+async def sales_summary_daily(tenant_id: str, date: date, establishment_id: Optional[str] = None, breakdown: bool = False):
+    return await sales_repo.get_sales_summary(tenant_id, "daily", date, establishment_id, breakdown=breakdown)
 
 @router.get("/sales/summary/weekly")
-def sales_summary_weekly(tenant_id: str, week_start: date, establishment_id: Optional[str] = None):
-    return get_sales_summary(tenant_id, "weekly", week_start, establishment_id)
+async def sales_summary_weekly(tenant_id: str, week_start: date, establishment_id: Optional[str] = None, breakdown: bool = False):
+    return await sales_repo.get_sales_summary(tenant_id, "weekly", week_start, establishment_id, breakdown=breakdown)
 
 # Export sales as CSV/PDF (Premium only)
 @router.get("/sales/export")
-def export_sales(tenant_id: str, filetype: Literal["csv", "pdf"] = "csv", user=Depends(get_current_user)):
+async def export_sales(tenant_id: str, filetype: Literal["csv", "pdf"] = "csv", user=Depends(get_current_user)):
     if not tenant_is_premium(tenant_id):
         raise HTTPException(403, "Feature available to premium subscribers only")
     if filetype == "csv":
@@ -169,7 +226,7 @@ def export_sales(tenant_id: str, filetype: Literal["csv", "pdf"] = "csv", user=D
 
 # GST invoice (Premium only)
 @router.post("/sales/{sale_id}/gst_invoice")
-def generate_gst_invoice(sale_id: str, tenant_id: str):
+async def generate_gst_invoice(sale_id: str, tenant_id: str):
     if not tenant_is_premium(tenant_id):
         raise HTTPException(403, "GST Billing only available to premium subscribers")
     # Logic to create/generate PDF invoice...
@@ -178,7 +235,7 @@ def generate_gst_invoice(sale_id: str, tenant_id: str):
 
 # WhatsApp export/share (file/link generation + send)
 @router.post("/sales/{sale_id}/share_invoice")
-def share_invoice_whatsapp(sale_id: str, tenant_id: str):
+async def share_invoice_whatsapp(sale_id: str, tenant_id: str):
     # Lookup invoice/download link, call WhatsApp send utility
     url = export_sales_pdf(tenant_id, sale_id)
     res = send_invoice_whatsapp(sale_id, url)
@@ -186,39 +243,135 @@ def share_invoice_whatsapp(sale_id: str, tenant_id: str):
 
 # Localized health endpoint (sample for testing)
 @router.get("/health")
-def health(request: Request):
+async def health(request: Request):
     return {"status": check_localized(request, "healthy")}
 
-from core.kafka_producer import emit_event
+SALES_BATCH_MAX = int(os.getenv("SALES_BATCH_MAX", "1000"))
 
-@router.post('/sales', response_model=SaleOut)
-async def create_sale(
-    sale: SaleCreate,
-    request: Request,
-    user: dict = Depends(get_current_user),      # use the actual function, not '...'
-    tenant: dict = Depends(get_current_tenant)
-):
+# Bulk ingestion for offline POS sync
+@router.post("/sales/batch", response_model=SaleBatchOut)
+async def create_sales_batch(batch: SaleBatchRequest, request: Request,
+                             user=Depends(get_current_user),
+                             tenant=Depends(get_current_tenant)):
     """
-    Create a new sale, emit it to Kafka.
+    Record many sales at once. Credit checks are grouped per customer, stock is
+    reserved with one inventory call per tenant, and sales (with their sale.created
+    outbox events) are written with a single unordered insert_many.
+    Replaying a batch is safe: sales whose idempotency_key was already recorded
+    (including by a concurrent replay that won the insert) come back as
+    "duplicate" with the recorded sale_id; a key repeated after a rejected sale
+    gets the same rejection.
     """
-    # Save sale data to DB
-    sale_doc = await add_sale(sale, user, tenant)  # ensure this function is imported/implemented for sales_service
-
-    # Prepare and send event to analytics (Kafka)
-    event = {
-        "tenant_id": sale_doc["tenant_id"],
-        "sale_id": sale_doc["sale_id"],
-        "item_id": sale_doc["item_id"],
-        "item_name": sale_doc["item_name"],
-        "quantity": sale_doc["quantity"],
-        "total_price": sale_doc["total_price"],
-        "payment_method": sale_doc["payment_method"],
-        "customer_id": sale_doc.get("customer_id"),
-        "is_udhaar": sale_doc.get("is_udhaar", False),
-        "user": sale_doc["user"],
-        "timestamp": str(sale_doc.get("timestamp")),
-        # add more fields as needed
-    }
-    emit_event('sale.created', event)
-
-    return sale_doc
\ No newline at end of file
+    if len(batch.sales) > SALES_BATCH_MAX:
+        raise HTTPException(413, f"Batch too large (max {SALES_BATCH_MAX} sales)")
+    results = {}
+    tenant_ids = {s.tenant_id for s in batch.sales}
+
+    # 1. Idempotency: drop sales already recorded, and repeats within this batch
+    fresh = []
+    repeats = set()  # positions repeating an earlier key in this batch
+    seen = set()
+    for tenant_id in tenant_ids:
+        keys = [s.idempotency_key for s in batch.sales if s.tenant_id == tenant_id]
+        existing = await sales_repo.find_sales_by_idempotency_keys(tenant_id, keys)
+        for key, sale_id in existing.items():
+            results[(tenant_id, key)] = SaleBatchItemResult(idempotency_key=key, status="duplicate", sale_id=sale_id)
+    for i, s in enumerate(batch.sales):
+        k = (s.tenant_id, s.idempotency_key)
+        if k in seen:
+            repeats.add(i)
+            continue
+        seen.add(k)
+        if k not in results:
+            fresh.append(s)
+
+    # 2. Credit checks, one balance + limit lookup per customer
+    accepted = []
+    running_udhaar = {}
+    for s in fresh:
+        if s.is_udhaar:
+            ckey = (s.tenant_id, s.establishment_id, s.customer_id)
+            if ckey not in running_udhaar:
+                running_udhaar[ckey] = [
+                    await sales_repo.get_customer_udhaar_total(*ckey),
+                    await sales_repo.get_customer_credit_limit(*ckey),
+                ]
+            total, limit = running_udhaar[ckey]
+            amount = s.quantity * s.price_per_unit
+            if total + amount > limit:
+                results[(s.tenant_id, s.idempotency_key)] = SaleBatchItemResult(
+                    idempotency_key=s.idempotency_key, status="rejected",
+                    error=check_localized(request, "udhaar_limit_breach"))
+                continue
+            running_udhaar[ckey][0] = total + amount
+        accepted.append(s)
+
+    # 3. Stock: one check-and-reserve call per tenant (quantities coalesced per item)
+    reservations = {}
+    for tenant_id in {s.tenant_id for s in accepted}:
+        items = [{"item_id": s.item_id, "quantity": s.quantity} for s in accepted if s.tenant_id == tenant_id]
+        try:
+            for item_id, r in (await inventory_client.reserve(tenant_id, items)).items():
+                reservations[(tenant_id, item_id)] = r
+        except InventoryUnavailable:
+            pass  # Everything for this tenant becomes a pending deduction
+    docs, pending_by_key, warnings = [], {}, {}
+    reserved_by_key = {}
+    for s in accepted:
+        k = (s.tenant_id, s.idempotency_key)
+        r = reservations.get((s.tenant_id, s.item_id), {"status": "not_found"})
+        doc = s.dict()
+        doc["low_stock_warn"] = r["status"] == "reserved" and r["quantity"] <= LOW_STOCK_THRESHOLD
+        doc["stock_pending_deduction"] = r["status"] != "reserved"
+        if doc["stock_pending_deduction"]:
+            pending_by_key[k] = {"tenant_id": s.tenant_id, "establishment_id": s.establishment_id,
+                                 "item_id": s.item_id, "qty": s.quantity, "user": s.user}
+            msg_key = "insufficient_stock" if r["status"] == "insufficient" else "item_not_in_inventory"
+            warnings[k] = check_localized(request, msg_key, item=s.item_name)
+        else:
+            reserved_by_key[k] = {"item_id": s.item_id, "quantity": s.quantity}
+            if doc["low_stock_warn"]:
+                warnings[k] = check_localized(request, "low_stock_warn", item=s.item_name)
+        docs.append(doc)
+
+    # 4. One insert_many for the sales, one for queued deductions (for sales actually inserted)
+    inserted, raced = await sales_repo.add_sales_bulk(docs)
+    await sales_repo.set_pending_inventory_deductions([
+        pending_by_key[k] for k in ((d["tenant_id"], d["idempotency_key"]) for d in inserted) if k in pending_by_key
+    ])
+    for doc in inserted:
+        k = (doc["tenant_id"], doc["idempotency_key"])
+        results[k] = SaleBatchItemResult(idempotency_key=doc["idempotency_key"], status="created",
+                                         sale_id=doc["sale_id"], warning=warnings.get(k))
+    # Lost a race with a concurrent replay of the same sale: that replay owns the
+    # sale (its sale_id is returned) and the stock deduction, so give back what
+    # was reserved for this copy
+    releases = defaultdict(list)
+    raced_keys = defaultdict(list)
+    for k in raced:
+        raced_keys[k[0]].append(k[1])
+        if k in reserved_by_key:
+            releases[k[0]].append(reserved_by_key[k])
+    for tenant_id, keys in raced_keys.items():
+        winners = await sales_repo.find_sales_by_idempotency_keys(tenant_id, keys)
+        for key in keys:
+            results[(tenant_id, key)] = SaleBatchItemResult(idempotency_key=key, status="duplicate", sale_id=winners.get(key))
+    for tenant_id, items in releases.items():
+        try:
+            await inventory_client.release(tenant_id, items)
+        except InventoryUnavailable as e:
+            print(f"[SalesBatch] could not release stock for raced duplicates of tenant {tenant_id}: {items}: {e}")
+
+    ordered = []
+    for i, s in enumerate(batch.sales):
+        r = results[(s.tenant_id, s.idempotency_key)]
+        # A repeat of a rejected sale was not recorded either: it gets the same rejection
+        if i in repeats and r.status != "rejected":
+            r = SaleBatchItemResult(idempotency_key=s.idempotency_key, status="duplicate", sale_id=r.sale_id)
+        ordered.append(r)
+    return SaleBatchOut(
+        created=sum(1 for r in ordered if r.status == "created"),
+        duplicates=sum(1 for r in ordered if r.status == "duplicate"),
+        rejected=sum(1 for r in ordered if r.status == "rejected"),
+        results=ordered,
+    )
\ No newline at end of file
@@ -0,0 +1,71 @@
+import os
+import httpx
+
+INVENTORY_SERVICE_URL = os.getenv("INVENTORY_SERVICE_URL", "http://inventory_service:8000")
+INVENTORY_TIMEOUT = float(os.getenv("INVENTORY_TIMEOUT_SECONDS", "2.0"))
+INVENTORY_CONNECT_TIMEOUT = float(os.getenv("INVENTORY_CONNECT_TIMEOUT_SECONDS", "0.5"))
+INVENTORY_MAX_CONNECTIONS = int(os.getenv("INVENTORY_MAX_CONNECTIONS", "100"))
+INVENTORY_MAX_KEEPALIVE = int(os.getenv("INVENTORY_MAX_KEEPALIVE", "20"))
+
+class InventoryUnavailable(Exception):
+    """inventory_service could not be reached or returned an error."""
+
+class InventoryClient:
+    """
+    Async client for inventory_service. Holds one keep-alive connection pool for
+    the life of the app; open with start() and release with close() (see main.py lifespan).
+    """
+
+    def __init__(self, base_url: str = INVENTORY_SERVICE_URL, transport: httpx.AsyncBaseTransport = None):
+        self.base_url = base_url
+        self._transport = transport
+        self._client = None
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(INVENTORY_TIMEOUT, connect=INVENTORY_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=INVENTORY_MAX_CONNECTIONS,
+                    max_keepalive_connections=INVENTORY_MAX_KEEPALIVE,
+                ),
+                transport=self._transport,
+            )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def reserve(self, tenant_id: str, items: list) -> dict:
+        """
+        Check-and-reserve stock in one round trip.
+        `items` is a list of {"item_id": ..., "quantity": ...}; returns {item_id: result}
+        where result["status"] is "reserved", "insufficient" or "not_found".
+        """
+        await self.start()
+        try:
+            resp = await self._client.post("/items/reserve", json={"tenant_id": tenant_id, "items": items})
+            resp.raise_for_status()
+        except httpx.HTTPError as e:
+            raise InventoryUnavailable(str(e)) from e
+        return {r["item_id"]: r for r in resp.json()}
+
+    async def release(self, tenant_id: str, items: list):
+        """
+        Give back stock reserved by reserve() that ended up unused (e.g. a batched
+        sale that lost an idempotency race). `items` is the same shape as for reserve().
+        """
+        await self.start()
+        try:
+            for r in items:
+                resp = await self._client.patch(
+                    f"/items/{r['item_id']}/stock", params={"tenant_id": tenant_id},
+                    json={"tenant_id": tenant_id, "delta": r["quantity"]},
+                )
+                resp.raise_for_status()
+        except httpx.HTTPError as e:
+            raise InventoryUnavailable(str(e)) from e
+
+inventory_client = InventoryClient()
@@ -0,0 +1,39 @@
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from retail_db import ensure_indexes as ensure_declared_indexes
+from db.mongo import get_db
+
+# Every index this service relies on, per collection. Applied once at startup
+# (see main.py lifespan) so request handlers never issue DDL; creation and drift
+# reporting live in the shared retail_db index manager.
+INDEXES = {
+    "sales": [
+        IndexModel([("tenant_id", ASCENDING), ("sale_id", ASCENDING)], unique=True, sparse=True),
+        # list_sales (keyset on timestamp, _id) / summaries: tenant-scoped, newest first
+        IndexModel([("tenant_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("tenant_id", ASCENDING), ("user", ASCENDING), ("timestamp", DESCENDING)]),
+        # Outstanding udhaar per customer
+        IndexModel([("tenant_id", ASCENDING), ("establishment_id", ASCENDING), ("customer_id", ASCENDING), ("is_udhaar", ASCENDING)]),
+        # Outbox relay: only documents with unpublished events are indexed
+        IndexModel([("outbox_pending", ASCENDING), ("_id", ASCENDING)],
+                   partialFilterExpression={"outbox_pending": True}),
+        # Offline POS replays: one sale per idempotency key
+        IndexModel([("tenant_id", ASCENDING), ("idempotency_key", ASCENDING)], unique=True,
+                   partialFilterExpression={"idempotency_key": {"$type": "string"}}),
+    ],
+    "customer_balances": [
+        IndexModel([("tenant_id", ASCENDING), ("establishment_id", ASCENDING), ("customer_id", ASCENDING)], unique=True),
+    ],
+    "customer_credit_limits": [
+        IndexModel([("tenant_id", ASCENDING), ("establishment_id", ASCENDING), ("customer_id", ASCENDING)], unique=True),
+    ],
+    "pending_inventory_deductions": [
+        # Drainer: due pending rows, oldest first; queue depth per tenant; stale claims
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("claimed_at", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("tenant_id", ASCENDING)]),
+        IndexModel([("claim_id", ASCENDING)], sparse=True),
+    ],
+}
+
+def ensure_indexes(db=None):
+    return ensure_declared_indexes(db if db is not None else get_db(), INDEXES)
@@ -0,0 +1,15 @@
+# Pooled Mongo clients for this service, configured from SALES_MONGO_URI,
+# SALES_DB_NAME and the SALES_MONGO_* pool settings (see retail_db.MongoClients).
+from retail_db import MongoClients
+
+_clients = MongoClients("SALES", "sales_service_db")
+
+MONGO_URI = _clients.uri
+DB_NAME = _clients.db_name
+
+get_client = _clients.get_client
+get_db = _clients.get_db
+close_client = _clients.close_client
+get_async_client = _clients.get_async_client
+get_async_db = _clients.get_async_db
+close_async_client = _clients.close_async_client
@@ -1,174 +1,576 @@
-from pymongo import MongoClient, ASCENDING
+import base64
+import json
 from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from db.mongo import get_db, get_async_db
+from retail_outbox import outbox_envelope, attach_outbox, strip_outbox
+from utils.ttl_cache import TTLCache
 
 import os
 
-MONGO_URI = os.getenv("SALES_MONGO_URI", "mongodb://localhost:27017")
-DB_NAME = os.getenv("SALES_DB_NAME", "sales_service_db")
 COLL_NAME = "sales"
+BALANCES_COLL_NAME = "customer_balances"  # Running udhaar balance per customer
+CREDIT_LIMITS_COLL_NAME = "customer_credit_limits"
+PENDING_COLL_NAME = "pending_inventory_deductions"  # Deductions waiting for stock to arrive
+
+DEFAULT_CREDIT_LIMIT = float(os.getenv("SALES_DEFAULT_CREDIT_LIMIT", "1000"))
+# Per-worker read-through cache; TTL bounds staleness after a limit is changed on another worker
+_credit_limit_cache = TTLCache(
+    maxsize=int(os.getenv("SALES_CREDIT_LIMIT_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("SALES_CREDIT_LIMIT_CACHE_TTL", "30")),
+)
 
 def get_sales_collection():
-    client = MongoClient(MONGO_URI)
-    db = client[DB_NAME]
-    collection = db[COLL_NAME]
-    # Compound index: tenant_id + sale_id (if you provide your own) or just use _id per doc
-    collection.create_index([("tenant_id", ASCENDING), ("sale_id", ASCENDING)], unique=True, sparse=True)
-    return collection
-
-def add_sale(sale):
-    """
-    Expects a Pydantic SaleCreate model.
-    Auto-calculates total_price, timestamps, and generates sale_id if not set.
-    """
-    collection = get_sales_collection()
-    doc = sale.dict()
-    doc["total_price"] = sale.quantity * sale.price_per_unit
-    doc["timestamp"] = datetime.now(timezone.utc)
-    # Generate a sale_id if not present (assign string from Mongo _id)
-    result = collection.insert_one(doc)
-    doc["sale_id"] = str(result.inserted_id)
-    # Also add `sale_id` to the document for easier queries
-    collection.update_one({"_id": result.inserted_id}, {"$set": {"sale_id": doc["sale_id"]}})
-    doc.pop("_id", None)
-    return doc
-
-def get_sale(tenant_id: str, sale_id: str):
-    collection = get_sales_collection()
-    doc = collection.find_one({"tenant_id": tenant_id, "sale_id": sale_id})
-    if doc:
-        doc.pop("_id", None)
-    return doc
+    # Sync handle for the outbox relay thread and offline jobs; request paths use SaleRepository.
+    # Indexes are declared in db/indexes.py and applied at startup
+    return get_db()[COLL_NAME]
 
-def list_sales(tenant_id: str, user: str = None, limit: int = 100):
-    collection = get_sales_collection()
-    query = {"tenant_id": tenant_id}
-    if user:
-        query["user"] = user
-    cursor = collection.find(query).sort("timestamp", -1).limit(limit)
-    return [{k: v for k, v in doc.items() if k != "_id"} for doc in cursor]
+def sale_created_event(sale_doc: dict) -> dict:
+    return {
+        "tenant_id": sale_doc["tenant_id"],
+        "sale_id": sale_doc["sale_id"],
+        "item_id": sale_doc["item_id"],
+        "item_name": sale_doc["item_name"],
+        "quantity": sale_doc["quantity"],
+        "total_price": sale_doc["total_price"],
+        "payment_method": sale_doc["payment_method"],
+        "customer_id": sale_doc.get("customer_id"),
+        "establishment_id": sale_doc.get("establishment_id"),
+        "is_udhaar": sale_doc.get("is_udhaar", False),
+        "user": sale_doc["user"],
+        "timestamp": str(sale_doc.get("timestamp")),
+        # add more fields as needed
+    }
 
-def mark_udhaar_paid(tenant_id: str, sale_id: str, amount_received: float, payment_method: str):
-    """
-    Mark an udhaar (credit) sale as paid/partially paid.
-    """
-    collection = get_sales_collection()
-    ts = datetime.now(timezone.utc)
-    result = collection.update_one(
-        {"tenant_id": tenant_id, "sale_id": sale_id, "is_udhaar": True},
-        {"$set": {
-            "udhaar_paid": True,
-            "udhaar_paid_on": ts,
-            "payment_method": payment_method,
-            "amount_received": amount_received,
-        }}
-    )
-    return result.modified_count == 1
-
-def attach_gst_invoice(tenant_id, sale_id, gst_invoice, pdf_url):
-    """
-    Attach GST invoice data and PDF link to sale record.
-    """
-    collection = get_sales_collection()
-    collection.update_one(
-        {"tenant_id": tenant_id, "sale_id": sale_id},
-        {"$set": {
-            "gst_invoice": gst_invoice,
-            "invoice_pdf_url": pdf_url
-        }}
-    )
-
-def record_invoice_share(tenant_id, sale_id, whatsapp):
-    """
-    Log invoice sharing event.
-    """
-    collection = get_sales_collection()
-    collection.update_one(
-        {"tenant_id": tenant_id, "sale_id": sale_id},
-        {"$set": {"invoice_shared_on": {"whatsapp": whatsapp, "time": datetime.datetime.now(timezone.utc)}}}
-    )
+def _attach_sale_created(doc: dict):
+    # The event is inserted with the sale and published later by the retail_outbox relay
+    return attach_outbox(doc, outbox_envelope(
+        f"sale.created:{doc['sale_id']}", "sale.created", doc["tenant_id"],
+        sale_created_event(doc), doc["timestamp"],
+    ))
 
-def get_sales_summary(tenant_id: str, from_date: datetime, to_date: datetime):
-    """
-    Returns a summary of sales, credit/udhaar, and collections for a date window.
-    """
-    collection = get_sales_collection()
-    match = {
-        "tenant_id": tenant_id,
-        "timestamp": {"$gte": from_date.isoformat(), "$lte": to_date.isoformat()}
-    }
-    sales = list(collection.find(match))
-    total_sales = sum(s.get("total_price", 0) for s in sales)
-    total_udhaar = sum(s.get("total_price", 0) for s in sales if s.get("is_udhaar"))
-    total_collections = sum(s.get("amount_received", 0) for s in sales if s.get("udhaar_paid"))
-    return {
-        "tenant_id": tenant_id,
-        "from_date": from_date.isoformat(),
-        "to_date": to_date.isoformat(),
-        "total_sales": total_sales,
-        "total_udhaar": total_udhaar,
-        "collections": total_collections,
-        "sales_count": len(sales)
+SUMMARY_PERIODS = {"daily": timedelta(days=1), "weekly": timedelta(days=7)}
+
+def _summary_group(key):
+    return {"$group": {
+        "_id": key,
+        "total_sales": {"$sum": "$total_price"},
+        "total_udhaar": {"$sum": {"$cond": [{"$eq": ["$is_udhaar", True]}, "$total_price", 0]}},
+        "collections": {"$sum": {"$cond": [{"$eq": ["$udhaar_paid", True]}, {"$ifNull": ["$amount_received", 0]}, 0]}},
+        "sales_count": {"$sum": 1},
+    }}
+
+def _summary_row(doc, key_name=None):
+    row = {
+        "total_sales": doc.get("total_sales", 0),
+        "total_udhaar": doc.get("total_udhaar", 0),
+        "collections": doc.get("collections", 0),
+        "sales_count": doc.get("sales_count", 0),
     }
+    if key_name:
+        row = {key_name: doc["_id"], **row}
+    return row
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_sales_cursor(doc: dict) -> str:
+    raw = json.dumps({"ts": doc["timestamp"].isoformat(), "id": str(doc["_id"])})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_sales_cursor(token: str):
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        return datetime.fromisoformat(raw["ts"]), ObjectId(raw["id"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
 
-def top_customers(tenant_id: str, limit: int = 5):
+def _balance_key(tenant_id, establishment_id, customer_id):
+    return {"tenant_id": tenant_id, "establishment_id": establishment_id, "customer_id": customer_id}
+
+class SaleRepository:
     """
-    Returns top customers by total sales or udhaar.
+    Async (Motor) data access for sales and the collections that hang off them:
+    customer balances, credit limits and queued inventory deductions.
     """
-    collection = get_sales_collection()
-    pipeline = [
-        {"$match": {"tenant_id": tenant_id, "customer_id": {"$ne": None}}},
-        {"$group": {"_id": "$customer_id", "total_sales": {"$sum": "$total_price"}}},
-        {"$sort": {"total_sales": -1}},
-        {"$limit": limit}
-    ]
-    return list(collection.aggregate(pipeline))
-
-# --- Inventory helpers ---
-def inventory_exists(tenant_id, establishment_id, item_id, user):
-    # In production, check an inventory_service DB/collection
-    # For demo: always allow sale (simulate found)
-    return True
-
-def get_available_stock(tenant_id, establishment_id, item_id, user):
-    # In production: fetch stock value from inventory_service
-    # Here, just return 5 as a demo
-    return 5
-
-def deduct_inventory(tenant_id, establishment_id, item_id, qty, user):
-    # In prod: decrement inventory count for the item
-    pass
 
-_pending_inventory = []
-
-def set_pending_inventory_deduction(tenant_id, establishment_id, item_id, qty, user):
-    _pending_inventory.append({
-        "tenant_id": tenant_id,
-        "establishment_id": establishment_id,
-        "item_id": item_id,
-        "qty": qty,
-        "user": user,
-        "pending": True,
-        "time": datetime.utcnow().isoformat()
-    })
-
-_customer_credit_limits = {}  # (tenant_id, establishment_id, customer_id) -> float
-
-def get_customer_udhaar_total(tenant_id, establishment_id, customer_id):
-    collection = get_sales_collection()
-    match = {
-        "tenant_id": tenant_id,
-        "establishment_id": establishment_id,
-        "customer_id": customer_id,
-        "is_udhaar": True,
-        "udhaar_paid": {"$ne": True}
-    }
-    sales = list(collection.find(match))
-    return sum(s.get("total_price", 0) for s in sales)
+    @property
+    def sales(self):
+        return get_async_db()[COLL_NAME]
+
+    @property
+    def balances(self):
+        return get_async_db()[BALANCES_COLL_NAME]
+
+    @property
+    def credit_limits(self):
+        return get_async_db()[CREDIT_LIMITS_COLL_NAME]
+
+    @property
+    def pending(self):
+        return get_async_db()[PENDING_COLL_NAME]
+
+    # --- Sales ---
+
+    async def add_sale(self, sale):
+        """
+        Expects a Pydantic SaleCreate model (or its dict).
+        Auto-calculates total_price and timestamp. sale_id is the string form of a
+        client-generated ObjectId, so the document is complete on its single insert,
+        which also carries the sale.created event (outbox).
+        Udhaar sales also increment the customer's running balance.
+        """
+        doc = sale.dict() if hasattr(sale, "dict") else dict(sale)
+        doc["total_price"] = doc["quantity"] * doc["price_per_unit"]
+        doc["timestamp"] = datetime.now(timezone.utc)
+        oid = ObjectId()
+        doc["_id"] = oid
+        doc["sale_id"] = str(oid)
+        _attach_sale_created(doc)
+        await self.sales.insert_one(doc)
+        strip_outbox(doc)
+        doc.pop("_id", None)
+        if doc.get("is_udhaar") and doc.get("customer_id"):
+            await self._inc_customer_balance(doc["tenant_id"], doc.get("establishment_id"), doc["customer_id"], doc["total_price"])
+        return doc
+
+    async def add_sales_bulk(self, docs):
+        """
+        Insert many prepared sale dicts with one unordered insert_many (offline POS sync).
+        Each doc gets total_price, timestamp (unless the POS supplied one) and a
+        client-generated sale_id. Docs whose (tenant_id, idempotency_key) already
+        exists are skipped by the unique index.
+        Returns (inserted_docs, [(tenant_id, idempotency_key)] of the skipped duplicates).
+        """
+        now = datetime.now(timezone.utc)
+        prepared = []
+        for sale in docs:
+            doc = dict(sale)
+            oid = ObjectId()
+            doc["_id"] = oid
+            doc["sale_id"] = str(oid)
+            doc["total_price"] = doc["quantity"] * doc["price_per_unit"]
+            doc["timestamp"] = doc.get("timestamp") or now
+            _attach_sale_created(doc)
+            prepared.append(doc)
+        if not prepared:
+            return [], []
+
+        failed = set()
+        try:
+            await self.sales.insert_many(prepared, ordered=False)
+        except BulkWriteError as e:
+            for err in e.details.get("writeErrors", []):
+                if err.get("code") != 11000:
+                    raise
+                failed.add(err["index"])
+        inserted = [d for i, d in enumerate(prepared) if i not in failed]
+        duplicates = [(prepared[i]["tenant_id"], prepared[i].get("idempotency_key")) for i in sorted(failed)]
+
+        balance_incs = {}
+        for doc in inserted:
+            if doc.get("is_udhaar") and doc.get("customer_id"):
+                key = (doc["tenant_id"], doc.get("establishment_id"), doc["customer_id"])
+                balance_incs[key] = balance_incs.get(key, 0) + doc["total_price"]
+        if balance_incs:
+            await self.balances.bulk_write([
+                UpdateOne(_balance_key(*key), {"$inc": {"udhaar_outstanding": amount}, "$set": {"updated_at": now}}, upsert=True)
+                for key, amount in balance_incs.items()
+            ], ordered=False)
+        for doc in inserted:
+            strip_outbox(doc)
+            doc.pop("_id", None)
+        return inserted, duplicates
+
+    async def find_sales_by_idempotency_keys(self, tenant_id: str, keys):
+        """
+        Map idempotency_key -> sale_id for sales already recorded (replayed batches).
+        """
+        cursor = self.sales.find(
+            # $type matches the partial index filter so the planner can use it
+            {"tenant_id": tenant_id, "idempotency_key": {"$in": list(keys), "$type": "string"}},
+            {"_id": 0, "idempotency_key": 1, "sale_id": 1},
+        )
+        return {d["idempotency_key"]: d["sale_id"] async for d in cursor}
+
+    async def get_sale(self, tenant_id: str, sale_id: str):
+        return await self.sales.find_one(
+            {"tenant_id": tenant_id, "sale_id": sale_id},
+            {"_id": 0, "outbox": 0, "outbox_pending": 0},
+        )
+
+    async def list_sales(self, tenant_id: str, establishment_id: str = None, from_date=None, to_date=None,
+                         user: str = None, limit: int = None, cursor: str = None):
+        """
+        Most recent sales first, optionally filtered by establishment, user and
+        an inclusive [from_date, to_date] day range (UTC). Without a limit every
+        matching sale is returned. With one, pages are keyset-paginated on
+        (timestamp, _id): pass the returned cursor back for the next page.
+        Returns (sales, next_cursor); next_cursor is None on the last page.
+        """
+        query = {"tenant_id": tenant_id}
+        if establishment_id:
+            query["establishment_id"] = establishment_id
+        if user:
+            query["user"] = user
+        if from_date or to_date:
+            query["timestamp"] = {}
+            if from_date:
+                query["timestamp"]["$gte"] = datetime(from_date.year, from_date.month, from_date.day, tzinfo=timezone.utc)
+            if to_date:
+                query["timestamp"]["$lt"] = datetime(to_date.year, to_date.month, to_date.day, tzinfo=timezone.utc) + timedelta(days=1)
+        if cursor:
+            ts, oid = decode_sales_cursor(cursor)
+            query["$or"] = [{"timestamp": {"$lt": ts}}, {"timestamp": ts, "_id": {"$lt": oid}}]
+        found = self.sales.find(query, {"outbox": 0, "outbox_pending": 0}).sort([("timestamp", -1), ("_id", -1)])
+        if limit:
+            found = found.limit(limit)
+        sales = await found.to_list(limit)
+        next_cursor = encode_sales_cursor(sales[-1]) if limit and len(sales) == limit else None
+        for sale in sales:
+            sale.pop("_id", None)
+        return sales, next_cursor
+
+    async def mark_udhaar_paid(self, tenant_id: str, sale_id: str, amount_received: float, payment_method: str):
+        """
+        Record a full or partial repayment against an udhaar (credit) sale.
+        Repayments accumulate in amount_received; the sale flips to udhaar_paid once
+        they cover total_price. The customer's running balance is reduced by the
+        amount actually applied.
+        """
+        ts = datetime.now(timezone.utc)
+        # One pipeline update accumulates the repayment and flips udhaar_paid in the
+        # same write, so concurrent repayments can't both land on a settled sale
+        doc = await self.sales.find_one_and_update(
+            {"tenant_id": tenant_id, "sale_id": sale_id, "is_udhaar": True, "udhaar_paid": {"$ne": True}},
+            [
+                {"$set": {
+                    "amount_received": {"$add": [{"$ifNull": ["$amount_received", 0]}, amount_received]},
+                    "udhaar_paid_on": {"$literal": ts},
+                    "payment_method": {"$literal": payment_method},
+                }},
+                {"$set": {"udhaar_paid": {"$gte": ["$amount_received", "$total_price"]}}},
+            ],
+            projection={"_id": 0, "establishment_id": 1, "customer_id": 1, "total_price": 1, "amount_received": 1},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if not doc:
+            return False
+        outstanding_before = max(doc.get("total_price", 0) - doc.get("amount_received", 0), 0)
+        applied = min(amount_received, outstanding_before)
+        if applied and doc.get("customer_id"):
+            await self._inc_customer_balance(tenant_id, doc.get("establishment_id"), doc["customer_id"], -applied)
+        return True
+
+    async def attach_gst_invoice(self, tenant_id, sale_id, gst_invoice, pdf_url):
+        """
+        Attach GST invoice data and PDF link to sale record.
+        """
+        await self.sales.update_one(
+            {"tenant_id": tenant_id, "sale_id": sale_id},
+            {"$set": {
+                "gst_invoice": gst_invoice,
+                "invoice_pdf_url": pdf_url
+            }}
+        )
+
+    async def record_invoice_share(self, tenant_id, sale_id, whatsapp):
+        """
+        Log invoice sharing event.
+        """
+        await self.sales.update_one(
+            {"tenant_id": tenant_id, "sale_id": sale_id},
+            {"$set": {"invoice_shared_on": {"whatsapp": whatsapp, "time": datetime.now(timezone.utc)}}}
+        )
+
+    async def get_sales_summary(self, tenant_id: str, period: str, start, establishment_id: str = None, breakdown: bool = False):
+        """
+        Returns a summary of sales, credit/udhaar, and collections for a daily or weekly window
+        starting at `start` (date or datetime, UTC).
+        Totals are computed server-side in one aggregation; with `breakdown`, a $facet adds
+        per-establishment and per-payment-method rows.
+        """
+        if period not in SUMMARY_PERIODS:
+            raise ValueError(f"period must be one of {sorted(SUMMARY_PERIODS)}")
+        from_date = datetime(start.year, start.month, start.day, tzinfo=timezone.utc)
+        to_date = from_date + SUMMARY_PERIODS[period]
+        match = {"tenant_id": tenant_id, "timestamp": {"$gte": from_date, "$lt": to_date}}
+        if establishment_id:
+            match["establishment_id"] = establishment_id
+        pipeline = [
+            {"$match": match},
+            {"$project": {"_id": 0, "establishment_id": 1, "payment_method": 1, "total_price": 1,
+                          "is_udhaar": 1, "udhaar_paid": 1, "amount_received": 1}},
+        ]
+        if breakdown:
+            pipeline.append({"$facet": {
+                "totals": [_summary_group(None)],
+                "by_establishment": [_summary_group("$establishment_id"), {"$sort": {"total_sales": -1}}],
+                "by_payment_method": [_summary_group("$payment_method"), {"$sort": {"total_sales": -1}}],
+            }})
+        else:
+            pipeline.append(_summary_group(None))
+
+        result = await self.sales.aggregate(pipeline).to_list(None)
+        if breakdown:
+            facets = result[0] if result else {}
+            totals = (facets.get("totals") or [{}])[0]
+        else:
+            totals = result[0] if result else {}
+
+        summary = {
+            "tenant_id": tenant_id,
+            "period": period,
+            "establishment_id": establishment_id,
+            "from_date": from_date.isoformat(),
+            "to_date": to_date.isoformat(),
+            **_summary_row(totals),
+        }
+        if breakdown:
+            summary["by_establishment"] = [_summary_row(d, "establishment_id") for d in facets.get("by_establishment", [])]
+            summary["by_payment_method"] = [_summary_row(d, "payment_method") for d in facets.get("by_payment_method", [])]
+        return summary
+
+    async def top_customers(self, tenant_id: str, limit: int = 5):
+        """
+        Returns top customers by total sales or udhaar.
+        """
+        pipeline = [
+            {"$match": {"tenant_id": tenant_id, "customer_id": {"$ne": None}}},
+            {"$group": {"_id": "$customer_id", "total_sales": {"$sum": "$total_price"}}},
+            {"$sort": {"total_sales": -1}},
+            {"$limit": limit}
+        ]
+        return await self.sales.aggregate(pipeline).to_list(limit)
+
+    # --- Inventory helpers ---
+    # Live stock checks go through core/inventory_client.py (inventory_service /items/reserve)
+
+    async def set_pending_inventory_deduction(self, tenant_id, establishment_id, item_id, qty, user):
+        """
+        Queue a stock deduction that could not be applied at sale time.
+        jobs/pending_drainer.py applies queued deductions once stock arrives.
+        """
+        now = datetime.now(timezone.utc)
+        await self.pending.insert_one({
+            "tenant_id": tenant_id,
+            "establishment_id": establishment_id,
+            "item_id": item_id,
+            "qty": qty,
+            "user": user,
+            "status": "pending",
+            "attempts": 0,
+            "created_at": now,
+            "next_attempt_at": now,
+        })
+
+    async def set_pending_inventory_deductions(self, entries):
+        """
+        Bulk form of set_pending_inventory_deduction. `entries` are dicts with
+        tenant_id, establishment_id, item_id, qty and user.
+        """
+        if not entries:
+            return
+        now = datetime.now(timezone.utc)
+        await self.pending.insert_many(
+            [{**e, "status": "pending", "attempts": 0, "created_at": now, "next_attempt_at": now} for e in entries],
+            ordered=False,
+        )
+
+    async def claim_pending_deductions(self, claim_id: str, limit: int = 500):
+        """
+        Claim up to `limit` of the pending deductions that are due (next_attempt_at
+        has passed), oldest first, and return them coalesced per (tenant_id, item_id):
+        [{"tenant_id", "item_id", "qty", "count"}]. Claiming keeps drainers in
+        other workers from applying the same rows twice.
+        """
+        now = datetime.now(timezone.utc)
+        # Rows queued before next_attempt_at existed have no due time; treat them as due
+        query = {"status": "pending", "$or": [{"next_attempt_at": {"$lte": now}}, {"next_attempt_at": None}]}
+        cursor = self.pending.find(query, {"_id": 1}).sort([("next_attempt_at", 1), ("created_at", 1)]).limit(limit)
+        ids = [d["_id"] async for d in cursor]
+        if not ids:
+            return []
+        await self.pending.update_many(
+            {"_id": {"$in": ids}, "status": "pending"},
+            {"$set": {"status": "claimed", "claim_id": claim_id, "claimed_at": now}},
+        )
+        pipeline = [
+            {"$match": {"claim_id": claim_id, "status": "claimed"}},
+            {"$group": {"_id": {"tenant_id": "$tenant_id", "item_id": "$item_id"}, "qty": {"$sum": "$qty"}, "count": {"$sum": 1}}},
+        ]
+        return [
+            {"tenant_id": g["_id"]["tenant_id"], "item_id": g["_id"]["item_id"], "qty": g["qty"], "count": g["count"]}
+            async for g in self.pending.aggregate(pipeline)
+        ]
+
+    async def claimed_deductions(self, claim_id: str, tenant_id: str, item_id: str):
+        """
+        This claim's rows for one item, oldest first: [{"_id", "qty"}].
+        """
+        cursor = self.pending.find(
+            {"claim_id": claim_id, "status": "claimed", "tenant_id": tenant_id, "item_id": item_id},
+            {"_id": 1, "qty": 1},
+        ).sort("created_at", 1)
+        return await cursor.to_list(None)
+
+    async def complete_pending_deductions(self, claim_id: str, tenant_id: str, item_id: str, ids=None):
+        """
+        Mark this claim's rows for an item (or just `ids`) as applied. Rows keep
+        their claim_id, so the quantity applied under this claim can be summed.
+        Returns (rows, qty) actually applied: a row whose claim went stale and was
+        released in the meantime is not applied here, and the caller must give
+        back the stock it reserved for it.
+        """
+        query = {"claim_id": claim_id, "status": "claimed", "tenant_id": tenant_id, "item_id": item_id}
+        if ids is not None:
+            query["_id"] = {"$in": list(ids)}
+        await self.pending.update_many(query, {"$set": {"status": "applied", "applied_at": datetime.now(timezone.utc)}})
+        match = {**query, "status": "applied"}
+        pipeline = [{"$match": match}, {"$group": {"_id": None, "rows": {"$sum": 1}, "qty": {"$sum": "$qty"}}}]
+        totals = await self.pending.aggregate(pipeline).to_list(1)
+        return (totals[0]["rows"], totals[0]["qty"]) if totals else (0, 0)
+
+    async def release_pending_deductions(self, claim_id: str, tenant_id: str = None, item_id: str = None,
+                                         max_attempts: int = 20, retry_base: timedelta = timedelta(seconds=30),
+                                         retry_max: timedelta = timedelta(hours=1)):
+        """
+        Put claimed deductions back in the queue (stock still short, or inventory
+        unreachable). Each row is retried after retry_base * 2**attempts (capped at
+        retry_max); a row that has used up max_attempts is parked as "failed" for
+        manual follow-up instead. Returns (requeued, failed).
+        """
+        query = {"claim_id": claim_id, "status": "claimed"}
+        if tenant_id:
+            query["tenant_id"] = tenant_id
+        if item_id:
+            query["item_id"] = item_id
+        now = datetime.now(timezone.utc)
+        ops, failed = [], 0
+        async for row in self.pending.find(query, {"_id": 1, "attempts": 1}):
+            attempts = row.get("attempts", 0) + 1
+            update = {"$unset": {"claim_id": "", "claimed_at": ""}}
+            if attempts >= max_attempts:
+                update["$set"] = {"status": "failed", "attempts": attempts, "failed_at": now}
+                failed += 1
+            else:
+                delay = min(retry_base * (2 ** (attempts - 1)), retry_max)
+                update["$set"] = {"status": "pending", "attempts": attempts, "next_attempt_at": now + delay}
+            ops.append(UpdateOne({"_id": row["_id"], "claim_id": claim_id, "status": "claimed"}, update))
+        if ops:
+            await self.pending.bulk_write(ops, ordered=False)
+        return len(ops) - failed, failed
+
+    async def release_stale_claims(self, older_than: timedelta):
+        """
+        Return rows claimed by a drainer that died mid-batch to the queue. They keep
+        their attempts and next_attempt_at, so they are due again straight away.
+        """
+        cutoff = datetime.now(timezone.utc) - older_than
+        result = await self.pending.update_many(
+            {"status": "claimed", "claimed_at": {"$lt": cutoff}},
+            {"$set": {"status": "pending"}, "$unset": {"claim_id": "", "claimed_at": ""}},
+        )
+        return result.modified_count
+
+    async def pending_queue_depth(self, tenant_id: str = None, status: str = "pending"):
+        query = {"status": status}
+        if tenant_id:
+            query["tenant_id"] = tenant_id
+        return await self.pending.count_documents(query)
+
+    # --- Customer balances and credit limits ---
+
+    async def _inc_customer_balance(self, tenant_id, establishment_id, customer_id, amount):
+        await self.balances.update_one(
+            _balance_key(tenant_id, establishment_id, customer_id),
+            {
+                "$inc": {"udhaar_outstanding": amount},
+                "$set": {"updated_at": datetime.now(timezone.utc)},
+            },
+            upsert=True,
+        )
+
+    async def get_customer_udhaar_total(self, tenant_id, establishment_id, customer_id):
+        """
+        Outstanding udhaar for a customer: a single indexed read of customer_balances.
+        """
+        doc = await self.balances.find_one(
+            _balance_key(tenant_id, establishment_id, customer_id),
+            {"_id": 0, "udhaar_outstanding": 1},
+        )
+        return doc.get("udhaar_outstanding", 0.0) if doc else 0.0
+
+    async def rebuild_customer_balances(self, tenant_id: str = None):
+        """
+        Recompute customer_balances from sales history (unpaid udhaar minus partial
+        repayments). Balances with no outstanding sales are reset to zero. Balances
+        updated by live sales or repayments after the rebuild started are skipped.
+        Returns the number of customer balances written.
+        """
+        ts = datetime.now(timezone.utc)
+        match = {"is_udhaar": True, "udhaar_paid": {"$ne": True}, "customer_id": {"$ne": None}}
+        if tenant_id:
+            match["tenant_id"] = tenant_id
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {"tenant_id": "$tenant_id", "establishment_id": "$establishment_id", "customer_id": "$customer_id"},
+                "udhaar_outstanding": {"$sum": {"$subtract": ["$total_price", {"$ifNull": ["$amount_received", 0]}]}},
+            }},
+        ]
+        # A balance a live sale or repayment has touched since ts already moved past
+        # this snapshot of sales history; it is left alone rather than overwritten
+        untouched = {"updated_at": {"$not": {"$gte": ts}}}
+        ops = [
+            UpdateOne(
+                {**_balance_key(row["_id"]["tenant_id"], row["_id"].get("establishment_id"), row["_id"]["customer_id"]), **untouched},
+                {"$set": {"udhaar_outstanding": row["udhaar_outstanding"], "updated_at": ts, "reconciled_at": ts}},
+                upsert=True,
+            )
+            async for row in self.sales.aggregate(pipeline)
+        ]
+        skipped = 0
+        if ops:
+            try:
+                await self.balances.bulk_write(ops, ordered=False)
+            except BulkWriteError as e:
+                # The upsert of a touched balance collides with the existing document
+                errors = e.details.get("writeErrors", [])
+                if any(err.get("code") != 11000 for err in errors):
+                    raise
+                skipped = len(errors)
+        stale = {"reconciled_at": {"$ne": ts}, **untouched}
+        if tenant_id:
+            stale["tenant_id"] = tenant_id
+        await self.balances.update_many(stale, {"$set": {"udhaar_outstanding": 0.0, "updated_at": ts, "reconciled_at": ts}})
+        return len(ops) - skipped
 
-def get_customer_credit_limit(tenant_id, establishment_id, customer_id):
-    return _customer_credit_limits.get((tenant_id, establishment_id, customer_id), 1000.0)
+    async def get_customer_credit_limit(self, tenant_id, establishment_id, customer_id):
+        """
+        Udhaar limit for a customer, served from the in-process cache when possible.
+        """
+        key = (tenant_id, establishment_id, customer_id)
+        limit = _credit_limit_cache.get(key)
+        if limit is None:
+            doc = await self.credit_limits.find_one(
+                _balance_key(tenant_id, establishment_id, customer_id),
+                {"_id": 0, "limit": 1},
+            )
+            limit = doc["limit"] if doc else DEFAULT_CREDIT_LIMIT
+            _credit_limit_cache.set(key, limit)
+        return limit
 
-def set_customer_credit_limit(tenant_id, establishment_id, customer_id, limit, user):
-    _customer_credit_limits[(tenant_id, establishment_id, customer_id)] = limit
-    return {"status": "ok", "new_limit": limit}
+    async def set_customer_credit_limit(self, tenant_id, establishment_id, customer_id, limit, user):
+        await self.credit_limits.update_one(
+            _balance_key(tenant_id, establishment_id, customer_id),
+            {"$set": {"limit": limit, "updated_by": user, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+        _credit_limit_cache.invalidate((tenant_id, establishment_id, customer_id))
+        return {"status": "ok", "new_limit": limit}
 
+sales_repo = SaleRepository()
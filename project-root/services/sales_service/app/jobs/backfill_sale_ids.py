@@ -0,0 +1,19 @@
+# One-time migration: give sales written by the old insert-then-update path a sale_id.
+# Docs left without one (crash between the two writes) get str(_id), same as add_sale.
+#     python -m jobs.backfill_sale_ids
+from db.mongo import close_client
+from db.sale_db import get_sales_collection
+
+def main():
+    result = get_sales_collection().update_many(
+        {"$or": [{"sale_id": {"$exists": False}}, {"sale_id": None}]},
+        [{"$set": {"sale_id": {"$toString": "$_id"}}}],
+    )
+    print(f"[backfill_sale_ids] set sale_id on {result.modified_count} sales")
+    return result.modified_count
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        close_client()
@@ -0,0 +1,139 @@
+# Background drainer for pending_inventory_deductions.
+# Started from the main.py lifespan; one per worker process (claims keep them from overlapping).
+import asyncio
+import os
+import time
+from collections import defaultdict
+from datetime import timedelta
+from uuid import uuid4
+
+from core.inventory_client import inventory_client, InventoryUnavailable
+from db.sale_db import sales_repo
+
+DRAIN_INTERVAL_SECONDS = float(os.getenv("PENDING_DRAIN_INTERVAL_SECONDS", "30"))
+DRAIN_BATCH_SIZE = int(os.getenv("PENDING_DRAIN_BATCH_SIZE", "500"))
+STALE_CLAIM_AFTER = timedelta(minutes=int(os.getenv("PENDING_STALE_CLAIM_MINUTES", "10")))
+# Retry backoff: base * 2**(attempts-1), capped; rows are parked as "failed" after MAX_ATTEMPTS
+MAX_ATTEMPTS = int(os.getenv("PENDING_MAX_ATTEMPTS", "20"))
+RETRY_BASE = timedelta(seconds=int(os.getenv("PENDING_RETRY_BASE_SECONDS", "30")))
+RETRY_MAX = timedelta(seconds=int(os.getenv("PENDING_RETRY_MAX_SECONDS", "3600")))
+
+metrics = {
+    "cycles": 0,
+    "applied_total": 0,        # queued deductions applied to inventory
+    "still_pending_total": 0,  # deductions put back because stock is still short
+    "failed_total": 0,         # deductions parked as "failed" after MAX_ATTEMPTS
+    "reclaimed_total": 0,      # stale claims returned to the queue
+    "returned_total": 0,       # stock given back for rows reclaimed while being applied
+    "last_cycle_at": None,
+    "last_cycle_applied": 0,
+    "drain_rate_per_sec": 0.0,
+}
+
+async def drain_once(batch_size: int = DRAIN_BATCH_SIZE) -> int:
+    """
+    Claim a batch, coalesce per (tenant_id, item_id), and reserve stock with one
+    inventory call per tenant. An item whose coalesced total is short falls back
+    to its rows one at a time, oldest first. Returns the number of queued
+    deductions applied.
+    """
+    claim_id = str(uuid4())
+    metrics["reclaimed_total"] += await sales_repo.release_stale_claims(STALE_CLAIM_AFTER)
+    groups = await sales_repo.claim_pending_deductions(claim_id, batch_size)
+    if not groups:
+        return 0
+    by_tenant = defaultdict(list)
+    for g in groups:
+        by_tenant[g["tenant_id"]].append(g)
+
+    applied = 0
+    for tenant_id, tenant_groups in by_tenant.items():
+        try:
+            results = await inventory_client.reserve(
+                tenant_id, [{"item_id": g["item_id"], "quantity": g["qty"]} for g in tenant_groups]
+            )
+        except InventoryUnavailable as e:
+            print(f"[PendingDrainer] inventory unavailable for tenant {tenant_id}: {e}")
+            await _release(claim_id, tenant_id)
+            continue
+        for g in tenant_groups:
+            result = results.get(g["item_id"], {})
+            if result.get("status") == "reserved":
+                applied += await _complete(claim_id, tenant_id, g["item_id"], g["qty"])
+            elif result.get("status") == "insufficient" and g["count"] > 1:
+                applied += await _drain_rows(claim_id, tenant_id, g["item_id"], result.get("quantity"))
+            else:
+                await _release(claim_id, tenant_id, g["item_id"])
+    return applied
+
+async def _drain_rows(claim_id, tenant_id, item_id, available=None) -> int:
+    """
+    Stock covers some of the item's rows but not their sum: reserve the rows
+    oldest first, one at a time, skipping any larger than the known stock, and
+    put the rest back in the queue.
+    """
+    applied = 0
+    for row in await sales_repo.claimed_deductions(claim_id, tenant_id, item_id):
+        if available is not None and row["qty"] > available:
+            continue
+        try:
+            results = await inventory_client.reserve(tenant_id, [{"item_id": item_id, "quantity": row["qty"]}])
+        except InventoryUnavailable as e:
+            print(f"[PendingDrainer] inventory unavailable for tenant {tenant_id}: {e}")
+            break
+        result = results.get(item_id, {})
+        available = result.get("quantity", available)
+        if result.get("status") == "reserved":
+            applied += await _complete(claim_id, tenant_id, item_id, row["qty"], ids=[row["_id"]])
+        elif result.get("status") != "insufficient":
+            break
+    await _release(claim_id, tenant_id, item_id)
+    return applied
+
+async def _complete(claim_id, tenant_id, item_id, reserved_qty, ids=None) -> int:
+    """
+    Mark reserved rows applied. Rows whose claim went stale and was handed to
+    another drainer are not ours to apply any more, so the stock reserved for
+    them is given back rather than deducted twice.
+    """
+    rows, qty = await sales_repo.complete_pending_deductions(claim_id, tenant_id, item_id, ids=ids)
+    if qty < reserved_qty:
+        try:
+            await inventory_client.release(tenant_id, [{"item_id": item_id, "quantity": reserved_qty - qty}])
+            metrics["returned_total"] += reserved_qty - qty
+        except InventoryUnavailable as e:
+            print(f"[PendingDrainer] could not return {reserved_qty - qty} of {item_id} for tenant {tenant_id}: {e}")
+    return rows
+
+async def _release(claim_id, tenant_id, item_id=None):
+    requeued, failed = await sales_repo.release_pending_deductions(
+        claim_id, tenant_id, item_id, max_attempts=MAX_ATTEMPTS, retry_base=RETRY_BASE, retry_max=RETRY_MAX
+    )
+    metrics["still_pending_total"] += requeued
+    metrics["failed_total"] += failed
+    if failed:
+        print(f"[PendingDrainer] {failed} deduction(s) for tenant {tenant_id} failed after {MAX_ATTEMPTS} attempts")
+
+async def run_drainer(interval: float = DRAIN_INTERVAL_SECONDS):
+    while True:
+        started = time.monotonic()
+        try:
+            applied = await drain_once()
+        except Exception as e:
+            # Keep draining on the next tick; a failed cycle leaves rows claimed until they go stale
+            print(f"[PendingDrainer] drain cycle failed: {e}")
+            applied = 0
+        metrics["cycles"] += 1
+        metrics["applied_total"] += applied
+        metrics["last_cycle_applied"] = applied
+        metrics["last_cycle_at"] = time.time()
+        # Rate while draining (applied per second of cycle time), not averaged over idle sleeps
+        metrics["drain_rate_per_sec"] = applied / max(time.monotonic() - started, 1e-6)
+        await asyncio.sleep(interval)
+
+async def get_metrics(tenant_id: str = None) -> dict:
+    return {
+        "queue_depth": await sales_repo.pending_queue_depth(tenant_id),
+        "failed_depth": await sales_repo.pending_queue_depth(tenant_id, status="failed"),
+        **metrics,
+    }
@@ -0,0 +1,19 @@
+# Rebuild customer_balances from sales history.
+# Run from the app directory (inside the container: /app):
+#     python -m jobs.reconcile_balances [tenant_id]
+import asyncio
+import sys
+from db.mongo import close_async_client
+from db.sale_db import sales_repo
+
+async def main(tenant_id: str = None):
+    written = await sales_repo.rebuild_customer_balances(tenant_id)
+    scope = tenant_id or "all tenants"
+    print(f"[reconcile_balances] rebuilt {written} customer balances for {scope}")
+    return written
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else None))
+    finally:
+        close_async_client()
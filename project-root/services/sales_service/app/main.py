@@ -1,7 +1,38 @@
 from fastapi import FastAPI
 from api import sales
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
+import asyncio
+from db.mongo import get_client, close_client, get_async_client, close_async_client
+from db.indexes import ensure_indexes
+from core.inventory_client import inventory_client
+from jobs.pending_drainer import run_drainer
+from retail_outbox import close_producer, run_outbox_relay
+from db.sale_db import get_sales_collection
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: build the pooled Mongo clients (Motor for request handlers) and apply declared indexes
+    get_client()
+    get_async_client()
+    ensure_indexes()
+    await inventory_client.start()
+    drainer_task = asyncio.create_task(run_drainer())
+    relay_task = asyncio.create_task(run_outbox_relay(get_sales_collection))
+    yield
+    # Shutdown: stop background tasks, then release pooled connections
+    for task in (drainer_task, relay_task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    await inventory_client.close()
+    close_producer()
+    close_async_client()
+    close_client()
+
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(sales.router)
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -0,0 +1,40 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+from core.inventory_client import InventoryClient
+
+@pytest.fixture
+def stand_in_inventory():
+    """
+    Factory for an in-process stand-in of inventory_service's reserve and
+    stock-adjust endpoints, backed by a {item_id: quantity} dict. Reserve
+    requests are appended to `calls` when one is given.
+    """
+    def make(stock, calls=None):
+        app = FastAPI()
+
+        @app.post("/items/reserve")
+        def reserve(body: dict):
+            if calls is not None:
+                calls.append(body["items"])
+            results = []
+            for r in body["items"]:
+                if r["item_id"] not in stock:
+                    results.append({"item_id": r["item_id"], "status": "not_found"})
+                elif stock[r["item_id"]] >= r["quantity"]:
+                    stock[r["item_id"]] -= r["quantity"]
+                    results.append({"item_id": r["item_id"], "status": "reserved",
+                                    "quantity": stock[r["item_id"]], "min_quantity": 0})
+                else:
+                    results.append({"item_id": r["item_id"], "status": "insufficient",
+                                    "quantity": stock[r["item_id"]], "min_quantity": 0})
+            return results
+
+        @app.patch("/items/{item_id}/stock")
+        def adjust(item_id: str, body: dict):
+            stock[item_id] = stock.get(item_id, 0) + body["delta"]
+            return {"item_id": item_id, "quantity": stock[item_id]}
+
+        return InventoryClient("http://inventory.test", transport=httpx.ASGITransport(app=app))
+
+    return make
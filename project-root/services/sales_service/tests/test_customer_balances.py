@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+from app.main import app
+from retail_auth import encode_token
+from api import sales as sales_api
+from db.indexes import ensure_indexes
+from db.sale_db import sales_repo, get_db, get_sales_collection, BALANCES_COLL_NAME, CREDIT_LIMITS_COLL_NAME, _credit_limit_cache
+from jobs.reconcile_balances import main as reconcile_balances
+
+client = TestClient(app)
+
+BALANCE_TENANT = "test_balance_tenant"
+CUSTOMER = {"tenant_id": BALANCE_TENANT, "establishment_id": "main", "customer_id": "cust-1"}
+
+class ReservedInventory:
+    """
+    Inventory stand-in that always has stock, so these tests only exercise the credit path.
+    """
+    async def reserve(self, tenant_id, items):
+        return {i["item_id"]: {"status": "reserved", "quantity": 100, "min_quantity": 0} for i in items}
+
+def _clean():
+    _credit_limit_cache.invalidate((BALANCE_TENANT, "main", "cust-1"))
+    for coll in (get_sales_collection(), get_db()[BALANCES_COLL_NAME], get_db()[CREDIT_LIMITS_COLL_NAME]):
+        coll.delete_many({"tenant_id": BALANCE_TENANT})
+
+@pytest.fixture
+def balance_env(monkeypatch):
+    ensure_indexes()
+    _clean()
+    monkeypatch.setattr(sales_api, "inventory_client", ReservedInventory())
+    token = encode_token({"sub": "balance_user", "tenant_id": BALANCE_TENANT})
+    yield {"Authorization": f"Bearer {token}"}
+    _clean()
+
+def udhaar_sale(headers, price):
+    return client.post("/sales", headers=headers, json={
+        **CUSTOMER, "item_id": "rice", "item_name": "Rice", "quantity": 1, "price_per_unit": price,
+        "payment_method": "CREDIT", "is_udhaar": True, "user": "balance_user",
+    })
+
+def receive(headers, sale_id, amount):
+    return client.patch(f"/sales/{sale_id}/receive_payment", headers=headers, json={
+        "tenant_id": BALANCE_TENANT, "sale_id": sale_id, "amount_received": amount,
+        "payment_method": "CASH", "received_on": datetime.now(timezone.utc).isoformat(),
+    })
+
+def outstanding():
+    doc = get_db()[BALANCES_COLL_NAME].find_one(CUSTOMER)
+    return doc["udhaar_outstanding"] if doc else 0.0
+
+def test_udhaar_sales_and_repayments_move_balance(balance_env):
+    first = udhaar_sale(balance_env, 300).json()["sale_id"]
+    udhaar_sale(balance_env, 200)
+    assert outstanding() == 500
+    # Partial repayment
+    assert receive(balance_env, first, 100).status_code == 200
+    assert outstanding() == 400
+    # Overpaying only clears what was owed on that sale
+    resp = receive(balance_env, first, 250)
+    assert resp.status_code == 200
+    assert resp.json()["udhaar_paid"] is True
+    assert outstanding() == 200
+    # Already settled
+    assert receive(balance_env, first, 10).status_code == 404
+    assert outstanding() == 200
+
+def test_credit_limit_checks_running_balance(balance_env):
+    resp = client.patch("/sales/customers/cust-1/set_udhaar_limit", headers=balance_env,
+                        params={"tenant_id": BALANCE_TENANT, "establishment_id": "main", "limit": 500})
+    assert resp.status_code == 200
+    assert udhaar_sale(balance_env, 400).status_code == 200
+    assert udhaar_sale(balance_env, 150).status_code == 400
+    assert outstanding() == 400
+    assert udhaar_sale(balance_env, 100).status_code == 200
+    assert outstanding() == 500
+
+def test_reconcile_rebuilds_from_sales_history(balance_env):
+    first = udhaar_sale(balance_env, 300).json()["sale_id"]
+    udhaar_sale(balance_env, 200)
+    receive(balance_env, first, 120)
+    balances = get_db()[BALANCES_COLL_NAME]
+    # Drift the ledger, and leave a balance for a customer who owes nothing
+    balances.update_one(CUSTOMER, {"$set": {"udhaar_outstanding": 9999}})
+    balances.insert_one({**CUSTOMER, "customer_id": "cust-2", "udhaar_outstanding": 50})
+    assert asyncio.run(reconcile_balances(BALANCE_TENANT)) == 1
+    assert outstanding() == 380
+    assert balances.find_one({**CUSTOMER, "customer_id": "cust-2"})["udhaar_outstanding"] == 0
+
+def test_concurrent_repayments_settle_once(balance_env):
+    sale_id = udhaar_sale(balance_env, 300).json()["sale_id"]
+
+    async def pay_twice():
+        return await asyncio.gather(*(
+            sales_repo.mark_udhaar_paid(BALANCE_TENANT, sale_id, 300, method) for method in ("CASH", "UPI")
+        ))
+
+    assert sorted(asyncio.run(pay_twice())) == [False, True]
+    sale = get_sales_collection().find_one({"tenant_id": BALANCE_TENANT, "sale_id": sale_id})
+    assert sale["udhaar_paid"] is True
+    assert sale["amount_received"] == 300
+    assert outstanding() == 0
+
+def test_reconcile_leaves_balances_touched_during_rebuild(balance_env):
+    balances = get_db()[BALANCES_COLL_NAME]
+    # A live udhaar sale for cust-2 landed after the rebuild read sales history
+    balances.insert_one({**CUSTOMER, "customer_id": "cust-2", "udhaar_outstanding": 75,
+                         "updated_at": datetime.now(timezone.utc) + timedelta(minutes=1)})
+    asyncio.run(reconcile_balances(BALANCE_TENANT))
+    assert balances.find_one({**CUSTOMER, "customer_id": "cust-2"})["udhaar_outstanding"] == 75
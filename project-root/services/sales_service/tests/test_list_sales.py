@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+from fastapi.testclient import TestClient
+import pytest
+from app.main import app
+from retail_auth import encode_token
+from db.sale_db import get_sales_collection
+
+client = TestClient(app)
+
+LIST_TENANT = "test_list_tenant"
+
+@pytest.fixture
+def listed_sales():
+    sales = get_sales_collection()
+    sales.delete_many({"tenant_id": LIST_TENANT})
+    start = datetime(2024, 5, 1, 9)
+    # Two sales share a timestamp, so paging has to break the tie on _id
+    stamps = [start, start + timedelta(minutes=1), start + timedelta(minutes=1), start + timedelta(minutes=2), start + timedelta(minutes=3)]
+    for i, ts in enumerate(stamps):
+        oid = ObjectId()
+        sales.insert_one({
+            "_id": oid, "sale_id": str(oid), "tenant_id": LIST_TENANT, "establishment_id": "main",
+            "item_id": f"sku-{i}", "item_name": f"Item {i}", "quantity": 1,
+            "price_per_unit": 10.0, "total_price": 10.0, "payment_method": "CASH", "user": "list_user", "timestamp": ts,
+        })
+    token = encode_token({"sub": "list_user", "tenant_id": LIST_TENANT})
+    yield {"Authorization": f"Bearer {token}"}
+    sales.delete_many({"tenant_id": LIST_TENANT})
+
+def test_list_sales_returns_everything_by_default(listed_sales):
+    resp = client.get("/sales", params={"tenant_id": LIST_TENANT}, headers=listed_sales)
+    assert resp.status_code == 200
+    assert len(resp.json()) == 5
+    assert "X-Next-Cursor" not in resp.headers
+
+def test_list_sales_pages_with_cursor(listed_sales):
+    seen, cursor = [], None
+    while True:
+        params = {"tenant_id": LIST_TENANT, "limit": 2, **({"cursor": cursor} if cursor else {})}
+        resp = client.get("/sales", params=params, headers=listed_sales)
+        assert resp.status_code == 200
+        seen += [sale["item_name"] for sale in resp.json()]
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert sorted(seen) == [f"Item {i}" for i in range(5)]
+    assert seen[0] == "Item 4"
+    bad = client.get("/sales", params={"tenant_id": LIST_TENANT, "limit": 2, "cursor": "nope"}, headers=listed_sales)
+    assert bad.status_code == 400
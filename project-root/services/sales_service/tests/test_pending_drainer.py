@@ -0,0 +1,113 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta, timezone
+from db.indexes import ensure_indexes
+from db.sale_db import get_db, PENDING_COLL_NAME
+from jobs import pending_drainer
+
+DRAIN_TENANT = "test_drain_tenant"
+
+@pytest.fixture
+def drain_env(monkeypatch, stand_in_inventory):
+    ensure_indexes()
+    pending = get_db()[PENDING_COLL_NAME]
+    pending.delete_many({"tenant_id": DRAIN_TENANT})
+    stock, calls = {"pen": 0}, []
+    monkeypatch.setattr(pending_drainer, "inventory_client", stand_in_inventory(stock, calls))
+    yield {"pending": pending, "stock": stock, "calls": calls}
+    pending.delete_many({"tenant_id": DRAIN_TENANT})
+
+def queue(pending, qty, **extra):
+    now = datetime.now(timezone.utc)
+    pending.insert_one({
+        "tenant_id": DRAIN_TENANT, "establishment_id": "main", "item_id": "pen", "qty": qty,
+        "user": "drain_user", "status": "pending", "attempts": 0, "created_at": now,
+        "next_attempt_at": now, **extra,
+    })
+
+def drain():
+    return asyncio.run(pending_drainer.drain_once())
+
+def test_drain_applies_coalesced_deductions(drain_env):
+    drain_env["stock"]["pen"] = 10
+    queue(drain_env["pending"], 2)
+    queue(drain_env["pending"], 3)
+    assert drain() == 2
+    assert drain_env["stock"]["pen"] == 5
+    # One reserve call for both rows
+    assert drain_env["calls"] == [[{"item_id": "pen", "quantity": 5}]]
+    assert drain_env["pending"].count_documents({"tenant_id": DRAIN_TENANT, "status": "applied"}) == 2
+
+def test_short_stock_backs_off(drain_env):
+    queue(drain_env["pending"], 2)
+    assert drain() == 0
+    row = drain_env["pending"].find_one({"tenant_id": DRAIN_TENANT})
+    assert row["status"] == "pending"
+    assert row["attempts"] == 1
+    assert row["next_attempt_at"].replace(tzinfo=timezone.utc) > datetime.now(timezone.utc)
+    # Not due yet: the next cycle leaves it alone, even once stock arrives
+    drain_env["stock"]["pen"] = 10
+    assert drain() == 0
+    assert len(drain_env["calls"]) == 1
+
+def test_row_fails_after_max_attempts(drain_env, monkeypatch):
+    monkeypatch.setattr(pending_drainer, "MAX_ATTEMPTS", 3)
+    queue(drain_env["pending"], 2, attempts=2)
+    assert drain() == 0
+    row = drain_env["pending"].find_one({"tenant_id": DRAIN_TENANT})
+    assert row["status"] == "failed"
+    assert row["attempts"] == 3
+    assert "claim_id" not in row
+    # Failed rows are not picked up again
+    drain_env["stock"]["pen"] = 10
+    assert drain() == 0
+    assert len(drain_env["calls"]) == 1
+
+def test_stale_claim_is_reclaimed(drain_env):
+    drain_env["stock"]["pen"] = 10
+    queue(drain_env["pending"], 2, status="claimed", claim_id="dead-drainer",
+          claimed_at=datetime.now(timezone.utc) - pending_drainer.STALE_CLAIM_AFTER - timedelta(minutes=1))
+    # A fresh claim from a live drainer is left alone
+    queue(drain_env["pending"], 4, status="claimed", claim_id="live-drainer",
+          claimed_at=datetime.now(timezone.utc))
+    assert drain() == 1
+    assert drain_env["stock"]["pen"] == 8
+    assert drain_env["pending"].find_one({"tenant_id": DRAIN_TENANT, "qty": 4})["status"] == "claimed"
+
+def test_short_total_applies_the_rows_that_fit(drain_env):
+    drain_env["stock"]["pen"] = 5
+    for qty in (3, 4, 2):
+        queue(drain_env["pending"], qty)
+    # 9 in total is short; the oldest rows that fit are applied one at a time
+    assert drain() == 2
+    assert drain_env["stock"]["pen"] == 0
+    assert drain_env["calls"] == [
+        [{"item_id": "pen", "quantity": 9}],
+        [{"item_id": "pen", "quantity": 3}],
+        [{"item_id": "pen", "quantity": 2}],
+    ]
+    left = drain_env["pending"].find_one({"tenant_id": DRAIN_TENANT, "status": "pending"})
+    assert left["qty"] == 4 and left["attempts"] == 1
+
+def test_stock_returned_when_claim_reclaimed_mid_apply(drain_env, monkeypatch):
+    drain_env["stock"]["pen"] = 10
+    queue(drain_env["pending"], 2)
+    client = pending_drainer.inventory_client
+    reserve = client.reserve
+
+    async def slow_reserve(tenant_id, items):
+        results = await reserve(tenant_id, items)
+        # The drainer stalled past STALE_CLAIM_AFTER and another one released its claim
+        drain_env["pending"].update_many(
+            {"tenant_id": DRAIN_TENANT, "status": "claimed"},
+            {"$set": {"status": "pending"}, "$unset": {"claim_id": "", "claimed_at": ""}},
+        )
+        return results
+
+    monkeypatch.setattr(client, "reserve", slow_reserve)
+    returned = pending_drainer.metrics["returned_total"]
+    assert drain() == 0
+    # The reserved stock went back, so the row's next drain doesn't deduct it twice
+    assert drain_env["stock"]["pen"] == 10
+    assert drain_env["pending"].find_one({"tenant_id": DRAIN_TENANT})["status"] == "pending"
+    assert pending_drainer.metrics["returned_total"] == returned + 2
@@ -0,0 +1,90 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+from app.main import app
+from retail_auth import encode_token
+from api import sales as sales_api
+from db.indexes import ensure_indexes
+from db.sale_db import get_sales_collection, get_db, PENDING_COLL_NAME
+
+client = TestClient(app)
+
+BATCH_TENANT = "test_batch_tenant"
+
+@pytest.fixture
+def batch_env(monkeypatch, stand_in_inventory):
+    ensure_indexes()
+    get_sales_collection().delete_many({"tenant_id": BATCH_TENANT})
+    get_db()[PENDING_COLL_NAME].delete_many({"tenant_id": BATCH_TENANT})
+    stock = {"pen": 100}
+    monkeypatch.setattr(sales_api, "inventory_client", stand_in_inventory(stock))
+    token = encode_token({"sub": "batch_user", "tenant_id": BATCH_TENANT})
+    yield {"stock": stock, "headers": {"Authorization": f"Bearer {token}"}}
+    get_sales_collection().delete_many({"tenant_id": BATCH_TENANT})
+    get_db()[PENDING_COLL_NAME].delete_many({"tenant_id": BATCH_TENANT})
+
+def batch_sale(key, item_id="pen", **extra):
+    return {
+        "tenant_id": BATCH_TENANT, "establishment_id": "main", "item_id": item_id,
+        "item_name": "Pen", "quantity": 2, "price_per_unit": 5.0, "payment_method": "CASH",
+        "user": "batch_user", "idempotency_key": key, **extra,
+    }
+
+def test_batch_keeps_pos_timestamp(batch_env):
+    sold_at = (datetime.now(timezone.utc) - timedelta(hours=5)).replace(microsecond=0)
+    resp = client.post("/sales/batch", headers=batch_env["headers"],
+                       json={"sales": [batch_sale("ts-1", timestamp=sold_at.isoformat())]})
+    assert resp.status_code == 200
+    assert resp.json()["results"][0]["status"] == "created"
+    doc = get_sales_collection().find_one({"tenant_id": BATCH_TENANT, "idempotency_key": "ts-1"})
+    assert doc["timestamp"].replace(tzinfo=timezone.utc) == sold_at
+
+def test_batch_rejects_naive_or_future_timestamp(batch_env):
+    naive = datetime.utcnow().isoformat()
+    future = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+    for ts in (naive, future):
+        resp = client.post("/sales/batch", headers=batch_env["headers"],
+                           json={"sales": [batch_sale("ts-bad", timestamp=ts)]})
+        assert resp.status_code == 422
+
+def test_batch_replay_is_idempotent(batch_env):
+    body = {"sales": [batch_sale("r-1"), batch_sale("r-2"), batch_sale("r-1"), batch_sale("r-3", item_id="ghost")]}
+    first = client.post("/sales/batch", headers=batch_env["headers"], json=body).json()
+    assert [r["status"] for r in first["results"]] == ["created", "created", "duplicate", "created"]
+    assert first["results"][2]["sale_id"] == first["results"][0]["sale_id"]
+    assert first["results"][3]["warning"]  # unknown item: deduction queued
+    assert batch_env["stock"]["pen"] == 96
+    second = client.post("/sales/batch", headers=batch_env["headers"], json=body).json()
+    assert second["created"] == 0 and second["duplicates"] == 4
+    assert [r["sale_id"] for r in second["results"]] == [r["sale_id"] for r in first["results"]]
+    assert batch_env["stock"]["pen"] == 96  # replay reserved nothing
+    assert get_db()[PENDING_COLL_NAME].count_documents({"tenant_id": BATCH_TENANT}) == 1
+
+def test_batch_raced_duplicate_releases_stock(batch_env, monkeypatch):
+    body = {"sales": [batch_sale("race-1"), batch_sale("race-2", item_id="ghost")]}
+
+    first = client.post("/sales/batch", headers=batch_env["headers"], json=body).json()
+    assert first["created"] == 2
+    assert batch_env["stock"]["pen"] == 98
+    lookup = sales_api.sales_repo.find_sales_by_idempotency_keys
+    lookups = []
+
+    # A concurrent replay that passed the idempotency lookup before the first insert landed
+    async def raced_lookup(tenant_id, keys):
+        lookups.append(keys)
+        return {} if len(lookups) == 1 else await lookup(tenant_id, keys)
+    monkeypatch.setattr(sales_api.sales_repo, "find_sales_by_idempotency_keys", raced_lookup)
+    raced = client.post("/sales/batch", headers=batch_env["headers"], json=body).json()
+    assert [r["status"] for r in raced["results"]] == ["duplicate", "duplicate"]
+    # Pointed at the sales that won the insert
+    assert [r["sale_id"] for r in raced["results"]] == [r["sale_id"] for r in first["results"]]
+    assert batch_env["stock"]["pen"] == 98  # the raced copy's reservation was given back
+    assert get_db()[PENDING_COLL_NAME].count_documents({"tenant_id": BATCH_TENANT}) == 1
+
+def test_batch_repeat_of_rejected_sale_is_rejected(batch_env):
+    over_limit = batch_sale("credit-1", customer_id="cust-9", is_udhaar=True, payment_method="CREDIT",
+                            quantity=1, price_per_unit=1_000_000)
+    resp = client.post("/sales/batch", headers=batch_env["headers"], json={"sales": [over_limit, over_limit]}).json()
+    assert [r["status"] for r in resp["results"]] == ["rejected", "rejected"]
+    assert all(r["error"] and r["sale_id"] is None for r in resp["results"])
+    assert resp["rejected"] == 2 and resp["duplicates"] == 0
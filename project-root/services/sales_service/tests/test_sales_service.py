@@ -38,3 +38,24 @@ def test_get_sales(auth_token):
     assert resp.status_code == 200
     assert type(resp.json()) is list
     assert any(sale["item_name"] == "Pen" for sale in resp.json())
+
+def test_inventory_client_reserve_against_stand_in(stand_in_inventory):
+    import asyncio
+
+    stock = {"pen": 5, "ink": 1}
+
+    async def run():
+        inv = stand_in_inventory(stock)
+        try:
+            return await inv.reserve("t1", [
+                {"item_id": "pen", "quantity": 3},
+                {"item_id": "ink", "quantity": 2},
+                {"item_id": "ghost", "quantity": 1},
+            ])
+        finally:
+            await inv.close()
+
+    res = asyncio.run(run())
+    assert res["pen"]["status"] == "reserved" and res["pen"]["quantity"] == 2
+    assert res["ink"]["status"] == "insufficient"
+    assert res["ghost"]["status"] == "not_found"
@@ -1,19 +1,19 @@
 from fastapi import APIRouter, HTTPException
 from models.tenants import TenantCreate
-from db.tenant_db import add_tenant, get_tenant
+from db.tenant_db import tenant_repo
 
 router = APIRouter()
 
 @router.post("/tenants")
-def create_tenant(data: TenantCreate):
-    if get_tenant(data.tenant_id):
+async def create_tenant(data: TenantCreate):
+    if await tenant_repo.get_tenant(data.tenant_id):
         raise HTTPException(status_code=409, detail="Tenant ID already exists")
-    add_tenant(data)
+    await tenant_repo.add_tenant(data)
     return {"msg": "Tenant created"}
 
 @router.get("/tenants/{tenant_id}")
-def read_tenant(tenant_id: str):
-    tenant = get_tenant(tenant_id)
+async def read_tenant(tenant_id: str):
+    tenant = await tenant_repo.get_tenant(tenant_id)
     if not tenant:
         raise HTTPException(status_code=404, detail="Tenant not found")
     return tenant
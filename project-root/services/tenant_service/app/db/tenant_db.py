@@ -1,22 +1,21 @@
-from pymongo import MongoClient
 from datetime import datetime
+from db.mongo import get_async_db
 
-def get_tenant_collection():
-    from os import getenv
-    db_name = getenv("TENANT_DB_NAME", "tenant_service_db")
-    mongo_uri = getenv("TENANT_MONGO_URI", "mongodb://localhost:27017")
-    client = MongoClient(mongo_uri)
-    return client[db_name]["tenants"]
+class TenantRepository:
+    """
+    Async (Motor) data access for tenants.
+    """
 
-def add_tenant(data):
-    col = get_tenant_collection()
-    doc = data.dict()
-    doc["created_at"] = datetime.utcnow().isoformat()
-    col.insert_one(doc)
+    @property
+    def tenants(self):
+        return get_async_db()["tenants"]
 
-def get_tenant(tenant_id):
-    col = get_tenant_collection()
-    doc = col.find_one({"tenant_id": tenant_id})
-    if doc:
-        doc.pop("_id", None)
-    return doc
+    async def add_tenant(self, data):
+        doc = data.dict()
+        doc["created_at"] = datetime.utcnow().isoformat()
+        await self.tenants.insert_one(doc)
+
+    async def get_tenant(self, tenant_id):
+        return await self.tenants.find_one({"tenant_id": tenant_id}, {"_id": 0})
+
+tenant_repo = TenantRepository()
@@ -1,10 +1,26 @@
 from fastapi import FastAPI
 from api import tenant  # assumes your router is at api/tenant.py
+from contextlib import asynccontextmanager
+from db.mongo import get_client, close_client, get_async_client, close_async_client
+from db.indexes import ensure_indexes
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: build the pooled Mongo clients (Motor for request handlers) and apply declared indexes
+    get_client()
+    get_async_client()
+    ensure_indexes()
+    yield
+    # Shutdown: release pooled connections
+    close_async_client()
+    close_client()
+
 
 app = FastAPI(
     title="Tenant Service",
     description="APIs for onboarding and managing business tenants in the Retail Management Platform.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Mount the tenant router
@@ -1,25 +1,35 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends
 from models.user import UserCreate, UserLogin, UserProfile, UserProfileUpdate
-from core.auth_utils import hash_password, verify_password, create_access_token, get_current_user
+from core.auth_utils import (
+    hash_password, verify_password, create_access_token, get_current_user, invalidate_principals,
+    PASSWORD_VERSION_CLAIM, PASSWORD_VERSION_FIELD,
+)
 from db.mongo import get_users_collection
-from core.kafka_producer import emit_event
+from retail_outbox import outbox_envelope, attach_outbox
+from core.password_pool import PasswordPoolBusy, needs_rehash
+from pymongo.errors import DuplicateKeyError
 
 from datetime import datetime
 
 router = APIRouter()
 
+# Unique index field -> conflict message (indexes declared in db/indexes.py)
+DUPLICATE_FIELD_DETAILS = {
+    "username": "Username already exists",
+    "mobile": "Mobile already used",
+    "email": "Email already used",
+}
+
+def duplicate_field(error: DuplicateKeyError):
+    """
+    Which unique field a duplicate-key error is about (from the server's keyPattern).
+    """
+    key_pattern = (error.details or {}).get("keyPattern") or {}
+    return next(iter(key_pattern), None)
+
 @router.post("/register")
 def register(user: UserCreate):
     users = get_users_collection()
-
-    # Enforce unique username and mobile; email is optional
-    if users.find_one({"username": user.username}):
-        raise HTTPException(status_code=409, detail="Username already exists")
-    if users.find_one({"mobile": user.mobile}):
-        raise HTTPException(status_code=409, detail="Mobile already used")
-    if user.email and users.find_one({"email": user.email}):
-        raise HTTPException(status_code=409, detail="Email already used")
-
     hashed_pwd = hash_password(user.password)
     user_doc = {
         "tenant_id": user.tenant_id,
@@ -35,9 +45,8 @@ def register(user: UserCreate):
         "roles": ["user"],
         "created_at": datetime.utcnow()
     }
-    users.insert_one(user_doc)
 
-    # Emit Kafka event after successful registration
+    # user.registered is stored with the user (outbox) and published by the relay
     event = {
         "event_type": "user.registered",
         "tenant_id": user_doc["tenant_id"],
@@ -50,12 +59,34 @@ def register(user: UserCreate):
         "device_type": user_doc.get("device_type"),
         "registered_at": str(user_doc["created_at"])
     }
-    emit_event("user.registered", event)
+    attach_outbox(user_doc, outbox_envelope(
+        f"user.registered:{user_doc['tenant_id']}:{user_doc['username']}", "user.registered",
+        user_doc["tenant_id"], event, user_doc["created_at"],
+    ))
+    # Unique indexes on username, mobile and email enforce uniqueness in the same round trip
+    try:
+        users.insert_one(user_doc)
+    except DuplicateKeyError as e:
+        raise HTTPException(status_code=409, detail=DUPLICATE_FIELD_DETAILS.get(duplicate_field(e), "User already exists"))
 
     return {"msg": "User registered"}
 
+def rehash_password(username: str, old_hash: str, password: str):
+    """
+    Re-hash at the configured work factor after a successful login. Only swaps
+    the hash if it hasn't changed meanwhile; a busy pool just defers it to the next login.
+    """
+    try:
+        new_hash = hash_password(password)
+    except PasswordPoolBusy:
+        return
+    get_users_collection().update_one(
+        {"username": username, "password_hash": old_hash},
+        {"$set": {"password_hash": new_hash}}
+    )
+
 @router.post("/login")
-def login(credentials: UserLogin):
+def login(credentials: UserLogin, background_tasks: BackgroundTasks):
     users = get_users_collection()
     query = {}
     if credentials.username:
@@ -68,7 +99,13 @@ def login(credentials: UserLogin):
     record = users.find_one(query)
     if not record or not verify_password(credentials.password, record["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    access_token = create_access_token({"sub": record["username"]})
+    if needs_rehash(record["password_hash"]):
+        background_tasks.add_task(rehash_password, record["username"], record["password_hash"], credentials.password)
+    access_token = create_access_token({
+        "sub": record["username"],
+        "tenant_id": record["tenant_id"],
+        PASSWORD_VERSION_CLAIM: record.get(PASSWORD_VERSION_FIELD, 0),
+    })
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/profile", response_model=UserProfile)
@@ -84,19 +121,9 @@ def update_profile(update: UserProfileUpdate, current_user: dict = Depends(get_c
         {"username": current_user["username"]},
         {"$set": {"full_name": new_full_name, "language_pref": new_language}}
     )
-    user = users.find_one({"username": current_user["username"]})
-    user.pop("_id", None)  # Optional: remove ObjectId before returning
-    return {
-        "username": user["username"],
-        "mobile": user["mobile"],
-        "Business_name": user["Business_name"],
-        "email": user.get("email"),
-        "full_name": user.get("full_name"),
-        "language_pref": user.get("language_pref"),
-        "device_model": user.get("device_model"),
-        "device_type": user.get("device_type"),
-        "roles": user.get("roles", [])
-    }
+    invalidate_principals(current_user["username"])
+    user = users.find_one({"username": current_user["username"]}, {"_id": 0, "password_hash": 0})
+    return user
 
 @router.post("/change-password")
 def change_password(old_password: str, new_password: str, current_user: dict = Depends(get_current_user)):
@@ -105,5 +132,13 @@ def change_password(old_password: str, new_password: str, current_user: dict = D
     if not user or not verify_password(old_password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Old password incorrect")
     new_hash = hash_password(new_password)
-    users.update_one({"username": current_user["username"]}, {"$set": {"password_hash": new_hash}})
+    # Tokens issued for the previous password version are rejected (see auth_utils._load_principal)
+    users.update_one(
+        {"username": current_user["username"]},
+        {
+            "$set": {"password_hash": new_hash, "password_changed_at": datetime.utcnow()},
+            "$inc": {PASSWORD_VERSION_FIELD: 1},
+        }
+    )
+    invalidate_principals(current_user["username"])
     return {"msg": "Password updated"}
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from models.user import UserProfile, UserProfileUpdate
-from core.auth_utils import get_current_user
+from core.auth_utils import get_current_user, invalidate_principals
 from db.mongo import get_users_collection
 
 router = APIRouter()
@@ -40,6 +40,7 @@ def update_profile(
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    invalidate_principals(current_user["username"])
 
     # Fetch and return the updated profile
     user = users.find_one({"username": current_user["username"]})
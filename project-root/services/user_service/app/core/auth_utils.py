@@ -1,43 +1,85 @@
-import bcrypt
-from jose import jwt, JWTError
+import hashlib
+import os
+import time
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
+from retail_auth import InvalidToken, decode_token, encode_token
 from db.mongo import get_users_collection  # USE THE MONGO HELPER NOW
-from datetime import datetime, timedelta, timezone
+from retail_outbox import OUTBOX_FIELD, OUTBOX_PENDING_FIELD
+from core.password_pool import hash_password, verify_password  # bcrypt runs in the password pool
+from utils.ttl_cache import TTLCache
+from datetime import timezone
 
-SECRET_KEY = "supersecretkey"  # Use env in prod!
-ALGORITHM = "HS256"
+# Tokens are signed with the shared key ring (SECRET_KEY or AUTH_KEYS_FILE), so
+# every service verifies them with retail_auth
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+# Fields never exposed on the request principal
+PRINCIPAL_PROJECTION = {"_id": 0, "password_hash": 0, OUTBOX_FIELD: 0, OUTBOX_PENDING_FIELD: 0}
 
-def verify_password(password: str, password_hash: str) -> bool:
-    res = bcrypt.checkpw(password.encode(), password_hash.encode())
-    print(f"Verifying password: {password} against hash: {password_hash} Result: {res}")
-    return res
+# Per-worker cache of verified principals, keyed by a hash of the bearer token so
+# raw tokens are never held. Profile and password changes drop the user's entries
+# in this worker; the TTL bounds how long another worker can serve a stale one.
+_principal_cache = TTLCache(
+    maxsize=int(os.getenv("USER_PRINCIPAL_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_PRINCIPAL_CACHE_TTL", "60")),
+)
+
+# Bumped on every password change; tokens carry the version they were issued for
+PASSWORD_VERSION_FIELD = "password_version"
+PASSWORD_VERSION_CLAIM = "pwv"
 
 def create_access_token(data: dict, expires_minutes: int = 60):
-    to_encode = data.copy()
-    expire = datetime.now(UTC) + timedelta(minutes=expires_minutes)
-    to_encode.update({'exp': expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return encode_token(data, expires_minutes)
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _load_principal(token: str) -> dict:
+    """
+    Verify the token and load its user. Tokens minted for an earlier password
+    version (i.e. before the user's last password change) are rejected.
+    """
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except JWTError:
+        payload = decode_token(token)
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=e.detail)
+    username = payload.get("sub")
+    if username is None:
         raise HTTPException(status_code=401, detail="Invalid token")
 
     users = get_users_collection()
-    user = users.find_one({"username": username})
+    user = users.find_one({"username": username}, PRINCIPAL_PROJECTION)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    user.pop("_id", None)  # Remove ObjectId for cleaner output (optional)
-    return user
+    changed_at = user.pop("password_changed_at", None)
+    version = user.pop(PASSWORD_VERSION_FIELD, 0)
+    if PASSWORD_VERSION_CLAIM in payload:
+        revoked = payload[PASSWORD_VERSION_CLAIM] != version
+    else:
+        # Tokens from before the version claim: fall back to the issue time. iat has
+        # one-second resolution, so a token from the second of the change is revoked too.
+        revoked = bool(changed_at) and payload.get("iat", 0) <= int(changed_at.replace(tzinfo=timezone.utc).timestamp())
+    if revoked:
+        raise HTTPException(status_code=401, detail="Token revoked")
+    return {"exp": payload.get("exp"), "user": user}
+
+def get_current_user(token: str = Depends(oauth2_scheme)):
+    key = _token_key(token)
+    principal = _principal_cache.get(key)
+    if principal is None:
+        principal = _load_principal(token)
+        _principal_cache.set(key, principal)
+    elif principal["exp"] is not None and principal["exp"] <= time.time():
+        _principal_cache.invalidate(key)
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return dict(principal["user"])  # handlers may modify their copy
+
+def invalidate_principals(username: str) -> int:
+    """
+    Drop this worker's cached principals for a user (after a profile or password change).
+    """
+    return _principal_cache.invalidate_where(lambda p: p["user"]["username"] == username)
 
 def get_current_tenant(current_user=Depends(get_current_user)) -> str:
     """
@@ -0,0 +1,99 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt
+
+# bcrypt runs in a dedicated process pool so a login burst can't pin every
+# request thread (and the event loop behind them) on CPU
+BCRYPT_ROUNDS = int(os.getenv("USER_BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS = int(os.getenv("USER_BCRYPT_WORKERS", str(os.cpu_count() or 1)))
+# Hash/verify calls allowed in flight (running + queued) per worker process; beyond this callers get 429
+BCRYPT_MAX_PENDING = int(os.getenv("USER_BCRYPT_MAX_PENDING", str(BCRYPT_WORKERS * 4)))
+BCRYPT_TIMEOUT_SECONDS = float(os.getenv("USER_BCRYPT_TIMEOUT_SECONDS", "30"))
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+pool_stats = {"submitted": 0, "rejected": 0, "in_flight": 0}
+_stats_lock = threading.Lock()
+
+class PasswordPoolBusy(Exception):
+    """
+    Raised when BCRYPT_MAX_PENDING hash/verify calls are already in flight.
+    """
+
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+def _verify(password: str, password_hash: str) -> bool:
+    return bcrypt.checkpw(password.encode(), password_hash.encode())
+
+def get_pool() -> ProcessPoolExecutor:
+    """
+    Lazily start this worker's pool. Children are spawned, not forked, so they
+    don't inherit the Kafka and Mongo client threads.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ProcessPoolExecutor(
+                    max_workers=BCRYPT_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                _pool_pid = pid
+    return _pool
+
+def _run(fn, *args):
+    """
+    Run fn in the pool and wait for it, or fail fast when the pool is saturated.
+    """
+    with _stats_lock:
+        if pool_stats["in_flight"] >= BCRYPT_MAX_PENDING:
+            pool_stats["rejected"] += 1
+            raise PasswordPoolBusy()
+        pool_stats["in_flight"] += 1
+        pool_stats["submitted"] += 1
+    try:
+        return get_pool().submit(fn, *args).result(timeout=BCRYPT_TIMEOUT_SECONDS)
+    finally:
+        with _stats_lock:
+            pool_stats["in_flight"] -= 1
+
+def hash_password(password: str, rounds: int = None) -> str:
+    return _run(_hash, password, rounds or BCRYPT_ROUNDS)
+
+def verify_password(password: str, password_hash: str) -> bool:
+    return _run(_verify, password, password_hash)
+
+def hash_rounds(password_hash: str) -> int:
+    # "$2b$12$<salt+hash>" -> 12
+    return int(password_hash.split("$")[2])
+
+def needs_rehash(password_hash: str) -> bool:
+    """
+    True when a stored hash was made with a different work factor than the configured one.
+    """
+    return hash_rounds(password_hash) != BCRYPT_ROUNDS
+
+def close_pool():
+    """
+    Shut the pool down (called from the app lifespan on shutdown).
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+        _pool_pid = None
+
+def get_pool_metrics() -> dict:
+    return {
+        **pool_stats,
+        "max_pending": BCRYPT_MAX_PENDING,
+        "workers": BCRYPT_WORKERS,
+        "rounds": BCRYPT_ROUNDS,
+    }
@@ -0,0 +1,23 @@
+from pymongo import IndexModel, ASCENDING
+from retail_db import ensure_indexes as ensure_declared_indexes
+from db.mongo import db as users_db
+
+# Every index this service relies on, per collection. Applied once at startup
+# (see main.py lifespan) so request handlers never issue DDL; creation and drift
+# reporting live in the shared retail_db index manager.
+INDEXES = {
+    "users": [
+        # Registration relies on these for uniqueness: one insert, duplicates map back to the field
+        IndexModel([("username", ASCENDING)], unique=True),
+        IndexModel([("mobile", ASCENDING)], unique=True),
+        # Email is optional (stored as null when absent), so only real addresses must be unique
+        IndexModel([("email", ASCENDING)], unique=True,
+                   partialFilterExpression={"email": {"$type": "string"}}),
+        # Outbox relay: only documents with unpublished events are indexed
+        IndexModel([("outbox_pending", ASCENDING), ("_id", ASCENDING)],
+                   partialFilterExpression={"outbox_pending": True}),
+    ],
+}
+
+def ensure_indexes(db=None):
+    return ensure_declared_indexes(db if db is not None else users_db, INDEXES)
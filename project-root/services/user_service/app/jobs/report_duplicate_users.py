@@ -0,0 +1,40 @@
+# Report users that share a username, mobile or email. Registration relies on
+# unique indexes for these (db/indexes.py); the old check-then-insert could
+# create duplicates, and while any remain the index is not built (logged at
+# startup). Resolve the reported accounts by hand, then restart the service.
+# Run from the app directory (inside the container: /app):
+#     python -m jobs.report_duplicate_users
+from db.mongo import get_users_collection
+
+UNIQUE_FIELDS = ("username", "mobile", "email")
+
+def find_duplicates(users=None) -> dict:
+    """
+    {field: [{"value", "usernames", "count"}]} for each unique field with clashing users.
+    """
+    users = users if users is not None else get_users_collection()
+    report = {}
+    for field in UNIQUE_FIELDS:
+        pipeline = [
+            # Email is only unique when present (partial index on strings)
+            {"$match": {field: {"$type": "string"}}},
+            {"$group": {"_id": f"${field}", "usernames": {"$push": "$username"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}},
+            {"$sort": {"_id": 1}},
+        ]
+        clashes = [{"value": g["_id"], "usernames": g["usernames"], "count": g["count"]} for g in users.aggregate(pipeline)]
+        if clashes:
+            report[field] = clashes
+    return report
+
+def main():
+    report = find_duplicates()
+    if not report:
+        print("[report_duplicate_users] no duplicate users")
+    for field, clashes in report.items():
+        for c in clashes:
+            print(f"[report_duplicate_users] {field}={c['value']!r}: {c['count']} users {c['usernames']}")
+    return report
+
+if __name__ == "__main__":
+    main()
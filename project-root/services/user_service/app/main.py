@@ -1,10 +1,47 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse
 from api import auth
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
+import asyncio
+from retail_outbox import close_producer, get_relay_metrics, run_outbox_relay
+from core.auth_utils import get_current_user
+from core.password_pool import PasswordPoolBusy, close_pool, get_pool_metrics
+from db.indexes import ensure_indexes
+from db.mongo import get_users_collection
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: apply declared indexes, start publishing outbox events
+    ensure_indexes()
+    relay_task = asyncio.create_task(run_outbox_relay(get_users_collection))
+    yield
+    # Shutdown: stop the relay and flush buffered Kafka events
+    relay_task.cancel()
+    try:
+        await relay_task
+    except asyncio.CancelledError:
+        pass
+    close_producer()
+    close_pool()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.include_router(auth.router)
+
+@app.exception_handler(PasswordPoolBusy)
+async def password_pool_busy(request: Request, exc: PasswordPoolBusy):
+    # Shed load fast instead of queueing logins behind a saturated bcrypt pool
+    return JSONResponse(status_code=429, content={"detail": "Too many sign-ins in progress, retry shortly"},
+                        headers={"Retry-After": "1"})
+
+@app.get("/auth/password_pool/metrics")
+def password_pool_metrics(user=Depends(get_current_user)):
+    return get_pool_metrics()
+
+@app.get("/auth/outbox/metrics")
+def outbox_metrics(user=Depends(get_current_user)):
+    return get_relay_metrics()
+
 app.mount("/static", StaticFiles(directory="static"), name="static")
 @app.get("/")
 def root():
@@ -1,6 +1,13 @@
 import pytest
+from datetime import datetime, timedelta
 from fastapi.testclient import TestClient
+from pymongo.errors import DuplicateKeyError
 from app.main import app
+from api.auth import duplicate_field
+from core import auth_utils, password_pool
+from jobs import report_duplicate_users
+from db.mongo import get_users_collection
+from retail_auth import decode_token
 
 client = TestClient(app)
 
@@ -40,6 +47,24 @@ def test_register_duplicate():
     res = client.post("/register", json=user)
     assert res.status_code == 409
 
+def test_register_conflict_names_field():
+    base = {"tenant_id": "test_tenant", "business_name": "Dup Stores", "password": "Testpass123"}
+    first = client.post("/register", json={**base, "username": "dupcheck1", "mobile": "9999900101",
+                                           "email": "dupcheck@example.com"})
+    assert first.status_code in (200, 409)
+    res = client.post("/register", json={**base, "username": "dupcheck2", "mobile": "9999900101"})
+    assert res.status_code == 409
+    assert res.json()["detail"] == "Mobile already used"
+    res = client.post("/register", json={**base, "username": "dupcheck3", "mobile": "9999900103",
+                                         "email": "dupcheck@example.com"})
+    assert res.status_code == 409
+    assert res.json()["detail"] == "Email already used"
+
+def test_duplicate_field_from_key_pattern():
+    error = DuplicateKeyError("E11000", 11000, {"keyPattern": {"mobile": 1}, "keyValue": {"mobile": "1"}})
+    assert duplicate_field(error) == "mobile"
+    assert duplicate_field(DuplicateKeyError("E11000", 11000, {})) is None
+
 def test_login_success(user_token):
     assert user_token and isinstance(user_token, str)
 
@@ -61,6 +86,29 @@ def test_profile_get_and_update(user_token):
     assert patch.json()["full_name"] == "Test User Updated"
     assert patch.json()["language_pref"] == "hi"
 
+def test_register_shed_when_password_pool_busy(monkeypatch):
+    monkeypatch.setattr(password_pool, "BCRYPT_MAX_PENDING", 0)
+    res = client.post("/register", json={
+        "tenant_id": "test_tenant", "username": "pooltest1", "mobile": "9999900001",
+        "business_name": "Pool Test Stores", "password": "Testpass123",
+    })
+    assert res.status_code == 429
+    assert res.headers["Retry-After"] == "1"
+
+def test_principal_served_from_cache(user_token, monkeypatch):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    assert client.get("/profile", headers=headers).status_code == 200
+    monkeypatch.setattr(auth_utils, "get_users_collection", lambda: pytest.fail("principal not cached"))
+    resp = client.get("/profile", headers=headers)
+    assert resp.status_code == 200
+    assert resp.json()["username"] == "testuser1"
+
+def test_profile_update_invalidates_principal(user_token):
+    headers = {"Authorization": f"Bearer {user_token}"}
+    client.get("/profile", headers=headers)
+    client.patch("/profile", json={"full_name": "Cache Check"}, headers=headers)
+    assert client.get("/profile", headers=headers).json()["full_name"] == "Cache Check"
+
 def test_change_password(user_token):
     headers = {"Authorization": f"Bearer {user_token}"}
     data = {"old_password": "Testpass123", "new_password": "Newpass123"}
@@ -70,3 +118,62 @@ def test_change_password(user_token):
     # Try login with new password
     res2 = client.post("/login", json={"username": "testuser1", "password": "Newpass123"})
     assert res2.status_code == 200
+
+REVOKE_TENANT = "test_revoke_tenant"
+
+def register_and_login(username, password="Revoke123", mobile="9000000001"):
+    client.post("/register", json={
+        "tenant_id": REVOKE_TENANT, "username": username, "mobile": mobile, "business_name": "Revoke Test",
+        "password": password, "email": f"{username}@example.com", "language_pref": "en",
+    })
+    resp = client.post("/login", json={"tenant_id": REVOKE_TENANT, "username": username, "password": password})
+    assert resp.status_code == 200
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+def test_change_password_revokes_same_second_token():
+    headers = register_and_login("revokeuser1")
+    assert client.get("/profile", headers=headers).status_code == 200
+    resp = client.post("/change-password", params={"old_password": "Revoke123", "new_password": "Revoke456"}, headers=headers)
+    assert resp.status_code == 200
+    # Issued in the same second as the change, and still rejected
+    resp = client.get("/profile", headers=headers)
+    assert resp.status_code == 401
+    assert resp.json()["detail"] == "Token revoked"
+    # A token from the new password (same second again) is accepted
+    new_headers = register_and_login("revokeuser1", "Revoke456")
+    assert client.get("/profile", headers=new_headers).status_code == 200
+
+def test_token_without_version_revoked_in_change_second():
+    register_and_login("revokeuser2", mobile="9000000002")
+    # A token minted before the version claim existed, in the second of the change
+    token = auth_utils.create_access_token({"sub": "revokeuser2", "tenant_id": REVOKE_TENANT})
+    iat = decode_token(token)["iat"]
+    get_users_collection().update_one(
+        {"username": "revokeuser2"},
+        {"$set": {"password_changed_at": datetime.utcfromtimestamp(iat) + timedelta(milliseconds=500)}},
+    )
+    auth_utils.invalidate_principals("revokeuser2")
+    resp = client.get("/profile", headers={"Authorization": f"Bearer {token}"})
+    assert resp.status_code == 401
+
+def test_metrics_require_auth():
+    for path in ("/auth/password_pool/metrics", "/auth/outbox/metrics"):
+        assert client.get(path).status_code == 401
+    headers = register_and_login("metricsuser", mobile="9000000003")
+    assert client.get("/auth/password_pool/metrics", headers=headers).status_code == 200
+
+def test_report_duplicate_users():
+    users = get_users_collection().database["users_duplicate_report_test"]
+    users.drop()
+    users.insert_many([
+        {"username": "dupa", "mobile": "9000000010", "email": "same@example.com"},
+        {"username": "dupb", "mobile": "9000000010", "email": "same@example.com"},
+        {"username": "dupc", "mobile": "9000000011", "email": None},
+        {"username": "dupd", "mobile": "9000000012", "email": None},
+    ])
+    report = report_duplicate_users.find_duplicates(users)
+    assert report == {
+        "mobile": [{"value": "9000000010", "usernames": ["dupa", "dupb"], "count": 2}],
+        "email": [{"value": "same@example.com", "usernames": ["dupa", "dupb"], "count": 2}],
+    }
+    users.drop()
@@ -0,0 +1,21 @@
+"""
+Auth shared by the retail platform services: JWT signing/verification against
+an in-memory key ring (optionally rotated from a key file) and FastAPI
+dependencies that decode the bearer token once per request.
+"""
+from retail_auth.keys import Key, KeyRing, get_key_ring
+from retail_auth.tokens import InvalidToken, TokenExpired, decode_token, encode_token
+from retail_auth.dependencies import get_current_tenant, get_current_user, get_token_payload
+
+__all__ = [
+    "Key",
+    "KeyRing",
+    "get_key_ring",
+    "InvalidToken",
+    "TokenExpired",
+    "decode_token",
+    "encode_token",
+    "get_current_tenant",
+    "get_current_user",
+    "get_token_payload",
+]
@@ -0,0 +1,54 @@
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from retail_auth.tokens import InvalidToken, decode_token
+
+security = HTTPBearer(auto_error=False)
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def get_token_payload(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> dict:
+    """
+    Verified claims of the request's bearer token. Decoded once per request and
+    kept on request.state, so every dependency (and any code holding the
+    request) shares the result.
+    """
+    payload = getattr(request.state, "token_payload", None)
+    if payload is not None:
+        return payload
+    if credentials is None or credentials.scheme.lower() != "bearer":
+        raise _unauthorized("Missing or invalid authentication credentials")
+    try:
+        payload = decode_token(credentials.credentials)
+    except InvalidToken as e:
+        raise _unauthorized(e.detail)
+    request.state.token_payload = payload
+    return payload
+
+def get_current_user(request: Request, payload: dict = Depends(get_token_payload)) -> dict:
+    """
+    Current user and tenant context from the token: {"username", "tenant_id", **claims}.
+    """
+    principal = getattr(request.state, "principal", None)
+    if principal is not None:
+        return principal
+    username = payload.get("sub") or payload.get("username")
+    tenant_id = payload.get("tenant_id")
+    if not username or not tenant_id:
+        raise _unauthorized("Malformed token: username or tenant_id missing")
+    principal = {"username": username, "tenant_id": tenant_id, **payload}
+    request.state.principal = principal
+    return principal
+
+def get_current_tenant(current_user: dict = Depends(get_current_user)) -> str:
+    """
+    Returns the tenant_id for the current authenticated user.
+    """
+    return current_user["tenant_id"]
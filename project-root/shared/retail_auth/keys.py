@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+import time
+from typing import NamedTuple, Optional
+import jwt
+
+SECRET_KEY = os.getenv("SECRET_KEY", "secret-key-for-dev")
+ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+# JWKS-style key file; when unset, SECRET_KEY/JWT_ALGORITHM is the only key
+KEYS_FILE = os.getenv("AUTH_KEYS_FILE")
+KEYS_REFRESH_SECONDS = float(os.getenv("AUTH_KEYS_REFRESH_SECONDS", "30"))
+
+class Key(NamedTuple):
+    kid: Optional[str]
+    key: object
+    algorithm: str
+
+class KeyRing:
+    """
+    Signing and verification keys by kid, held in memory.
+
+    With a key file, keys are read from {"active_kid": ..., "keys": [<JWK>, ...]}
+    and the file is re-read when its mtime changes (checked at most every
+    `refresh_seconds`), so keys rotate without a restart: add the new key, wait
+    one refresh interval, then switch active_kid. A file that fails to parse
+    leaves the previous keys in place.
+    """
+
+    def __init__(self, path: str = None, refresh_seconds: float = KEYS_REFRESH_SECONDS,
+                 secret: str = SECRET_KEY, algorithm: str = ALGORITHM):
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked = 0.0
+        if path:
+            self._keys, self._active = self._load_file()
+            self._mtime = os.stat(path).st_mtime_ns
+            self._checked = time.monotonic()
+        else:
+            self._active = Key(None, secret, algorithm)
+            self._keys = {}
+
+    def _load_file(self):
+        with open(self.path) as f:
+            data = json.load(f)
+        keys = {}
+        for jwk in data["keys"]:
+            parsed = jwt.PyJWK(jwk)
+            keys[jwk["kid"]] = Key(jwk["kid"], parsed.key, parsed.algorithm_name)
+        active = data.get("active_kid") or data["keys"][0]["kid"]
+        return keys, keys[active]
+
+    def _refresh(self):
+        if not self.path or time.monotonic() - self._checked < self.refresh_seconds:
+            return
+        with self._lock:
+            if time.monotonic() - self._checked < self.refresh_seconds:
+                return
+            self._checked = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                if mtime == self._mtime:
+                    return
+                self._keys, self._active = self._load_file()
+                self._mtime = mtime
+            except (OSError, ValueError, KeyError, jwt.PyJWKError) as e:
+                print(f"[Auth] keeping previous keys, reloading {self.path} failed: {e}")
+
+    def signing_key(self) -> Key:
+        self._refresh()
+        return self._active
+
+    def verification_key(self, kid: Optional[str]) -> Optional[Key]:
+        """
+        Key for a token's kid header; tokens without one are checked against
+        the active key. Returns None for an unknown kid.
+        """
+        self._refresh()
+        if kid is None:
+            return self._active
+        return self._keys.get(kid)
+
+_ring = None
+_ring_lock = threading.Lock()
+
+def get_key_ring() -> KeyRing:
+    """
+    Process-wide key ring built from the environment on first use.
+    """
+    global _ring
+    if _ring is None:
+        with _ring_lock:
+            if _ring is None:
+                _ring = KeyRing(KEYS_FILE)
+    return _ring
@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta, timezone
+import jwt
+from retail_auth.keys import KeyRing, get_key_ring
+
+class InvalidToken(Exception):
+    def __init__(self, detail: str = "Token invalid"):
+        super().__init__(detail)
+        self.detail = detail
+
+class TokenExpired(InvalidToken):
+    def __init__(self):
+        super().__init__("Token expired")
+
+def decode_token(token: str, ring: KeyRing = None) -> dict:
+    """
+    Verify a token against the key named by its kid header and return its claims.
+    Raises TokenExpired or InvalidToken.
+    """
+    ring = ring or get_key_ring()
+    try:
+        key = ring.verification_key(jwt.get_unverified_header(token).get("kid"))
+        if key is None:
+            raise InvalidToken("Unknown signing key")
+        return jwt.decode(token, key.key, algorithms=[key.algorithm])
+    except jwt.ExpiredSignatureError:
+        raise TokenExpired()
+    except jwt.InvalidTokenError:
+        raise InvalidToken()
+
+def encode_token(claims: dict, expires_minutes: int = 60, ring: KeyRing = None) -> str:
+    """
+    Sign claims (plus iat/exp) with the active key, naming it in the kid header.
+    """
+    key = (ring or get_key_ring()).signing_key()
+    now = datetime.now(timezone.utc)
+    payload = {**claims, "iat": now, "exp": now + timedelta(minutes=expires_minutes)}
+    headers = {"kid": key.kid} if key.kid else None
+    return jwt.encode(payload, key.key, algorithm=key.algorithm, headers=headers)
@@ -0,0 +1,15 @@
+"""
+Mongo plumbing shared by the retail platform services: pooled per-process
+clients configured from <PREFIX>_MONGO_* settings, and the declared-index
+manager each service applies at startup.
+"""
+from retail_db.indexes import ensure_indexes, ensure_indexes_async, index_drift, index_drift_async
+from retail_db.mongo import MongoClients
+
+__all__ = [
+    "ensure_indexes",
+    "ensure_indexes_async",
+    "index_drift",
+    "index_drift_async",
+    "MongoClients",
+]
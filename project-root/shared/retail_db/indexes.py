@@ -0,0 +1,78 @@
+# Declared-index manager. Each service declares INDEXES = {collection: [IndexModel, ...]}
+# in its own db/indexes.py and applies them once at startup, so request handlers
+# never issue DDL; drift (indexes added or dropped by hand) is reported, not fixed.
+# A unique index that existing documents violate is logged with the conflicting
+# key and reported as missing, instead of keeping the service from starting.
+from pymongo.errors import OperationFailure
+
+DUPLICATE_KEY = 11000
+
+def _log_conflict(coll_name: str, model, e: OperationFailure):
+    detail = (e.details or {}).get("errmsg", str(e))
+    print(f"[indexes] {coll_name}: cannot build {model.document['name']}, existing documents conflict: {detail}")
+
+def _log_drift(drift: dict):
+    for coll_name, diff in drift.items():
+        if diff["unexpected"]:
+            print(f"[indexes] {coll_name}: undeclared indexes present: {diff['unexpected']}")
+        if diff["missing"]:
+            print(f"[indexes] {coll_name}: declared indexes missing: {diff['missing']}")
+
+def _diff(declared_models, existing_names):
+    declared = {m.document["name"] for m in declared_models}
+    existing = {name for name in existing_names if name != "_id_"}
+    return sorted(declared - existing), sorted(existing - declared)
+
+def ensure_indexes(db, indexes: dict) -> dict:
+    """
+    Create all declared indexes on a pymongo database (no-op for ones that
+    already exist) and report drift. Returns the drift report; a unique index
+    blocked by duplicate documents shows up there as missing.
+    """
+    for coll_name, models in indexes.items():
+        for model in models:
+            try:
+                db[coll_name].create_indexes([model])
+            except OperationFailure as e:
+                if e.code != DUPLICATE_KEY:
+                    raise
+                _log_conflict(coll_name, model, e)
+    drift = index_drift(db, indexes)
+    _log_drift(drift)
+    return drift
+
+def index_drift(db, indexes: dict) -> dict:
+    """
+    Compare declared indexes against what the server has.
+    Returns {collection: {"missing": [...], "unexpected": [...]}} for collections that differ.
+    """
+    drift = {}
+    for coll_name, models in indexes.items():
+        missing, unexpected = _diff(models, db[coll_name].index_information())
+        if missing or unexpected:
+            drift[coll_name] = {"missing": missing, "unexpected": unexpected}
+    return drift
+
+async def ensure_indexes_async(db, indexes: dict) -> dict:
+    """
+    ensure_indexes for a Motor database.
+    """
+    for coll_name, models in indexes.items():
+        for model in models:
+            try:
+                await db[coll_name].create_indexes([model])
+            except OperationFailure as e:
+                if e.code != DUPLICATE_KEY:
+                    raise
+                _log_conflict(coll_name, model, e)
+    drift = await index_drift_async(db, indexes)
+    _log_drift(drift)
+    return drift
+
+async def index_drift_async(db, indexes: dict) -> dict:
+    drift = {}
+    for coll_name, models in indexes.items():
+        missing, unexpected = _diff(models, await db[coll_name].index_information())
+        if missing or unexpected:
+            drift[coll_name] = {"missing": missing, "unexpected": unexpected}
+    return drift
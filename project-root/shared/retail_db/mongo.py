@@ -0,0 +1,79 @@
+import asyncio
+import os
+import threading
+from pymongo import MongoClient
+
+class MongoClients:
+    """
+    Pooled Mongo clients for one service, configured from <prefix>_MONGO_URI,
+    <prefix>_DB_NAME and the <prefix>_MONGO_* pool settings. One sync client per
+    process (for indexes, relays and jobs) and one Motor client per event loop
+    (request handlers and background tasks).
+    """
+
+    def __init__(self, prefix: str, default_db: str):
+        self.uri = os.getenv(f"{prefix}_MONGO_URI", "mongodb://localhost:27017")
+        self.db_name = os.getenv(f"{prefix}_DB_NAME", default_db)
+        # Pool sizing: tune per deployment (uvicorn workers x max_pool_size <= mongod connection budget)
+        self.options = dict(
+            maxPoolSize=int(os.getenv(f"{prefix}_MONGO_MAX_POOL_SIZE", "50")),
+            minPoolSize=int(os.getenv(f"{prefix}_MONGO_MIN_POOL_SIZE", "0")),
+            maxIdleTimeMS=int(os.getenv(f"{prefix}_MONGO_MAX_IDLE_TIME_MS", "60000")),
+            serverSelectionTimeoutMS=int(os.getenv(f"{prefix}_MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        )
+        self._client = None
+        self._client_pid = None
+        self._lock = threading.Lock()
+        self._async_client = None
+        self._async_client_loop = None
+
+    def get_client(self) -> MongoClient:
+        """
+        Return the process-wide MongoClient, creating it lazily on first use.
+        A client inherited through fork() is not reused; the child builds its own pool.
+        """
+        pid = os.getpid()
+        if self._client is None or self._client_pid != pid:
+            with self._lock:
+                if self._client is None or self._client_pid != pid:
+                    self._client = MongoClient(self.uri, connect=False, **self.options)
+                    self._client_pid = pid
+        return self._client
+
+    def get_db(self):
+        return self.get_client()[self.db_name]
+
+    def close_client(self):
+        """
+        Close the pooled client (called from the app lifespan on shutdown).
+        """
+        with self._lock:
+            if self._client is not None and self._client_pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._client_pid = None
+
+    def get_async_client(self):
+        """
+        Return the Motor client for the running event loop. Motor clients are
+        bound to one loop, so a new loop (test clients, a forked worker) gets its own.
+        """
+        # Imported here so services that only use the sync client don't need Motor installed
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            if self._async_client is not None:
+                self._async_client.close()
+            self._async_client = AsyncIOMotorClient(self.uri, io_loop=loop, **self.options)
+            self._async_client_loop = loop
+        return self._async_client
+
+    def get_async_db(self):
+        return self.get_async_client()[self.db_name]
+
+    def close_async_client(self):
+        if self._async_client is not None:
+            self._async_client.close()
+        self._async_client = None
+        self._async_client_loop = None
@@ -0,0 +1,25 @@
+"""
+Event publishing shared by the retail platform services: the process-wide Kafka
+producer (with delivery counters) and the transactional outbox embedded in
+business documents, drained by a single leased relay per collection.
+"""
+from retail_outbox.producer import close_producer, get_delivery_stats, get_producer, publish
+from retail_outbox.outbox import (
+    OUTBOX_FIELD, OUTBOX_PENDING_FIELD, attach_outbox, get_relay_metrics, outbox_envelope,
+    relay_once, run_outbox_relay, strip_outbox,
+)
+
+__all__ = [
+    "close_producer",
+    "get_delivery_stats",
+    "get_producer",
+    "publish",
+    "OUTBOX_FIELD",
+    "OUTBOX_PENDING_FIELD",
+    "attach_outbox",
+    "get_relay_metrics",
+    "outbox_envelope",
+    "relay_once",
+    "run_outbox_relay",
+    "strip_outbox",
+]
@@ -0,0 +1,143 @@
+# Transactional outbox, embedded in the business document.
+# Events are stored on the document itself (one insert = document + its events, atomic
+# without needing a replica-set transaction) and published by run_outbox_relay.
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+from fastapi.concurrency import run_in_threadpool
+from pymongo.errors import DuplicateKeyError
+
+from retail_outbox import producer
+
+OUTBOX_FIELD = "outbox"              # list of pending event envelopes
+OUTBOX_PENDING_FIELD = "outbox_pending"  # indexed flag the relay scans on
+LEASE_COLL_NAME = "outbox_leases"    # one document per relayed collection: who may relay it
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "1"))
+OUTBOX_SEND_TIMEOUT = float(os.getenv("OUTBOX_SEND_TIMEOUT_SECONDS", "10"))
+OUTBOX_MAX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_MAX_BACKOFF_SECONDS", "60"))
+# A relay that stops renewing for this long is replaced by another worker's relay
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "30"))
+
+relay_metrics = {"leader": False, "published_total": 0, "last_batch_at": None, "last_error": None}
+
+def outbox_envelope(event_id: str, event_type: str, tenant_id: str, payload: dict, timestamp=None) -> dict:
+    """
+    Event in the shape analytics_service ingests (DomainEvent), with a stable
+    producer-assigned event_id so consumers can drop redeliveries.
+    """
+    return {
+        "event_id": event_id,
+        "event_type": event_type,
+        "tenant_id": tenant_id,
+        "payload": payload,
+        "timestamp": str(timestamp or datetime.now(timezone.utc)),
+    }
+
+def attach_outbox(doc: dict, *envelopes):
+    """
+    Add events to a document before it is inserted, so they commit with it.
+    """
+    doc[OUTBOX_FIELD] = list(envelopes)
+    doc[OUTBOX_PENDING_FIELD] = True
+    return doc
+
+def strip_outbox(doc: dict):
+    doc.pop(OUTBOX_FIELD, None)
+    doc.pop(OUTBOX_PENDING_FIELD, None)
+    return doc
+
+def acquire_lease(collection, owner: str, lease_seconds: float = OUTBOX_LEASE_SECONDS) -> bool:
+    """
+    Take or renew the relay lease for `collection`. Only the holder relays, so
+    every uvicorn worker can run the relay task while events still go out one
+    batch at a time, oldest first.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        collection.database[LEASE_COLL_NAME].find_one_and_update(
+            {"_id": collection.name, "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=lease_seconds)}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False  # Held by a live relay in another worker
+    return True
+
+def release_lease(collection, owner: str):
+    collection.database[LEASE_COLL_NAME].delete_one({"_id": collection.name, "owner": owner})
+
+def relay_once(collection, batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """
+    Publish one ordered batch (oldest documents first) and mark it sent.
+    Events are keyed by tenant_id so each tenant's events stay in order within a partition.
+    Returns the number of documents whose events were published; raises if any send failed,
+    leaving the whole batch pending for the next attempt (at-least-once).
+    """
+    docs = list(
+        collection.find({OUTBOX_PENDING_FIELD: True}, {OUTBOX_FIELD: 1})
+        .sort("_id", 1)
+        .limit(batch_size)
+    )
+    if not docs:
+        return 0
+    futures = []
+    for doc in docs:
+        for envelope in doc.get(OUTBOX_FIELD, []):
+            key = (envelope.get("tenant_id") or "").encode("utf-8")
+            futures.append(producer.publish(envelope["event_type"], envelope, key=key))
+    producer.flush(timeout=OUTBOX_SEND_TIMEOUT)
+    for future in futures:
+        future.get(timeout=OUTBOX_SEND_TIMEOUT)  # raises on delivery failure
+    collection.update_many(
+        {"_id": {"$in": [d["_id"] for d in docs]}},
+        {
+            "$unset": {OUTBOX_FIELD: "", OUTBOX_PENDING_FIELD: ""},
+            "$set": {"outbox_sent_at": datetime.now(timezone.utc)},
+        },
+    )
+    return len(docs)
+
+async def run_outbox_relay(get_collection, poll_seconds: float = OUTBOX_POLL_SECONDS):
+    """
+    Background task: while holding the lease, drain the outbox continuously,
+    backing off exponentially while Kafka is failing. Workers without the lease
+    poll for it, and take over once the holder stops renewing.
+    """
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+    backoff = poll_seconds
+    try:
+        while True:
+            collection = get_collection()
+            try:
+                relay_metrics["leader"] = await run_in_threadpool(acquire_lease, collection, owner)
+                if not relay_metrics["leader"]:
+                    await asyncio.sleep(poll_seconds)
+                    continue
+                published = await run_in_threadpool(relay_once, collection)
+                backoff = poll_seconds
+            except Exception as e:
+                relay_metrics["last_error"] = str(e)
+                print(f"[OutboxRelay] publish failed, retrying in {backoff:.0f}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, OUTBOX_MAX_BACKOFF_SECONDS)
+                continue
+            relay_metrics["published_total"] += published
+            if published:
+                relay_metrics["last_batch_at"] = datetime.now(timezone.utc)
+            if published < OUTBOX_BATCH_SIZE:
+                await asyncio.sleep(poll_seconds)
+    finally:
+        if relay_metrics["leader"]:
+            # Hand over straight away on shutdown instead of waiting out the lease
+            try:
+                release_lease(get_collection(), owner)
+            except Exception as e:
+                print(f"[OutboxRelay] could not release lease: {e}")
+            relay_metrics["leader"] = False
+
+def get_relay_metrics() -> dict:
+    return {**relay_metrics, "delivery": producer.get_delivery_stats()}
@@ -0,0 +1,86 @@
+from kafka import KafkaProducer
+import json
+import os
+import threading
+
+KAFKA_BOOTSTRAP_SERVERS = os.getenv("KAFKA_BOOTSTRAP_SERVERS", "kafka:9092")
+KAFKA_LINGER_MS = int(os.getenv("KAFKA_LINGER_MS", "5"))
+KAFKA_BATCH_SIZE = int(os.getenv("KAFKA_BATCH_SIZE", "32768"))
+KAFKA_COMPRESSION = os.getenv("KAFKA_COMPRESSION") or None  # gzip / snappy / lz4 / zstd
+KAFKA_ACKS = os.getenv("KAFKA_ACKS", "1")
+# Upper bound on how long send() may block when the buffer is full / broker is down
+KAFKA_MAX_BLOCK_MS = int(os.getenv("KAFKA_MAX_BLOCK_MS", "100"))
+
+_producer = None
+_producer_lock = threading.Lock()
+
+delivery_stats = {"sent": 0, "delivered": 0, "failed": 0}
+_stats_lock = threading.Lock()
+
+def _count(key: str):
+    with _stats_lock:
+        delivery_stats[key] += 1
+
+def get_producer():
+    """
+    Lazily build the process-wide producer. Sends are batched by the client's
+    background I/O thread (linger_ms / batch_size), so publish never waits on the broker.
+    """
+    global _producer
+    if _producer is None:
+        with _producer_lock:
+            if _producer is None:
+                _producer = KafkaProducer(
+                    bootstrap_servers=[KAFKA_BOOTSTRAP_SERVERS],
+                    value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+                    linger_ms=KAFKA_LINGER_MS,
+                    batch_size=KAFKA_BATCH_SIZE,
+                    compression_type=KAFKA_COMPRESSION,
+                    acks=int(KAFKA_ACKS) if KAFKA_ACKS.lstrip("-").isdigit() else KAFKA_ACKS,
+                    max_block_ms=KAFKA_MAX_BLOCK_MS,
+                )
+    return _producer
+
+def _on_delivered(_metadata):
+    _count("delivered")
+
+def _on_failed(exc):
+    _count("failed")
+    print(f"[KafkaProducer] Delivery failed: {exc}")
+
+def publish(topic: str, event: dict, key: bytes = None):
+    """
+    Send one event and count it in delivery_stats. Returns the send future
+    (its get() raises on delivery failure); raises if the event could not
+    even be buffered.
+    """
+    try:
+        future = get_producer().send(topic, event, key=key)
+    except Exception:
+        _count("failed")
+        raise
+    _count("sent")
+    future.add_callback(_on_delivered)
+    future.add_errback(_on_failed)
+    return future
+
+def flush(timeout: float = None):
+    get_producer().flush(timeout=timeout)
+
+def get_delivery_stats() -> dict:
+    with _stats_lock:
+        return dict(delivery_stats)
+
+def close_producer(timeout: float = 10):
+    """
+    Flush buffered events and close the producer (called from the app lifespan on shutdown).
+    """
+    global _producer
+    with _producer_lock:
+        if _producer is not None:
+            try:
+                _producer.flush(timeout=timeout)
+                _producer.close(timeout=timeout)
+            except Exception as e:
+                print(f"[KafkaProducer] Failed to close producer: {e}")
+            _producer = None
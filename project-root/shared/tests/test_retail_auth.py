@@ -0,0 +1,91 @@
+import base64
+import json
+import os
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from retail_auth import (
+    KeyRing, InvalidToken, TokenExpired, decode_token, encode_token,
+    get_current_tenant, get_current_user, get_token_payload,
+)
+from retail_auth import dependencies
+
+def _jwk(kid, secret):
+    k = base64.urlsafe_b64encode(secret.encode()).rstrip(b"=").decode()
+    return {"kty": "oct", "kid": kid, "k": k, "alg": "HS256"}
+
+def _write_keys(path, active, *keys):
+    path.write_text(json.dumps({"active_kid": active, "keys": list(keys)}))
+    # Force a visible mtime change even on coarse-grained filesystems
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+@pytest.fixture
+def key_file(tmp_path):
+    path = tmp_path / "keys.json"
+    _write_keys(path, "k1", _jwk("k1", "first-secret-0123456789abcdef0123"))
+    return path
+
+def test_static_key_round_trip():
+    ring = KeyRing(secret="static-secret-0123456789abcdef01")
+    token = encode_token({"sub": "alice", "tenant_id": "t1"}, ring=ring)
+    assert decode_token(token, ring=ring)["sub"] == "alice"
+
+def test_expired_token():
+    ring = KeyRing(secret="static-secret-0123456789abcdef01")
+    token = encode_token({"sub": "alice"}, expires_minutes=-1, ring=ring)
+    with pytest.raises(TokenExpired):
+        decode_token(token, ring=ring)
+
+def test_wrong_key_rejected():
+    token = encode_token({"sub": "alice"}, ring=KeyRing(secret="one-secret-0123456789abcdef012345"))
+    with pytest.raises(InvalidToken):
+        decode_token(token, ring=KeyRing(secret="two-secret-0123456789abcdef012345"))
+
+def test_key_rotation_from_file(key_file):
+    ring = KeyRing(str(key_file), refresh_seconds=0)
+    old_token = encode_token({"sub": "alice"}, ring=ring)
+    _write_keys(key_file, "k2",
+                _jwk("k1", "first-secret-0123456789abcdef0123"),
+                _jwk("k2", "second-secret-0123456789abcdef012"))
+    new_token = encode_token({"sub": "bob"}, ring=ring)
+    assert ring.signing_key().kid == "k2"
+    # Tokens signed with the retiring key keep verifying while it is listed
+    assert decode_token(old_token, ring=ring)["sub"] == "alice"
+    assert decode_token(new_token, ring=ring)["sub"] == "bob"
+    _write_keys(key_file, "k2", _jwk("k2", "second-secret-0123456789abcdef012"))
+    with pytest.raises(InvalidToken):
+        decode_token(old_token, ring=ring)
+
+def test_bad_key_file_keeps_previous_keys(key_file):
+    ring = KeyRing(str(key_file), refresh_seconds=0)
+    token = encode_token({"sub": "alice"}, ring=ring)
+    key_file.write_text("{not json")
+    os.utime(key_file, ns=(0, os.stat(key_file).st_mtime_ns + 2_000_000_000))
+    assert decode_token(token, ring=ring)["sub"] == "alice"
+
+def test_token_decoded_once_per_request(monkeypatch):
+    ring = KeyRing(secret="static-secret-0123456789abcdef01")
+    calls = []
+
+    def counting_decode(token):
+        calls.append(token)
+        return decode_token(token, ring=ring)
+
+    monkeypatch.setattr(dependencies, "decode_token", counting_decode)
+    app = FastAPI()
+
+    @app.get("/whoami")
+    def whoami(user=Depends(get_current_user), tenant=Depends(get_current_tenant),
+               payload=Depends(get_token_payload)):
+        return {"username": user["username"], "tenant_id": tenant}
+
+    client = TestClient(app)
+    token = encode_token({"sub": "alice", "tenant_id": "t1"}, ring=ring)
+    resp = client.get("/whoami", headers={"Authorization": f"Bearer {token}"})
+    assert resp.status_code == 200
+    assert resp.json() == {"username": "alice", "tenant_id": "t1"}
+    assert len(calls) == 1
+    assert client.get("/whoami").status_code == 401
+    malformed = encode_token({"sub": "alice"}, ring=ring)
+    assert client.get("/whoami", headers={"Authorization": f"Bearer {malformed}"}).status_code == 401
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import pytest
+from pymongo import ASCENDING, IndexModel, MongoClient
+from retail_db import MongoClients, ensure_indexes, index_drift
+
+INDEXES = {
+    "things": [
+        IndexModel([("tenant_id", ASCENDING), ("thing_id", ASCENDING)], unique=True),
+        IndexModel([("tenant_id", ASCENDING), ("created_at", ASCENDING)]),
+    ],
+}
+
+@pytest.fixture
+def test_db():
+    mongo = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    mongo.drop_database("retail_db_test")
+    yield mongo["retail_db_test"]
+    mongo.drop_database("retail_db_test")
+    mongo.close()
+
+def test_ensure_indexes_creates_declared_indexes(test_db):
+    assert ensure_indexes(test_db, INDEXES) == {}
+    assert set(test_db.things.index_information()) == {"_id_", "tenant_id_1_thing_id_1", "tenant_id_1_created_at_1"}
+    # Idempotent
+    assert ensure_indexes(test_db, INDEXES) == {}
+
+def test_index_drift_reports_missing_and_unexpected(test_db):
+    ensure_indexes(test_db, INDEXES)
+    test_db.things.drop_index("tenant_id_1_created_at_1")
+    test_db.things.create_index([("hand_made", ASCENDING)])
+    assert index_drift(test_db, INDEXES) == {
+        "things": {"missing": ["tenant_id_1_created_at_1"], "unexpected": ["hand_made_1"]},
+    }
+
+def test_mongo_clients_read_prefixed_settings(monkeypatch):
+    monkeypatch.setenv("WIDGET_MONGO_URI", "mongodb://widgets:27017")
+    monkeypatch.setenv("WIDGET_DB_NAME", "widgets_db")
+    monkeypatch.setenv("WIDGET_MONGO_MAX_POOL_SIZE", "7")
+    clients = MongoClients("WIDGET", "default_db")
+    assert clients.uri == "mongodb://widgets:27017"
+    assert clients.db_name == "widgets_db"
+    assert clients.options["maxPoolSize"] == 7
+    assert MongoClients("OTHER", "other_db").db_name == "other_db"
+
+def test_mongo_clients_reuse_per_process_and_per_loop(monkeypatch):
+    clients = MongoClients("WIDGET", "widgets_db")
+    client = clients.get_client()
+    assert clients.get_client() is client
+    assert clients.get_db().name == "widgets_db"
+    # A forked child must not reuse the parent's pool
+    monkeypatch.setattr(os, "getpid", lambda: -1)
+    assert clients.get_client() is not client
+    monkeypatch.undo()
+    clients.close_client()
+
+    async def loop_client():
+        return clients.get_async_client(), clients.get_async_client()
+
+    first, same = asyncio.run(loop_client())
+    assert first is same
+    second, _ = asyncio.run(loop_client())
+    assert second is not first
+    clients.close_async_client()
+
+def test_unique_index_blocked_by_duplicates_is_reported_not_raised(test_db):
+    test_db.things.insert_many([{"tenant_id": "t1", "thing_id": "a"}, {"tenant_id": "t1", "thing_id": "a"}])
+    drift = ensure_indexes(test_db, INDEXES)
+    # The other index is still built; the blocked one shows up as missing
+    assert drift == {"things": {"missing": ["tenant_id_1_thing_id_1"], "unexpected": []}}
+    assert "tenant_id_1_created_at_1" in test_db.things.index_information()
@@ -0,0 +1,98 @@
+import os
+from datetime import datetime, timedelta, timezone
+import pytest
+from pymongo import MongoClient
+from retail_outbox import attach_outbox, get_delivery_stats, outbox_envelope, relay_once
+from retail_outbox import outbox, producer
+
+class FakeFuture:
+    def __init__(self, error=None):
+        self.error = error
+
+    def add_callback(self, fn):
+        if self.error is None:
+            fn(None)
+
+    def add_errback(self, fn):
+        if self.error is not None:
+            fn(self.error)
+
+    def get(self, timeout=None):
+        if self.error is not None:
+            raise self.error
+
+class FakeProducer:
+    def __init__(self, error=None, buffer_full=False):
+        self.sent = []
+        self.error = error
+        self.buffer_full = buffer_full
+
+    def send(self, topic, value, key=None):
+        if self.buffer_full:
+            raise RuntimeError("buffer full")
+        self.sent.append((topic, value, key))
+        return FakeFuture(self.error)
+
+    def flush(self, timeout=None):
+        pass
+
+@pytest.fixture
+def outbox_coll():
+    mongo = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    db = mongo["retail_outbox_test"]
+    db.docs.delete_many({})
+    db[outbox.LEASE_COLL_NAME].delete_many({})
+    for i, tenant in enumerate(["t1", "t2", "t1"]):
+        db.docs.insert_one(attach_outbox({"n": i}, outbox_envelope(f"e{i}", "sale.created", tenant, {"n": i})))
+    yield db.docs
+    mongo.drop_database("retail_outbox_test")
+    mongo.close()
+
+def use_producer(monkeypatch, fake):
+    monkeypatch.setattr(producer, "get_producer", lambda: fake)
+    return fake
+
+def test_relay_publishes_in_order_then_marks_sent(outbox_coll, monkeypatch):
+    fake = use_producer(monkeypatch, FakeProducer())
+    before = get_delivery_stats()
+    assert relay_once(outbox_coll) == 3
+    assert [(topic, value["event_id"], key) for topic, value, key in fake.sent] == [
+        ("sale.created", "e0", b"t1"), ("sale.created", "e1", b"t2"), ("sale.created", "e2", b"t1"),
+    ]
+    assert outbox_coll.count_documents({outbox.OUTBOX_PENDING_FIELD: True}) == 0
+    assert outbox_coll.count_documents({outbox.OUTBOX_FIELD: {"$exists": True}}) == 0
+    assert outbox_coll.count_documents({"outbox_sent_at": {"$exists": True}}) == 3
+    after = get_delivery_stats()
+    assert after["sent"] - before["sent"] == 3
+    assert after["delivered"] - before["delivered"] == 3
+    # Nothing left to send
+    assert relay_once(outbox_coll) == 0
+    assert len(fake.sent) == 3
+
+def test_failed_delivery_leaves_batch_pending(outbox_coll, monkeypatch):
+    use_producer(monkeypatch, FakeProducer(error=RuntimeError("broker down")))
+    before = get_delivery_stats()
+    with pytest.raises(RuntimeError):
+        relay_once(outbox_coll)
+    assert outbox_coll.count_documents({outbox.OUTBOX_PENDING_FIELD: True}) == 3
+    assert outbox_coll.count_documents({"outbox_sent_at": {"$exists": True}}) == 0
+    assert get_delivery_stats()["failed"] - before["failed"] == 3
+
+def test_full_buffer_leaves_batch_pending(outbox_coll, monkeypatch):
+    use_producer(monkeypatch, FakeProducer(buffer_full=True))
+    with pytest.raises(RuntimeError):
+        relay_once(outbox_coll)
+    assert outbox_coll.count_documents({outbox.OUTBOX_PENDING_FIELD: True}) == 3
+
+def test_single_relay_holds_the_lease(outbox_coll):
+    assert outbox.acquire_lease(outbox_coll, "worker-a")
+    assert not outbox.acquire_lease(outbox_coll, "worker-b")
+    assert outbox.acquire_lease(outbox_coll, "worker-a")  # renewal
+    # worker-a stops renewing: its lease lapses and worker-b takes over
+    outbox_coll.database[outbox.LEASE_COLL_NAME].update_one(
+        {"_id": outbox_coll.name}, {"$set": {"expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}}
+    )
+    assert outbox.acquire_lease(outbox_coll, "worker-b")
+    assert not outbox.acquire_lease(outbox_coll, "worker-a")
+    outbox.release_lease(outbox_coll, "worker-b")
+    assert outbox.acquire_lease(outbox_coll, "worker-a")
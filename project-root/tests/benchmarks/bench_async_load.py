@@ -0,0 +1,60 @@
+"""
+Read-path load test at high concurrency: async (Motor) handlers vs the previous
+sync-handlers-on-the-threadpool build. Each target is hit with CONCURRENCY
+(500 by default) simultaneous keep-alive connections for DURATION seconds and
+reports requests/sec and p50/p99 latency.
+
+Run the threadpool build (the commit before the Motor migration) and the current
+build side by side against the same Mongo, then:
+    LOAD_TARGETS="threadpool=http://localhost:9003,async=http://localhost:8003" \
+    LOAD_PATH="/sales?tenant_id=bench_tenant&limit=50" python tests/benchmarks/bench_async_load.py
+
+Other useful paths: /sales/summary/daily?tenant_id=bench_tenant&date=2025-07-01
+(sales_service), /items?tenant_id=bench_tenant (inventory_service, port 8002).
+"""
+import asyncio
+import os
+import statistics
+import time
+import httpx
+
+TARGETS = [t.split("=", 1) for t in os.getenv(
+    "LOAD_TARGETS", "threadpool=http://localhost:9003,async=http://localhost:8003").split(",")]
+PATH = os.getenv("LOAD_PATH", "/sales?tenant_id=bench_tenant&limit=50")
+CONCURRENCY = int(os.getenv("LOAD_CONCURRENCY", "500"))
+DURATION = float(os.getenv("LOAD_DURATION_SECONDS", "30"))
+WARMUP = float(os.getenv("LOAD_WARMUP_SECONDS", "5"))
+
+async def worker(client, deadline, samples, errors):
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        try:
+            resp = await client.get(PATH)
+            if resp.status_code >= 400:
+                errors.append(resp.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        samples.append((time.perf_counter() - t0) * 1000)
+
+async def run(base_url, duration):
+    limits = httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY)
+    samples, errors = [], []
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client, deadline, samples, errors) for _ in range(CONCURRENCY)))
+        elapsed = time.perf_counter() - start
+    return samples, errors, elapsed
+
+async def main():
+    print(f"GET {PATH} with {CONCURRENCY} concurrent connections for {DURATION:.0f}s")
+    for label, base_url in TARGETS:
+        await run(base_url, WARMUP)
+        samples, errors, elapsed = await run(base_url, DURATION)
+        samples.sort()
+        print(f"{label:<12} rps={len(samples) / elapsed:.0f} mean={statistics.mean(samples):.1f}ms "
+              f"p50={samples[len(samples) // 2]:.1f}ms p99={samples[int(len(samples) * 0.99) - 1]:.1f}ms "
+              f"errors={len(errors)}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
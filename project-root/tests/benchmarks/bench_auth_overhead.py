@@ -0,0 +1,76 @@
+"""
+Per-request auth overhead with retail_auth: token decode on its own (static
+key vs key file), and a FastAPI route with no auth vs the previous per-service
+auth_utils dependency vs the shared dependencies.
+
+    pip install -e shared && python tests/benchmarks/bench_auth_overhead.py
+"""
+import base64
+import json
+import os
+import tempfile
+
+import jwt
+from fastapi import Depends, FastAPI
+from fastapi.security import HTTPBearer
+from fastapi.testclient import TestClient
+from bench_utils import measure, report
+from retail_auth import KeyRing, decode_token, encode_token, get_current_tenant, get_current_user, keys
+
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", "5000"))
+SECRET = "bench-secret-0123456789abcdef0123"
+CLAIMS = {"sub": "bench_user", "tenant_id": "bench_tenant", "roles": ["owner"]}
+
+legacy_security = HTTPBearer()
+
+def legacy_current_user(credentials=Depends(legacy_security)):
+    # What each service's core/auth_utils.py used to do
+    payload = jwt.decode(credentials.credentials, SECRET, algorithms=["HS256"])
+    return {"username": payload["sub"], "tenant_id": payload["tenant_id"], **payload}
+
+def legacy_current_tenant(current_user=Depends(legacy_current_user)):
+    return current_user["tenant_id"]
+
+def build_app():
+    app = FastAPI()
+
+    @app.get("/open")
+    def open_route():
+        return {"ok": True}
+
+    @app.get("/legacy")
+    def legacy_route(user=Depends(legacy_current_user), tenant=Depends(legacy_current_tenant)):
+        return {"ok": True}
+
+    @app.get("/shared")
+    def shared_route(user=Depends(get_current_user), tenant=Depends(get_current_tenant)):
+        return {"ok": True}
+
+    return app
+
+def main():
+    static_ring = KeyRing(secret=SECRET)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "keys.json")
+        secrets = {f"k{i}": f"{SECRET}-{i}" for i in range(5)}
+        with open(path, "w") as f:
+            json.dump({"active_kid": "k4", "keys": [
+                {"kty": "oct", "kid": kid, "k": base64.urlsafe_b64encode(s.encode()).rstrip(b"=").decode()}
+                for kid, s in secrets.items()
+            ]}, f)
+        file_ring = KeyRing(path)
+        static_token = encode_token(CLAIMS, ring=static_ring)
+        file_token = encode_token(CLAIMS, ring=file_ring)
+        report("decode_token (SECRET_KEY)", measure(lambda: decode_token(static_token, ring=static_ring), ITERATIONS, warmup=100))
+        report("decode_token (key file, 5 kids)", measure(lambda: decode_token(file_token, ring=file_ring), ITERATIONS, warmup=100))
+
+    # Route comparison uses the process-wide ring, pinned to the bench secret
+    keys._ring = static_ring
+    client = TestClient(build_app())
+    headers = {"Authorization": f"Bearer {static_token}"}
+    report("GET /open (no auth)", measure(lambda: client.get("/open"), ITERATIONS, warmup=100))
+    report("GET /legacy (per-service auth_utils)", measure(lambda: client.get("/legacy", headers=headers), ITERATIONS, warmup=100))
+    report("GET /shared (retail_auth)", measure(lambda: client.get("/shared", headers=headers), ITERATIONS, warmup=100))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Authenticated reads in user_service: GET /profile with the principal cache vs
+without it (token decode + users find_one on every request).
+
+    python tests/benchmarks/bench_auth_principal.py    # needs Mongo on localhost:27017
+"""
+import os
+from datetime import datetime
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from bench_utils import use_service, measure, report
+
+use_service("user_service")
+from api import auth  # noqa: E402
+from core import auth_utils  # noqa: E402
+from db.mongo import get_users_collection  # noqa: E402
+
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", "2000"))
+USERNAME = "benchprincipal"
+
+def main():
+    users = get_users_collection()
+    users.delete_many({"username": USERNAME})
+    users.insert_one({
+        "tenant_id": "bench_tenant", "username": USERNAME, "mobile": "9000000000",
+        "business_name": "Bench Stores", "password_hash": "x", "language_pref": "en",
+        "roles": ["user"], "created_at": datetime.utcnow(),
+    })
+    # Just the auth routes: no lifespan (outbox relay) or static mount needed
+    app = FastAPI()
+    app.include_router(auth.router)
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {auth_utils.create_access_token({'sub': USERNAME})}"}
+
+    def uncached():
+        auth_utils._principal_cache.clear()
+        client.get("/profile", headers=headers)
+
+    report("GET /profile, no principal cache", measure(uncached, ITERATIONS, warmup=20))
+    report("GET /profile, principal cache", measure(lambda: client.get("/profile", headers=headers), ITERATIONS, warmup=20))
+    report("get_current_user, uncached", measure(lambda: auth_utils._load_principal(headers["Authorization"][7:]), ITERATIONS, warmup=20))
+    report("get_current_user, cached", measure(lambda: auth_utils.get_current_user(headers["Authorization"][7:]), ITERATIONS, warmup=20))
+    users.delete_many({"username": USERNAME})
+
+if __name__ == "__main__":
+    main()
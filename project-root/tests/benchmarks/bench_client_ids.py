@@ -0,0 +1,48 @@
+"""
+Write throughput: insert + update_one to copy _id into sale_id/payment_id
+(old add_sale / create_payment) vs a single insert with a client-generated id.
+
+    MONGO_URI=mongodb://localhost:27017 python tests/benchmarks/bench_client_ids.py
+"""
+import os
+from datetime import datetime
+from bson import ObjectId
+from pymongo import MongoClient
+from bench_utils import measure, report
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", "2000"))
+
+client = MongoClient(MONGO_URI)
+targets = {
+    "sales": (client["sales_bench_db"]["sales"], "sale_id"),
+    "payments": (client["payment_bench_db"]["payments"], "payment_id"),
+}
+
+def sample_doc():
+    return {"tenant_id": "bench_tenant", "user": "bench_user", "amount": 120.0,
+            "method": "CASH", "created_at": datetime.utcnow().isoformat()}
+
+def insert_then_update(coll, id_field):
+    def run():
+        doc = sample_doc()
+        result = coll.insert_one(doc)
+        coll.update_one({"_id": result.inserted_id}, {"$set": {id_field: str(result.inserted_id)}})
+    return run
+
+def single_insert(coll, id_field):
+    def run():
+        doc = sample_doc()
+        oid = ObjectId()
+        doc["_id"] = oid
+        doc[id_field] = str(oid)
+        coll.insert_one(doc)
+    return run
+
+if __name__ == "__main__":
+    for name, (coll, id_field) in targets.items():
+        coll.delete_many({"tenant_id": "bench_tenant"})
+        report(f"{name}: insert + update_one", measure(insert_then_update(coll, id_field), ITERATIONS))
+        report(f"{name}: single insert, client id", measure(single_insert(coll, id_field), ITERATIONS))
+        coll.delete_many({"tenant_id": "bench_tenant"})
+    client.close()
@@ -0,0 +1,110 @@
+"""
+Heavy analytics queries: Mongo aggregation over domain_events vs DuckDB over
+the columnar (Parquet) snapshot. Seeds BENCH_EVENTS sale events (10M by
+default), snapshots them, then times top-items-by-revenue and monthly item
+velocity both ways.
+
+    MONGO_URI=mongodb://localhost:27017 python tests/benchmarks/bench_columnar_query.py
+"""
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("ANALYTICS_COLUMNAR_DIR", tempfile.mkdtemp(prefix="columnar_bench_"))
+os.environ.setdefault("ANALYTICS_SNAPSHOT_LAG_SECONDS", "0")
+
+from bson import ObjectId  # noqa: E402
+from pymongo import MongoClient  # noqa: E402
+from bench_utils import use_service, measure, report  # noqa: E402
+
+use_service("analytics_service")
+import columnar  # noqa: E402
+
+TOTAL_EVENTS = int(os.getenv("BENCH_EVENTS", "10000000"))
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", "5"))
+TENANT_ID = "bench_tenant"
+START = datetime(2025, 1, 1)
+END = START + timedelta(days=180)
+
+mongo = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+bench_db = mongo["analytics_bench_db"]
+coll = bench_db.domain_events
+
+def seed():
+    coll.drop()
+    coll.create_index([("tenant_id", 1), ("domain", 1), ("timestamp", 1), ("_id", 1)])
+    docs = []
+    for i in range(TOTAL_EVENTS):
+        ts = START + timedelta(seconds=random.randint(0, 180 * 86400))
+        qty = random.randint(1, 10)
+        docs.append({
+            "_id": ObjectId(),
+            "event_id": f"bench-{i}",
+            "event_type": "sale.created",
+            "domain": "sale",
+            "action": "created",
+            "tenant_id": TENANT_ID,
+            "timestamp": ts,
+            "payload": {
+                "sale_id": f"s{i}",
+                "item_id": f"sku-{random.randint(0, 4999)}",
+                "item_name": "Bench item",
+                "quantity": qty,
+                "total_price": qty * random.uniform(10, 500),
+                "payment_method": random.choice(["CASH", "UPI", "CREDIT"]),
+                "customer_id": f"c{random.randint(0, 50_000)}",
+                "establishment_id": f"est-{random.randint(0, 20)}",
+            },
+        })
+        if len(docs) == 20_000:
+            coll.insert_many(docs, ordered=False)
+            docs = []
+    if docs:
+        coll.insert_many(docs, ordered=False)
+
+def mongo_top_items():
+    return list(coll.aggregate([
+        {"$match": {"tenant_id": TENANT_ID, "domain": "sale", "timestamp": {"$gte": START, "$lte": END}}},
+        {"$group": {"_id": "$payload.item_id", "revenue": {"$sum": "$payload.total_price"}, "count": {"$sum": 1}}},
+        {"$sort": {"revenue": -1}},
+        {"$limit": 20},
+    ], allowDiskUse=True))
+
+def mongo_item_velocity():
+    return list(coll.aggregate([
+        {"$match": {"tenant_id": TENANT_ID, "domain": "sale", "timestamp": {"$gte": START, "$lte": END}}},
+        {"$group": {
+            "_id": {"item_id": "$payload.item_id", "month": {"$dateTrunc": {"date": "$timestamp", "unit": "month"}}},
+            "quantity": {"$sum": "$payload.quantity"},
+        }},
+        {"$sort": {"_id.item_id": 1, "_id.month": 1}},
+    ], allowDiskUse=True))
+
+def main():
+    print(f"Seeding {TOTAL_EVENTS:,} events...")
+    seed()
+    t0 = time.perf_counter()
+    rows = columnar.snapshot_once(bench_db, now=datetime.utcnow() + timedelta(minutes=1))
+    print(f"snapshot: {rows:,} rows in {time.perf_counter() - t0:.1f}s")
+    cases = [
+        ("top items by revenue (mongo)", mongo_top_items),
+        ("top items by revenue (columnar)", lambda: columnar.top(TENANT_ID, "item_id", "revenue", START, END)),
+        ("monthly item velocity (mongo)", mongo_item_velocity),
+        ("monthly item velocity (columnar)", lambda: columnar.item_velocity(TENANT_ID, 6, 20, now=END)),
+    ]
+    results = {}
+    for label, fn in cases:
+        results[label] = measure(fn, iterations=ITERATIONS, warmup=1)
+        report(label, results[label])
+    for query in ("top items by revenue", "monthly item velocity"):
+        speedup = results[f"{query} (mongo)"]["mean_ms"] / results[f"{query} (columnar)"]["mean_ms"]
+        print(f"{query}: columnar is {speedup:.1f}x faster")
+    coll.drop()
+    mongo.close()
+    shutil.rmtree(columnar.COLUMNAR_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
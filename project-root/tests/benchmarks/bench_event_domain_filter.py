@@ -0,0 +1,70 @@
+"""
+Report listing filter: regex on event_type vs equality on the normalized domain.
+Seeds 1M events across tenants and event types, then times the same report
+query both ways and prints the winning plan of each.
+
+    MONGO_URI=mongodb://localhost:27017 python tests/benchmarks/bench_event_domain_filter.py
+"""
+import os
+import random
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+from bench_utils import use_service, measure, report
+
+use_service("analytics_service")
+from indexes import INDEXES  # noqa: E402
+from models import split_event_type  # noqa: E402
+
+TOTAL_EVENTS = int(os.getenv("BENCH_EVENTS", "1000000"))
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", "50"))
+TENANTS = [f"bench_tenant_{i}" for i in range(20)]
+EVENT_TYPES = ["sale.created", "payment.received", "inventory.updated", "gst.invoice.generated", "notification.sent"]
+START = datetime(2025, 1, 1)
+
+mongo = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+coll = mongo["analytics_bench_db"].domain_events
+
+def seed():
+    coll.drop()
+    coll.create_indexes(INDEXES["domain_events"])
+    docs = []
+    for i in range(TOTAL_EVENTS):
+        event_type = random.choice(EVENT_TYPES)
+        domain, action = split_event_type(event_type)
+        docs.append({
+            "event_id": f"bench-{i}",
+            "event_type": event_type,
+            "domain": domain,
+            "action": action,
+            "tenant_id": random.choice(TENANTS),
+            "payload": {"total_price": random.randint(10, 500)},
+            "timestamp": START + timedelta(seconds=random.randint(0, 90 * 86400)),
+        })
+        if len(docs) == 10_000:
+            coll.insert_many(docs, ordered=False)
+            docs = []
+    if docs:
+        coll.insert_many(docs, ordered=False)
+
+PERIOD = {"$gte": START + timedelta(days=30), "$lte": START + timedelta(days=37)}
+REGEX_QUERY = {"tenant_id": TENANTS[0], "event_type": {"$regex": "^sale"}, "timestamp": PERIOD}
+DOMAIN_QUERY = {"tenant_id": TENANTS[0], "domain": "sale", "timestamp": PERIOD}
+SORT = [("timestamp", 1), ("_id", 1)]
+
+def plan_summary(query):
+    stats = coll.find(query).sort(SORT).explain()["executionStats"]
+    return f"docsExamined={stats['totalDocsExamined']} keysExamined={stats['totalKeysExamined']}"
+
+def main():
+    print(f"Seeding {TOTAL_EVENTS:,} events...")
+    seed()
+    for label, query in [("regex ^sale on event_type", REGEX_QUERY), ("domain == 'sale'", DOMAIN_QUERY)]:
+        stats = measure(lambda: list(coll.find(query).sort(SORT)), iterations=ITERATIONS, warmup=3)
+        report(label, stats)
+        print(f"    {plan_summary(query)}")
+    coll.drop()
+    mongo.close()
+
+if __name__ == "__main__":
+    main()
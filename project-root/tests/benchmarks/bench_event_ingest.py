@@ -0,0 +1,101 @@
+"""
+Analytics ingestion throughput (events/sec): one insert_one per message vs
+getmany batches + insert_many. A fake consumer serves pre-built messages, so
+only Mongo is needed.
+
+    MONGO_URI=mongodb://localhost:27017 python tests/benchmarks/bench_event_ingest.py
+"""
+import asyncio
+import json
+import os
+import time
+from collections import namedtuple
+from bench_utils import use_service
+
+use_service("analytics_service")
+import event_ingestor  # noqa: E402
+from analytics_db import db  # noqa: E402
+from models import DomainEvent  # noqa: E402
+
+TOTAL_EVENTS = int(os.getenv("BENCH_EVENTS", "50000"))
+TENANT_ID = "bench_tenant"
+Message = namedtuple("Message", "topic partition offset value")
+TopicPartition = namedtuple("TopicPartition", "topic partition")
+
+def make_messages(n):
+    return [
+        Message("sale.created", i % 3, i, json.dumps({
+            "event_id": f"sale.created:{i}",
+            "event_type": "sale.created",
+            "tenant_id": TENANT_ID,
+            "payload": {"sale_id": str(i), "item_id": f"sku-{i % 100}", "quantity": 1, "total_price": 10.0},
+            "timestamp": "2025-07-01T10:00:00",
+        }).encode())
+        for i in range(n)
+    ]
+
+class FakeConsumer:
+    """Serves messages through getmany() the way AIOKafkaConsumer does, then stops the loop."""
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.pos = 0
+        self.commits = 0
+        self.committed = {}
+        self.final = {}
+        for m in messages:
+            self.final[TopicPartition(m.topic, m.partition)] = m.offset + 1
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def getmany(self, timeout_ms=0, max_records=None):
+        if self.pos >= len(self.messages):
+            # Let the writer finish storing what was fetched, then end the run
+            while self.committed != self.final:
+                await asyncio.sleep(0.01)
+            raise asyncio.CancelledError()
+        batch = self.messages[self.pos:self.pos + (max_records or len(self.messages))]
+        self.pos += len(batch)
+        by_partition = {}
+        for m in batch:
+            by_partition.setdefault(TopicPartition(m.topic, m.partition), []).append(m)
+        return by_partition
+
+    async def commit(self, offsets=None):
+        self.commits += 1
+        self.committed.update(offsets or {})
+
+async def per_message(messages):
+    # Previous consume_events loop body
+    for msg in messages:
+        raw = json.loads(msg.value)
+        event = DomainEvent(event_id=raw['event_id'], event_type=raw['event_type'], tenant_id=raw['tenant_id'],
+                            payload=raw['payload'], timestamp=raw['timestamp'])
+        await event_ingestor.store_event(event)
+
+async def batched(messages):
+    consumer = FakeConsumer(messages)
+    try:
+        await event_ingestor.consume_events(consumer)
+    except asyncio.CancelledError:
+        pass
+    return consumer.commits
+
+async def main():
+    messages = make_messages(TOTAL_EVENTS)
+    for label, fn in [("insert_one per message", per_message), ("getmany + insert_many", batched)]:
+        await db.domain_events.delete_many({"tenant_id": TENANT_ID})
+        await db.event_rollups.delete_many({"tenant_id": TENANT_ID})
+        t0 = time.perf_counter()
+        await fn(messages)
+        elapsed = time.perf_counter() - t0
+        print(f"{label:<28} {TOTAL_EVENTS} events in {elapsed:.2f}s -> {TOTAL_EVENTS / elapsed:,.0f} events/s")
+    await db.domain_events.delete_many({"tenant_id": TENANT_ID})
+    await db.event_rollups.delete_many({"tenant_id": TENANT_ID})
+
+if __name__ == "__main__":
+    asyncio.run(main())
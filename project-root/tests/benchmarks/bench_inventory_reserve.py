@@ -0,0 +1,51 @@
+"""
+Stock handling on the sale path: three calls (exists, read stock, deduct) vs one
+check-and-reserve call, both over a keep-alive connection.
+
+Start inventory_service first (docker compose up inventory_service), then:
+    INVENTORY_SERVICE_URL=http://localhost:8002 python tests/benchmarks/bench_inventory_reserve.py
+"""
+import asyncio
+import os
+import statistics
+import time
+import httpx
+
+BASE_URL = os.getenv("INVENTORY_SERVICE_URL", "http://localhost:8002")
+TENANT_ID = "bench_tenant"
+ITEM_ID = "bench-sku"
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", "500"))
+
+async def three_calls(client):
+    params = {"tenant_id": TENANT_ID}
+    await client.get(f"/items/{ITEM_ID}", params=params)      # inventory_exists
+    await client.get(f"/items/{ITEM_ID}", params=params)      # get_available_stock
+    await client.patch(f"/items/{ITEM_ID}/stock", params=params,
+                       json={"tenant_id": TENANT_ID, "delta": -1})  # deduct_inventory
+
+async def one_call(client):
+    await client.post("/items/reserve", json={"tenant_id": TENANT_ID, "items": [{"item_id": ITEM_ID, "quantity": 1}]})
+
+async def run(label, fn, client):
+    samples = []
+    for _ in range(ITERATIONS):
+        t0 = time.perf_counter()
+        await fn(client)
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    print(f"{label:<32} mean={statistics.mean(samples):.2f}ms p50={samples[len(samples) // 2]:.2f}ms "
+          f"p99={samples[int(len(samples) * 0.99) - 1]:.2f}ms")
+
+async def main():
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=5) as client:
+        await client.delete(f"/items/{ITEM_ID}", params={"tenant_id": TENANT_ID})
+        await client.post("/items", json={
+            "tenant_id": TENANT_ID, "item_id": ITEM_ID, "item_name": "Bench item",
+            "quantity": ITERATIONS * 4, "min_quantity": 0,
+        })
+        await run("exists + stock + deduct (3 RTT)", three_calls, client)
+        await run("check-and-reserve (1 RTT)", one_call, client)
+        await client.delete(f"/items/{ITEM_ID}", params={"tenant_id": TENANT_ID})
+
+if __name__ == "__main__":
+    asyncio.run(main())
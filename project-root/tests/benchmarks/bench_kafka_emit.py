@@ -0,0 +1,89 @@
+"""
+Sale-path cost of publishing an event: old send + flush per event vs the
+batched, non-blocking retail_outbox producer. Uses an in-process fake broker that acknowledges each
+produce request after BROKER_RTT_MS, so no Kafka is needed.
+
+    python tests/benchmarks/bench_kafka_emit.py
+"""
+import os
+import threading
+import time
+from bench_utils import measure, report
+from retail_outbox import producer
+
+BROKER_RTT_MS = float(os.getenv("BROKER_RTT_MS", "2"))
+LINGER_MS = float(os.getenv("KAFKA_LINGER_MS", "5"))
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", "500"))
+
+class _Future:
+    def __init__(self):
+        self._callbacks, self._errbacks = [], []
+        self.done = threading.Event()
+
+    def add_callback(self, fn):
+        self._callbacks.append(fn)
+        return self
+
+    def add_errback(self, fn):
+        self._errbacks.append(fn)
+        return self
+
+    def resolve(self):
+        for fn in self._callbacks:
+            fn(None)
+        self.done.set()
+
+class FakeBroker:
+    """Mimics KafkaProducer: send() buffers, a sender thread ships a batch every linger_ms."""
+
+    def __init__(self):
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._stop = False
+        self.requests = 0
+        threading.Thread(target=self._sender, daemon=True).start()
+
+    def send(self, topic, value, key=None):
+        f = _Future()
+        with self._lock:
+            self._buffer.append(f)
+        return f
+
+    def _ship(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            time.sleep(BROKER_RTT_MS / 1000)
+            self.requests += 1
+            for f in batch:
+                f.resolve()
+
+    def _sender(self):
+        while not self._stop:
+            time.sleep(LINGER_MS / 1000)
+            self._ship()
+
+    def flush(self, timeout=None):
+        self._ship()
+
+    def close(self, timeout=None):
+        self._stop = True
+
+EVENT = {"tenant_id": "bench_tenant", "sale_id": "s1", "item_id": "sku-1", "quantity": 1, "total_price": 10.0}
+
+def old_emit():
+    broker = producer._producer
+    broker.send("sale.created", EVENT)
+    broker.flush(timeout=1)
+
+def new_emit():
+    producer.publish("sale.created", EVENT, key=EVENT["tenant_id"].encode())
+
+if __name__ == "__main__":
+    for label, fn in [("send + flush per event (old)", old_emit), ("batched non-blocking emit", new_emit)]:
+        broker = producer._producer = FakeBroker()
+        stats = measure(fn, ITERATIONS)
+        producer.close_producer()  # flushes whatever is still buffered
+        report(label, stats)
+        print(f"{'':<40} broker produce requests: {broker.requests}")
+    print("delivery stats:", producer.get_delivery_stats())
@@ -0,0 +1,59 @@
+"""
+Login (bcrypt verify) throughput per core through user_service's password
+pool, for pool sizes 1..cpu_count and a couple of work factors. Also shows how
+many of a burst are shed with 429 once the pending limit is hit.
+
+    python tests/benchmarks/bench_login_throughput.py
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("USER_BCRYPT_MAX_PENDING", "100000")
+
+from bench_utils import use_service  # noqa: E402
+
+use_service("user_service")
+from core import password_pool  # noqa: E402
+
+LOGINS = int(os.getenv("BENCH_LOGINS", "200"))
+ROUNDS = [int(r) for r in os.getenv("BENCH_ROUNDS", "10,12").split(",")]
+CLIENT_THREADS = 64
+
+def login_burst(password_hash):
+    ok = busy = 0
+    def login(_):
+        try:
+            return password_pool.verify_password("correct horse", password_hash)
+        except password_pool.PasswordPoolBusy:
+            return None
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(CLIENT_THREADS) as clients:
+        for result in clients.map(login, range(LOGINS)):
+            if result is None:
+                busy += 1
+            else:
+                ok += 1
+    return ok, busy, time.perf_counter() - t0
+
+def main():
+    cores = os.cpu_count() or 1
+    workers_options = sorted({1, max(1, cores // 2), cores})
+    for rounds in ROUNDS:
+        password_hash = password_pool._hash("correct horse", rounds)
+        for workers in workers_options:
+            password_pool.close_pool()
+            password_pool.BCRYPT_WORKERS = workers
+            password_pool.verify_password("correct horse", password_hash)  # start the pool
+            ok, _, elapsed = login_burst(password_hash)
+            print(f"rounds={rounds:<3} workers={workers:<3} logins/s={ok / elapsed:7.1f} "
+                  f"per core={ok / elapsed / workers:6.1f}")
+        # Same burst with a tight pending limit: the overflow is rejected immediately
+        password_pool.BCRYPT_MAX_PENDING = cores * 4
+        ok, busy, elapsed = login_burst(password_hash)
+        print(f"rounds={rounds:<3} max_pending={cores * 4}: {ok} served, {busy} shed (429) in {elapsed:.2f}s")
+        password_pool.BCRYPT_MAX_PENDING = int(os.environ["USER_BCRYPT_MAX_PENDING"])
+    password_pool.close_pool()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Per-call MongoClient vs pooled client latency for a typical point read.
+
+Run against a local mongod:
+    SALES_MONGO_URI=mongodb://localhost:27017 python tests/benchmarks/bench_mongo_pool.py
+"""
+import os
+from pymongo import MongoClient
+from bench_utils import use_service, measure, report
+
+use_service("sales_service")
+from db import mongo  # noqa: E402
+
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", "500"))
+TENANT_ID = "bench_tenant"
+
+def per_call_client():
+    # What every get_*_collection() used to do
+    client = MongoClient(mongo.MONGO_URI)
+    try:
+        client[mongo.DB_NAME]["sales"].find_one({"tenant_id": TENANT_ID, "sale_id": "missing"})
+    finally:
+        client.close()
+
+def pooled_client():
+    mongo.get_db()["sales"].find_one({"tenant_id": TENANT_ID, "sale_id": "missing"})
+
+if __name__ == "__main__":
+    report("per-call MongoClient", measure(per_call_client, ITERATIONS))
+    report("pooled client (db.mongo)", measure(pooled_client, ITERATIONS))
+    mongo.close_client()
@@ -0,0 +1,52 @@
+"""
+Offline POS replay: 1k sales as individual POST /sales vs one POST /sales/batch.
+
+Start sales_service (and inventory_service) first, then:
+    SALES_SERVICE_URL=http://localhost:8003 SECRET_KEY=... python tests/benchmarks/bench_sales_batch.py
+"""
+import os
+import time
+import uuid
+import httpx
+import jwt
+
+BASE_URL = os.getenv("SALES_SERVICE_URL", "http://localhost:8003")
+SECRET_KEY = os.getenv("SECRET_KEY", "secret-key-for-dev")
+TENANT_ID = "bench_tenant"
+BATCH_SIZE = int(os.getenv("BENCH_BATCH_SIZE", "1000"))
+
+def make_sale(i):
+    return {
+        "tenant_id": TENANT_ID,
+        "establishment_id": "bench-main",
+        "item_id": f"sku-{i % 50}",
+        "item_name": f"Item {i % 50}",
+        "quantity": 1 + i % 3,
+        "price_per_unit": 20.0,
+        "payment_method": "CASH",
+        "user": "bench_user",
+    }
+
+def main():
+    token = jwt.encode({"sub": "bench_user", "tenant_id": TENANT_ID}, SECRET_KEY, algorithm="HS256")
+    headers = {"Authorization": f"Bearer {token}"}
+    with httpx.Client(base_url=BASE_URL, headers=headers, timeout=120) as client:
+        t0 = time.perf_counter()
+        for i in range(BATCH_SIZE):
+            client.post("/sales", json=make_sale(i))
+        single = time.perf_counter() - t0
+        print(f"{BATCH_SIZE} x POST /sales       {single:.2f}s ({BATCH_SIZE / single:.0f} sales/s)")
+
+        batch = {"sales": [{**make_sale(i), "idempotency_key": str(uuid.uuid4())} for i in range(BATCH_SIZE)]}
+        t0 = time.perf_counter()
+        resp = client.post("/sales/batch", json=batch)
+        bulk = time.perf_counter() - t0
+        print(f"1 x POST /sales/batch ({BATCH_SIZE}) {bulk:.2f}s ({BATCH_SIZE / bulk:.0f} sales/s) -> {resp.json().get('created')} created")
+
+        t0 = time.perf_counter()
+        resp = client.post("/sales/batch", json=batch)
+        replay = time.perf_counter() - t0
+        print(f"replay of same batch        {replay:.2f}s -> {resp.json().get('duplicates')} duplicates")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Daily sales summary: pull-every-sale-into-Python vs server-side $group.
+Reports wire bytes returned by the server and latency at 10k / 100k sales.
+
+    SALES_MONGO_URI=mongodb://localhost:27017 python tests/benchmarks/bench_sales_summary.py
+"""
+import asyncio
+import os
+import random
+from datetime import date, datetime, timedelta, timezone
+
+os.environ.setdefault("SALES_DB_NAME", "sales_bench_db")
+
+from bson.codec_options import CodecOptions  # noqa: E402
+from bson.raw_bson import RawBSONDocument  # noqa: E402
+from bench_utils import use_service, measure, report  # noqa: E402
+
+use_service("sales_service")
+from db import mongo  # noqa: E402
+from db.indexes import ensure_indexes  # noqa: E402
+from db.sale_db import get_sales_collection, sales_repo  # noqa: E402
+
+TENANT_ID = "bench_tenant"
+DAY = date(2025, 7, 1)
+SIZES = [10_000, 100_000]
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", "20"))
+
+# One loop for the whole run, so the Motor client is reused across iterations
+loop = asyncio.new_event_loop()
+
+def summary(**kwargs):
+    return loop.run_until_complete(sales_repo.get_sales_summary(TENANT_ID, "daily", DAY, **kwargs))
+
+def seed(n):
+    coll = get_sales_collection()
+    coll.delete_many({"tenant_id": TENANT_ID})
+    start = datetime(DAY.year, DAY.month, DAY.day, tzinfo=timezone.utc)
+    docs = []
+    for i in range(n):
+        qty = random.randint(1, 10)
+        price = round(random.uniform(10, 500), 2)
+        is_udhaar = random.random() < 0.2
+        docs.append({
+            "tenant_id": TENANT_ID,
+            "establishment_id": f"est-{i % 5}",
+            "sale_id": f"bench-{i}",
+            "item_id": f"sku-{i % 300}",
+            "item_name": "Bench item with a reasonably long display name",
+            "quantity": qty,
+            "price_per_unit": price,
+            "total_price": qty * price,
+            "payment_method": random.choice(["CASH", "UPI", "CREDIT"]),
+            "customer_id": f"c{i % 1000}",
+            "is_udhaar": is_udhaar,
+            "udhaar_paid": is_udhaar and random.random() < 0.5,
+            "amount_received": qty * price if is_udhaar else None,
+            "user": "bench_user",
+            "timestamp": start + timedelta(seconds=random.randint(0, 86399)),
+        })
+        if len(docs) == 5000:
+            coll.insert_many(docs, ordered=False)
+            docs = []
+    if docs:
+        coll.insert_many(docs, ordered=False)
+
+def legacy_summary():
+    # Old implementation: fetch every sale, sum in three Python passes
+    start = datetime(DAY.year, DAY.month, DAY.day, tzinfo=timezone.utc)
+    match = {"tenant_id": TENANT_ID, "timestamp": {"$gte": start, "$lt": start + timedelta(days=1)}}
+    sales = list(get_sales_collection().find(match))
+    return (
+        sum(s.get("total_price", 0) for s in sales),
+        sum(s.get("total_price", 0) for s in sales if s.get("is_udhaar")),
+        sum(s.get("amount_received", 0) or 0 for s in sales if s.get("udhaar_paid")),
+    )
+
+def wire_bytes():
+    raw = get_sales_collection().with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+    start = datetime(DAY.year, DAY.month, DAY.day, tzinfo=timezone.utc)
+    match = {"tenant_id": TENANT_ID, "timestamp": {"$gte": start, "$lt": start + timedelta(days=1)}}
+    legacy = sum(len(d.raw) for d in raw.find(match))
+    pipeline = [
+        {"$match": match},
+        {"$project": {"_id": 0, "total_price": 1, "is_udhaar": 1, "udhaar_paid": 1, "amount_received": 1}},
+        {"$group": {"_id": None, "total_sales": {"$sum": "$total_price"}, "n": {"$sum": 1}}},
+    ]
+    aggregated = sum(len(d.raw) for d in raw.aggregate(pipeline))
+    return legacy, aggregated
+
+if __name__ == "__main__":
+    ensure_indexes()
+    for n in SIZES:
+        seed(n)
+        legacy_bytes, agg_bytes = wire_bytes()
+        print(f"\n--- {n} sales --- bytes returned: find()={legacy_bytes:,} aggregate()={agg_bytes:,}")
+        report("find + Python sums", measure(legacy_summary, ITERATIONS, warmup=2))
+        report("$group aggregation", measure(summary, ITERATIONS, warmup=2))
+        report("$facet with breakdowns", measure(lambda: summary(breakdown=True), ITERATIONS, warmup=2))
+    get_sales_collection().delete_many({"tenant_id": TENANT_ID})
+    mongo.close_async_client()
+    mongo.close_client()
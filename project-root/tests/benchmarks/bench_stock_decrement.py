@@ -0,0 +1,81 @@
+"""
+Concurrent PATCH /items/{id}/stock decrements: the old read-modify-write
+adjust_stock (find_one, then $set the computed quantity) vs the guarded
+find_one_and_update. Requests go through the inventory router in-process over
+ASGI, so only Mongo is needed:
+
+    MONGO_URI=mongodb://localhost:27017 python tests/benchmarks/bench_stock_decrement.py
+
+Each run fires CONCURRENCY decrements of 1 at once against STOCK units, and
+reports ops/s plus how many successful decrements never reached the stored
+quantity (lost updates).
+"""
+import asyncio
+import os
+import time
+from datetime import datetime
+import httpx
+from fastapi import FastAPI
+from bench_utils import use_service
+
+use_service("inventory_service")
+from api import inventory  # noqa: E402
+from db.inventory_db import inventory_repo  # noqa: E402
+
+TENANT_ID = "bench_tenant"
+ITEM_ID = "bench-decrement-sku"
+STOCK = int(os.getenv("BENCH_STOCK", "500"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", str(STOCK * 2)))
+
+async def read_modify_write(tenant_id: str, item_id: str, delta: int):
+    """
+    adjust_stock as it was before the guarded update: two round trips, and
+    concurrent callers can read the same quantity and overwrite each other.
+    """
+    item = await inventory_repo.items.find_one({"tenant_id": tenant_id, "item_id": item_id}, {"_id": 0})
+    if not item:
+        return None
+    new_qty = item["quantity"] + delta
+    if new_qty < 0:
+        raise ValueError("Stock cannot go negative")
+    await inventory_repo.items.update_one(
+        {"tenant_id": tenant_id, "item_id": item_id},
+        {"$set": {"quantity": new_qty, "last_updated": datetime.utcnow().isoformat()}},
+    )
+    await inventory_repo.log_audit_event(tenant_id, "adjust_stock", {"item_id": item_id, "delta": delta, "result_qty": new_qty})
+    return {**item, "quantity": new_qty}
+
+async def run(label, client):
+    await inventory_repo.items.delete_one({"tenant_id": TENANT_ID, "item_id": ITEM_ID})
+    await client.post("/items", json={
+        "tenant_id": TENANT_ID, "item_id": ITEM_ID, "item_name": "Bench item", "quantity": STOCK, "min_quantity": 0,
+    })
+
+    async def decrement():
+        resp = await client.patch(f"/items/{ITEM_ID}/stock", params={"tenant_id": TENANT_ID},
+                                  json={"tenant_id": TENANT_ID, "delta": -1})
+        return resp.status_code
+
+    t0 = time.perf_counter()
+    statuses = await asyncio.gather(*(decrement() for _ in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - t0
+    succeeded = statuses.count(200)
+    final = (await inventory_repo.get_item(TENANT_ID, ITEM_ID))["quantity"]
+    lost = succeeded - (STOCK - final)
+    print(f"{label:<32} n={CONCURRENCY:<6} ops/s={CONCURRENCY / elapsed:.0f} "
+          f"succeeded={succeeded} final_stock={final} lost_updates={lost}")
+    await inventory_repo.items.delete_one({"tenant_id": TENANT_ID, "item_id": ITEM_ID})
+
+async def main():
+    app = FastAPI()
+    app.include_router(inventory.router)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://inventory.bench") as client:
+        guarded = inventory_repo.adjust_stock
+        inventory_repo.adjust_stock = read_modify_write
+        await run("read-modify-write (old)", client)
+        inventory_repo.adjust_stock = guarded
+        await run("guarded find_one_and_update", client)
+
+if __name__ == "__main__":
+    asyncio.run(main())
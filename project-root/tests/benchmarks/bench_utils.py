@@ -0,0 +1,43 @@
+import os
+import statistics
+import sys
+import time
+
+SERVICES_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "services")
+
+def use_service(name):
+    """
+    Put a service's app/ directory on sys.path so its modules import the way
+    they do inside the container (`from db.sale_db import ...`).
+    One service per benchmark process: every service has its own `db` package.
+    """
+    sys.path.insert(0, os.path.abspath(os.path.join(SERVICES_DIR, name, "app")))
+
+def measure(fn, iterations=1000, warmup=10):
+    """
+    Call fn() `iterations` times and return latency stats in milliseconds.
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - start
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "mean_ms": statistics.mean(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        "ops_per_sec": iterations / elapsed if elapsed else 0.0,
+    }
+
+def report(label, stats):
+    print(
+        f"{label:<40} n={stats['iterations']:<6} mean={stats['mean_ms']:.3f}ms "
+        f"p50={stats['p50_ms']:.3f}ms p99={stats['p99_ms']:.3f}ms "
+        f"ops/s={stats['ops_per_sec']:.0f}"
+    )